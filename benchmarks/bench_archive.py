@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Measure the retention job: database size before and after archiving, and reads from archives.
+
+Usage: python benchmarks/bench_archive.py [scans] [subdomains] [urls]
+
+Stores a history of scans of one domain (rows storage, with historical
+URLs), then archives all but the newest with archive_old_scans, which
+VACUUMs the database afterwards. Reports the database size before and
+after, the size of the archives on disk, and the time to read the first
+page of an archived scan and to diff the newest scan against it.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_url_store import generate_urls
+from reconaug import create_app, db
+from reconaug.models import Scan
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.url_store import save_scan_urls
+from reconaug.utils.archive import archive_old_scans, get_scan_or_archive
+from reconaug.utils.scan_read import get_scan_subdomain_page
+from reconaug.utils.scan_diff import count_diff
+
+def megabytes(size):
+    return size / (1024 * 1024)
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+if __name__ == "__main__":
+    scan_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    subdomain_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    url_count = int(sys.argv[3]) if len(sys.argv) > 3 else 50000
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    archive_dir = tempfile.mkdtemp()
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'SCAN_ARCHIVE_DIR': archive_dir})
+        with app.app_context():
+            urls = generate_urls(url_count)
+            scan_ids = []
+            for i in range(scan_count):
+                # Each rescan drops and discovers 5% of the subdomains
+                offset = i * subdomain_count // 20
+                scan_ids.append(insert_scan(
+                    'example.com',
+                    [f"host{n}.example.com" for n in range(offset, offset + subdomain_count)],
+                    [{'url': f"https://host{n}.example.com", 'status_code': '200', 'technology': 'nginx'}
+                     for n in range(offset, offset + subdomain_count // 2)]
+                ))
+                db.session.commit()
+                save_scan_urls(scan_ids[-1], urls)
+                db.session.commit()
+
+            size_before = os.path.getsize(path)
+            start = time.perf_counter()
+            result = archive_old_scans(days=0, keep=1)
+            elapsed = time.perf_counter() - start
+            size_after = os.path.getsize(path)
+
+            oldest = get_scan_or_archive(scan_ids[0])
+            newest = db.session.get(Scan, scan_ids[-1])
+            page_ms = timed(lambda: get_scan_subdomain_page(oldest))
+            diff_ms = timed(lambda: count_diff(oldest, newest))
+
+        print(f"\n{scan_count} scans of {subdomain_count} subdomains, "
+              f"{subdomain_count // 2} live hosts and {url_count} URLs:")
+        print(f"  archived {len(result['archived'])} scans in {elapsed:.1f}s")
+        print(f"  database: {megabytes(size_before):8.1f} MB before, {megabytes(size_after):8.1f} MB after VACUUM")
+        print(f"  archives: {megabytes(directory_size(archive_dir)):8.1f} MB on disk")
+        print(f"  first subdomain page of an archived scan: {page_ms:.1f}ms")
+        print(f"  diff of the newest scan against the oldest (archived): {diff_ms:.1f}ms")
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Benchmark the asyncio connect scanner against localhost listeners.
+
+Usage: python benchmarks/bench_connect_scan.py [listener_count] [port_range_size]
+
+Opens listener_count TCP listeners on 127.0.0.1 at random ports from
+40000 upwards, then scans the port_range_size ports containing them, reporting elapsed time and whether
+every listener was found. If naabu is installed, the same range is scanned
+with naabu for comparison.
+"""
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug.tools.checker import check_tools
+from reconaug.tools.connect_scanner import connect_scan
+
+def open_listeners(count, ports):
+    """Open up to count listening sockets on 127.0.0.1 within the given ports"""
+    listeners = []
+    for port in random.sample(ports, len(ports)):
+        if len(listeners) == count:
+            break
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            sock.close()
+            continue
+        sock.listen(128)
+        listeners.append(sock)
+    return listeners
+
+if __name__ == "__main__":
+    listener_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    range_size = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    ports = list(range(40000, min(65536, 40000 + range_size)))
+    listeners = open_listeners(listener_count, ports)
+    expected = sorted(sock.getsockname()[1] for sock in listeners)
+
+    try:
+        for concurrency in (100, 500, 1000):
+            start = time.perf_counter()
+            found, error = connect_scan('127.0.0.1', ports=ports, timeout=0.5,
+                                        global_concurrency=concurrency, host_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            missing = sorted(set(expected) - set(found))
+            print(f"connect scan, concurrency {concurrency:>4}: {len(ports)} ports in {elapsed:.2f}s "
+                  f"({len(ports) / elapsed:.0f} ports/s), found {len(set(found) & set(expected))}/{len(expected)} listeners"
+                  f"{', error: ' + error if error else ''}{', missing: ' + str(missing) if missing else ''}")
+
+        if check_tools()['naabu']:
+            start = time.perf_counter()
+            result = subprocess.run(
+                ['naabu', '-host', '127.0.0.1', '-p', f"{ports[0]}-{ports[-1]}", '-silent'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+            elapsed = time.perf_counter() - start
+            found = {int(line.rsplit(':', 1)[1]) for line in result.stdout.splitlines() if ':' in line}
+            print(f"naabu: {len(ports)} ports in {elapsed:.2f}s, found {len(found & set(expected))}/{len(expected)} listeners")
+        else:
+            print("naabu not installed, skipping naabu comparison")
+    finally:
+        for sock in listeners:
+            sock.close()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Compare peak memory of exporting a scan's historical URLs: one JSON list vs the streaming export.
+
+Usage: python benchmarks/bench_export.py [url_count]
+
+"before" builds the whole list and serializes it at once, as the JSON
+endpoints did. "after" reads /api/scan/<id>/export/urls (NDJSON and CSV)
+chunk by chunk as a client would. Peak Python allocations are measured
+with tracemalloc (which also slows both down, so no times are shown).
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import jsonify
+from bench_url_store import generate_urls
+from reconaug import create_app, db
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.url_store import save_scan_urls, get_scan_urls
+
+def measure(func):
+    """Return (bytes produced, peak MB allocated) for func"""
+    tracemalloc.start()
+    size = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak / (1024 * 1024)
+
+def stream(client, url):
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+if __name__ == "__main__":
+    url_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            scan_id = insert_scan('example.com', [], [])
+            save_scan_urls(scan_id, generate_urls(url_count))
+            db.session.commit()
+            db.session.remove()
+
+        with app.test_request_context():
+            results = {'JSON list (before)': measure(lambda: len(jsonify(urls=get_scan_urls(scan_id)).get_data()))}
+            db.session.remove()
+
+        client = app.test_client()
+        results['NDJSON stream (after)'] = measure(lambda: stream(client, f'/api/scan/{scan_id}/export/urls'))
+        results['CSV stream (after)'] = measure(
+            lambda: stream(client, f'/api/scan/{scan_id}/export/urls?format=csv')
+        )
+
+        print(f"\nExporting {url_count} historical URLs:")
+        for name, (size, peak) in results.items():
+            print(f"{name:>22}: {size / (1024 * 1024):7.1f} MB output, peak {peak:7.1f} MB allocated")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
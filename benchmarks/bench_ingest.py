@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare scan ingest throughput: SQLite vs PostgreSQL executemany vs PostgreSQL COPY.
+
+Usage: python benchmarks/bench_ingest.py [postgresql_url] [subdomains] [hosts] [urls]
+
+Without a PostgreSQL URL only SQLite is measured. The PostgreSQL runs use
+a scratch schema (reconaug_bench) that is dropped afterwards, so existing
+tables in the database are left alone. Example:
+
+    python benchmarks/bench_ingest.py postgresql+psycopg2://postgres@localhost/reconaug
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_url_store import generate_urls
+from reconaug import create_app, db
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.url_store import save_scan_urls
+
+BENCH_SCHEMA = 'reconaug_bench'
+
+def ingest(config, subdomains, live_hosts, urls):
+    """Save one scan with historical URLs, returning the elapsed seconds"""
+    app = create_app(config)
+    with app.app_context():
+        start = time.perf_counter()
+        scan_id = insert_scan('example.com', subdomains, live_hosts)
+        save_scan_urls(scan_id, urls)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+        db.session.remove()
+        db.engine.dispose()
+    return elapsed
+
+def run_sqlite(subdomains, live_hosts, urls):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        return ingest({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}, subdomains, live_hosts, urls)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def run_postgresql(url, copy, subdomains, live_hosts, urls):
+    from sqlalchemy import create_engine, text
+
+    admin = create_engine(url)
+    with admin.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {BENCH_SCHEMA}'))
+    try:
+        return ingest({
+            'SQLALCHEMY_DATABASE_URI': url,
+            'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'options': f'-c search_path={BENCH_SCHEMA}'}},
+            'DB_COPY_INGEST': copy
+        }, subdomains, live_hosts, urls)
+    finally:
+        with admin.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE'))
+        admin.dispose()
+
+if __name__ == "__main__":
+    pg_url = sys.argv[1] if len(sys.argv) > 1 else None
+    subdomain_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    host_count = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    url_count = int(sys.argv[4]) if len(sys.argv) > 4 else 500000
+
+    subdomains = [f"host{i}.example.com" for i in range(subdomain_count)]
+    live_hosts = [{'url': f"https://host{i}.example.com", 'status_code': '200', 'technology': 'nginx'}
+                  for i in range(host_count)]
+    urls = generate_urls(url_count)
+    rows = subdomain_count + host_count + len(set(urls))
+
+    results = {'sqlite': run_sqlite(subdomains, live_hosts, urls)}
+    if pg_url:
+        results['postgresql executemany'] = run_postgresql(pg_url, False, subdomains, live_hosts, urls)
+        results['postgresql COPY'] = run_postgresql(pg_url, True, subdomains, live_hosts, urls)
+
+    print(f"\nIngesting {subdomain_count} subdomains, {host_count} live hosts and {url_count} URLs:")
+    for name, elapsed in results.items():
+        print(f"{name:>24}: {elapsed:7.2f}s  {rows / elapsed:10.0f} rows/s")
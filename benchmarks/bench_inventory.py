@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Compare storage growth of repeated scans: per-scan rows vs the asset inventory.
+
+Usage: python benchmarks/bench_inventory.py [scans] [names] [hosts] [churn]
+
+Simulates daily scans of one estate where a small fraction of names
+appear, disappear or change status between scans, stores them with both
+asset storage modes and reports row counts and database size. Every scan
+is read back and checked against what was saved.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan, Subdomain, LiveHost, ScanAsset
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.scan_read import get_scan_subdomain_names, get_scan_live_hosts
+
+def generate_scans(scan_count, name_count, host_count, churn, seed=1):
+    """Yield (subdomains, live_hosts) for successive scans of a slowly changing estate"""
+    rng = random.Random(seed)
+    names = [f"host{i}.example.com" for i in range(name_count)]
+    next_name = name_count
+    status = {name: '200' for name in names[:host_count]}
+    for _ in range(scan_count):
+        yield list(names), [{'url': f"https://{name}", 'status_code': code, 'technology': 'nginx'}
+                            for name, code in status.items()]
+        changes = int(name_count * churn)
+        for _ in range(changes):
+            removed = names.pop(rng.randrange(len(names)))
+            status.pop(removed, None)
+            names.append(f"host{next_name}.example.com")
+            next_name += 1
+        for name in rng.sample(list(status), min(changes, len(status))):
+            status[name] = rng.choice(['200', '301', '403', '500'])
+
+def run(mode, scans):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'ASSET_STORAGE': mode})
+        with app.app_context():
+            start = time.perf_counter()
+            saved = []
+            for subdomains, live_hosts in scans:
+                saved.append((insert_scan('example.com', subdomains, live_hosts), subdomains, live_hosts))
+                db.session.commit()
+            elapsed = time.perf_counter() - start
+
+            for scan_id, subdomains, live_hosts in saved:
+                scan = db.session.get(Scan, scan_id)
+                assert sorted(get_scan_subdomain_names(scan)) == sorted(subdomains)
+                stored = sorted((h['url'], h['status_code']) for h in get_scan_live_hosts(scan))
+                assert stored == sorted((h['url'], h['status_code']) for h in live_hosts)
+
+            rows = {model.__tablename__: model.query.count() for model in (Subdomain, LiveHost, ScanAsset)}
+            db.session.execute(db.text('VACUUM'))
+            db.session.remove()
+            db.engine.dispose()
+        return elapsed, rows, os.path.getsize(path)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+if __name__ == "__main__":
+    scan_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    name_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    host_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    churn = float(sys.argv[4]) if len(sys.argv) > 4 else 0.01
+    scans = list(generate_scans(scan_count, name_count, host_count, churn))
+
+    print(f"{scan_count} scans of {name_count} names / {host_count} live hosts, {churn:.0%} churn per scan")
+    for mode in ('rows', 'inventory'):
+        elapsed, rows, size = run(mode, scans)
+        counts = ', '.join(f"{table} {count}" for table, count in rows.items())
+        print(f"{mode:>10}: ingest {elapsed:6.1f}s, {size / (1024 * 1024):7.1f} MB, rows: {counts}")
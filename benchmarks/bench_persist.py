@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Compare scan persistence: per-row ORM adds and flushes vs chunked Core inserts.
+
+Usage: python benchmarks/bench_persist.py [subdomain_count] [host_count]
+
+Defaults to 100k subdomains and 20k live hosts.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan, Subdomain, LiveHost
+from reconaug.utils.bulk import insert_scan
+
+def generate_scan(subdomain_count, host_count):
+    """Generate subdomain names and live host dicts for a synthetic scan"""
+    subdomains = [f"host{i}.example.com" for i in range(subdomain_count)]
+    live_hosts = [{
+        'url': f"https://host{i}.example.com",
+        'status_code': '200',
+        'technology': 'nginx'
+    } for i in range(host_count)]
+    return subdomains, live_hosts
+
+def save_orm(domain, subdomains, live_hosts):
+    """The previous persistence path: one ORM object per row, a flush per live host"""
+    scan = Scan(
+        domain=domain,
+        timestamp=datetime.utcnow(),
+        status='complete',
+        subdomains_count=len(subdomains),
+        live_hosts_count=len(live_hosts)
+    )
+    db.session.add(scan)
+    db.session.flush()
+    for subdomain in subdomains:
+        db.session.add(Subdomain(scan_id=scan.id, name=subdomain, source='combined'))
+    for host in live_hosts:
+        db.session.add(LiveHost(
+            scan_id=scan.id,
+            url=host['url'],
+            status_code=host['status_code'],
+            technology=host['technology']
+        ))
+        db.session.flush()
+    db.session.commit()
+    return scan.id
+
+def save_bulk(domain, subdomains, live_hosts):
+    """The bulk persistence path"""
+    scan_id = insert_scan(domain, subdomains, live_hosts)
+    db.session.commit()
+    return scan_id
+
+def run(name, save, subdomains, live_hosts):
+    """Persist one scan into a fresh database, returning the elapsed seconds"""
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            start = time.perf_counter()
+            scan_id = save('example.com', subdomains, live_hosts)
+            elapsed = time.perf_counter() - start
+            assert Subdomain.query.filter_by(scan_id=scan_id).count() == len(subdomains)
+            assert LiveHost.query.filter_by(scan_id=scan_id).count() == len(live_hosts)
+            db.session.remove()
+            db.engine.dispose()
+        return elapsed
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    subdomain_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    subdomains, live_hosts = generate_scan(subdomain_count, host_count)
+
+    results = {}
+    for name, save in (('orm', save_orm), ('bulk', save_bulk)):
+        results[name] = run(name, save, subdomains, live_hosts)
+
+    print(f"\nPersisting {subdomain_count} subdomains and {host_count} live hosts:")
+    for name, elapsed in results.items():
+        print(f"{name:>5}: {elapsed:7.2f}s")
+    print(f"speedup: {results['orm'] / results['bulk']:.1f}x")
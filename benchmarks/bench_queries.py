@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Show the scan lookup queries moving from full table scans to index seeks.
+
+Usage: python benchmarks/bench_queries.py [scan_count] [hosts_per_scan]
+
+Builds a database through the migrations, times each lookup and prints
+SQLite's query plan, then drops the indexes added by the scan lookup
+migration and repeats.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan, Subdomain, LiveHost, Port
+from reconaug.utils.bulk import bulk_insert, insert_scan
+
+INDEXED_MODELS = (Scan, Subdomain, LiveHost, Port)
+
+QUERIES = {
+    'live host by url': (
+        "SELECT * FROM live_host WHERE url = :url LIMIT 1",
+        lambda scans, hosts: {'url': f"https://host{hosts // 2}.d{scans // 2}.example.com"}
+    ),
+    'ports of a host': (
+        "SELECT * FROM port WHERE host_id = :host_id",
+        lambda scans, hosts: {'host_id': scans * hosts // 2}
+    ),
+    'latest scan of a domain': (
+        "SELECT * FROM scan WHERE domain = :domain ORDER BY timestamp DESC LIMIT 1",
+        lambda scans, hosts: {'domain': f"d{scans // 2}.example.com"}
+    ),
+    'scan history page': (
+        "SELECT * FROM scan ORDER BY timestamp DESC LIMIT 50",
+        lambda scans, hosts: {}
+    ),
+    'subdomains of a scan': (
+        "SELECT * FROM subdomain WHERE scan_id = :scan_id",
+        lambda scans, hosts: {'scan_id': scans // 2}
+    ),
+    'live hosts of a scan': (
+        "SELECT * FROM live_host WHERE scan_id = :scan_id",
+        lambda scans, hosts: {'scan_id': scans // 2}
+    ),
+}
+
+def populate(scan_count, hosts_per_scan):
+    """Insert scans with subdomains, live hosts and two ports per host"""
+    for i in range(scan_count):
+        domain = f"d{i}.example.com"
+        names = [f"host{j}.{domain}" for j in range(hosts_per_scan)]
+        insert_scan(domain, names, [{
+            'url': f"https://{name}",
+            'status_code': '200',
+            'technology': 'nginx'
+        } for name in names])
+    hosts = db.session.query(LiveHost.id, LiveHost.scan_id).all()
+    bulk_insert(Port, ({'host_id': host_id, 'scan_id': scan_id, 'port_number': port, 'service': 'HTTP'}
+                       for host_id, scan_id in hosts for port in (80, 443)))
+    db.session.commit()
+
+def measure(scan_count, hosts_per_scan, repeat=20):
+    """Return {query name: (best milliseconds, query plan)}"""
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        values = params(scan_count, hosts_per_scan)
+        plan = '; '.join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}"), values))
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.session.execute(db.text(sql), values).all()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, plan)
+    return results
+
+if __name__ == "__main__":
+    scan_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    hosts_per_scan = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            print(f"Populating {scan_count} scans with {hosts_per_scan} subdomains and live hosts each...")
+            populate(scan_count, hosts_per_scan)
+            indexed = measure(scan_count, hosts_per_scan)
+
+            for model in INDEXED_MODELS:
+                for index in model.__table__.indexes:
+                    db.session.execute(db.text(f"DROP INDEX IF EXISTS {index.name}"))
+            db.session.commit()
+            unindexed = measure(scan_count, hosts_per_scan, repeat=3)
+
+            for name in QUERIES:
+                before_ms, before_plan = unindexed[name]
+                after_ms, after_plan = indexed[name]
+                print(f"\n{name}:")
+                print(f"  without indexes {before_ms:9.2f}ms  {before_plan}")
+                print(f"  with indexes    {after_ms:9.2f}ms  {after_plan}")
+
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        os.remove(path)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Compare scan detail reads: lazy relationships and ORM objects vs the column-only read model.
+
+Usage: python benchmarks/bench_scan_details.py [subdomains] [hosts]
+
+"before" reproduces the old detail views: walk scan.subdomains and
+scan.live_hosts and call to_dict() on every host. "after" reads the same
+lists with reconaug.utils.scan_read, and requests the detail page, which
+renders only the first page of each list.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.scan_read import get_scan_subdomain_names, get_scan_live_hosts
+
+def before(scan_id):
+    db.session.remove()  # start without objects cached in the session
+    scan = db.session.get(Scan, scan_id)
+    subdomains = [subdomain.name for subdomain in scan.subdomains]
+    live_hosts = [host.to_dict() for host in scan.live_hosts]
+    return subdomains, live_hosts
+
+def after(scan_id):
+    db.session.remove()
+    scan = db.session.get(Scan, scan_id)
+    return get_scan_subdomain_names(scan), get_scan_live_hosts(scan)
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    subdomain_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            scan_id = insert_scan(
+                'example.com',
+                [f"host{i}.example.com" for i in range(subdomain_count)],
+                [{'url': f"https://host{i}.example.com", 'status_code': '200', 'technology': 'nginx'}
+                 for i in range(host_count)]
+            )
+            db.session.commit()
+
+            old_subdomains, old_hosts = before(scan_id)
+            new_subdomains, new_hosts = after(scan_id)
+            assert sorted(old_subdomains) == new_subdomains
+            assert sorted(old_hosts, key=lambda host: host['url']) == new_hosts
+
+            results = {
+                'relationships + to_dict (before)': measure(lambda: before(scan_id)),
+                'column-only read model (after)': measure(lambda: after(scan_id)),
+            }
+
+        client = app.test_client()
+        results['detail page, first page (after)'] = measure(lambda: client.get(f'/scan/details/{scan_id}'))
+
+        print(f"\nReading a scan with {subdomain_count} subdomains and {host_count} live hosts:")
+        for name, elapsed in results.items():
+            print(f"{name:>34}: {elapsed:8.1f}ms")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compare diffing two scans in Python (load both, compare sets) with the SQL-side diff.
+
+Usage: python benchmarks/bench_scan_diff.py [subdomains] [hosts] [rows|inventory]
+
+Two scans of one domain are stored with about 1% churn in subdomains and
+live hosts and 1% of hosts changing status. "before" loads both scans'
+subdomains and live hosts and compares them as sets and dicts. "after"
+counts every change with reconaug.utils.scan_diff.count_diff and fetches
+the first page of each change, as /api/scan/<id>/diff does.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.scan_read import get_scan_subdomain_names, get_scan_live_hosts
+from reconaug.utils.scan_diff import get_diff_page, count_diff, DIFF_CHANGES
+
+def before(base, scan):
+    old_names, new_names = set(get_scan_subdomain_names(base)), set(get_scan_subdomain_names(scan))
+    old_hosts = {host['url']: host for host in get_scan_live_hosts(base)}
+    new_hosts = {host['url']: host for host in get_scan_live_hosts(scan)}
+    changed = [url for url, host in new_hosts.items() if url in old_hosts and (
+        old_hosts[url]['status_code'], old_hosts[url]['technology']) != (host['status_code'], host['technology'])]
+    return {
+        'subdomains_added': len(new_names - old_names),
+        'subdomains_removed': len(old_names - new_names),
+        'live_hosts_added': len(new_hosts.keys() - old_hosts.keys()),
+        'live_hosts_removed': len(old_hosts.keys() - new_hosts.keys()),
+        'live_hosts_changed': len(changed)
+    }
+
+def after(base, scan):
+    counts = count_diff(base, scan)
+    for change in DIFF_CHANGES:
+        get_diff_page(base, scan, change)
+    return counts
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def hosts(start, count):
+    return [{'url': f"https://host{i}.example.com", 'status_code': '500' if i % 100 == 0 else '200',
+             'technology': 'nginx'} for i in range(start, start + count)]
+
+if __name__ == "__main__":
+    subdomain_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    storage = sys.argv[3] if len(sys.argv) > 3 else 'rows'
+    churn = max(1, subdomain_count // 100)
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'ASSET_STORAGE': storage})
+        with app.app_context():
+            base_id = insert_scan(
+                'example.com',
+                [f"host{i}.example.com" for i in range(subdomain_count)],
+                [{**host, 'status_code': '200'} for host in hosts(0, host_count)]
+            )
+            scan_id = insert_scan(
+                'example.com',
+                [f"host{i}.example.com" for i in range(churn, subdomain_count + churn)],
+                hosts(churn // 2, host_count)
+            )
+            db.session.commit()
+            base, scan = db.session.get(Scan, base_id), db.session.get(Scan, scan_id)
+
+            expected = before(base, scan)
+            counts = after(base, scan)
+            assert all(counts[change] == count for change, count in expected.items()), (expected, counts)
+
+            results = {
+                'load both scans, diff in Python (before)': measure(lambda: before(base, scan)),
+                'SQL counts + first pages (after)': measure(lambda: after(base, scan)),
+            }
+
+        print(f"\nDiffing two scans of {subdomain_count} subdomains and {host_count} live hosts ({storage}):")
+        print(', '.join(f"{change}={count}" for change, count in counts.items()))
+        for name, elapsed in results.items():
+            print(f"{name:>42}: {elapsed:8.1f}ms")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compare scan history and debug listings: per-scan COUNT queries vs the stats table.
+
+Usage: python benchmarks/bench_scan_stats.py [scans] [subdomains_per_scan] [hosts_per_scan]
+
+"before" reproduces the old endpoints: /api/scan-history loaded every scan
+and /api/debug/database ran two COUNT(*) queries per scan. "after" requests
+the first page of each endpoint, which reads counts from scan_stats.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan, Subdomain, LiveHost
+from reconaug.utils.bulk import insert_scan
+
+def populate(scan_count, subdomain_count, host_count):
+    subdomains = [f"host{i}.example.com" for i in range(subdomain_count)]
+    live_hosts = [{'url': f"https://host{i}.example.com", 'status_code': '200', 'technology': 'nginx'}
+                  for i in range(host_count)]
+    for i in range(scan_count):
+        insert_scan(f"example{i % 50}.com", subdomains, live_hosts)
+        if i % 100 == 99:
+            db.session.commit()
+    db.session.commit()
+
+def old_history():
+    return [scan.to_dict() for scan in Scan.query.order_by(Scan.timestamp.desc()).all()]
+
+def old_debug():
+    scan_data = []
+    for scan in Scan.query.all():
+        scan_info = scan.to_dict()
+        scan_info['subdomains_count_actual'] = Subdomain.query.filter_by(scan_id=scan.id).count()
+        scan_info['live_hosts_count_actual'] = LiveHost.query.filter_by(scan_id=scan.id).count()
+        scan_data.append(scan_info)
+    return scan_data
+
+def measure(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    scan_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    subdomain_count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    host_count = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            populate(scan_count, subdomain_count, host_count)
+            results = {
+                'history, all scans (before)': measure(old_history),
+                'debug, 2 COUNTs per scan (before)': measure(old_debug, repeat=1),
+            }
+            db.session.remove()
+
+        client = app.test_client()
+        results['history, first page (after)'] = measure(lambda: client.get('/api/scan-history'))
+        cursor = client.get('/api/scan-history?limit=500').get_json()['next_cursor']
+        results['history, second page (after)'] = measure(
+            lambda: client.get(f'/api/scan-history?limit=500&cursor={cursor}')
+        )
+        results['debug, first page (after)'] = measure(lambda: client.get('/api/debug/database'))
+
+        print(f"\n{scan_count} scans of {subdomain_count} subdomains / {host_count} live hosts:")
+        for name, elapsed in results.items():
+            print(f"{name:>36}: {elapsed:9.1f}ms")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
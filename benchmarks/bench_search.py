@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compare substring search over historical URLs: FTS5 trigram index vs LIKE.
+
+Usage: python benchmarks/bench_search.py [url_count]
+
+Pass 10000000 for the 10M-URL corpus; the default is smaller so the
+benchmark finishes in a couple of minutes.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_url_store import generate_urls
+from reconaug import create_app, db
+from reconaug.models import Scan, HistoricalUrl
+from reconaug.utils.search import search
+from reconaug.utils.url_store import url_fields
+
+TERMS = ['admin', '.bak', 'token=', 'checkout/api', 'db_backup.sql']
+
+# Rare URLs inserted first (lowest ids) so LIKE has to scan the whole table to reach them
+NEEDLES = [f"https://www.example.com/old/db_backup.sql?v={i}" for i in range(10)]
+
+def time_query(func, repeat=3):
+    """Return the best wall-clock time of func() over a few runs, in milliseconds"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            scan = Scan(domain='example.com')
+            db.session.add(scan)
+            db.session.commit()
+
+            print(f"Inserting {count} URLs (the FTS index is maintained by triggers)...")
+            start = time.perf_counter()
+            db.session.execute(db.insert(HistoricalUrl), [
+                dict(scan_id=scan.id, url=url, **url_fields(url)) for url in NEEDLES
+            ])
+            chunk = 100000
+            for offset in range(0, count, chunk):
+                urls = generate_urls(min(chunk, count - offset), seed=offset)
+                db.session.execute(db.insert(HistoricalUrl), [
+                    dict(scan_id=scan.id, url=url, **url_fields(url)) for url in urls
+                ])
+                db.session.commit()
+            print(f"Ingest took {time.perf_counter() - start:.1f}s, database is "
+                  f"{os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+            for term in TERMS:
+                fts_ms, (results, _) = time_query(lambda: search(term, limit=50))
+                like_ms, _ = time_query(lambda: db.session.execute(
+                    db.text("SELECT id, url FROM historical_url WHERE url LIKE :like ORDER BY id DESC LIMIT 50"),
+                    {'like': f"%{term}%"}
+                ).all())
+                fts_count_ms, fts_total = time_query(lambda: db.session.execute(
+                    db.text("SELECT count(*) FROM historical_url_fts WHERE historical_url_fts MATCH :match"),
+                    {'match': f'"{term}"'}
+                ).scalar(), repeat=1)
+                like_count_ms, _ = time_query(lambda: db.session.execute(
+                    db.text("SELECT count(*) FROM historical_url WHERE url LIKE :like"),
+                    {'like': f"%{term}%"}
+                ).scalar(), repeat=1)
+                print(f"{term!r:>16}: first page FTS5 {fts_ms:8.1f}ms  LIKE {like_ms:8.1f}ms | "
+                      f"all {fts_total} matches FTS5 {fts_count_ms:8.1f}ms  LIKE {like_count_ms:8.1f}ms")
+
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        os.remove(path)
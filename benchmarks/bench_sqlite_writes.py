@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Concurrent scan saves against SQLite: default settings vs WAL + single writer.
+
+Usage: python benchmarks/bench_sqlite_writes.py [processes] [threads] [scans_per_thread]
+
+Several processes (standing in for the web app and Celery workers), each
+with several threads, save scans into the same database file while a
+reader in the parent process keeps querying it. Reports failed saves
+("database is locked"), throughput and the worst read latency.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_url_store import generate_urls
+from reconaug import create_app, db
+
+MODES = {
+    # pysqlite's own 5s lock timeout and the rollback journal, as before
+    'default': {'SQLITE_WAL': False, 'SQLITE_BUSY_TIMEOUT': 5000, 'DB_WRITE_QUEUE': False},
+    'wal+writer': {'SQLITE_WAL': True, 'SQLITE_BUSY_TIMEOUT': 30000, 'DB_WRITE_QUEUE': True},
+}
+
+def worker(config, process_index, threads, scans_per_thread, results):
+    """Save scans from several threads and report (saved, failed) to the parent"""
+    from reconaug.utils.database import save_scan_to_database
+
+    app = create_app(config)
+    counts = {'saved': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def save_scans(thread_index):
+        with app.app_context():
+            for i in range(scans_per_thread):
+                domain = f"p{process_index}t{thread_index}s{i}.example.com"
+                subdomains = [f"h{j}.{domain}" for j in range(200)]
+                live_hosts = [{'url': f"https://h{j}.{domain}", 'status_code': '200', 'technology': 'nginx'}
+                              for j in range(50)]
+                scan_id = save_scan_to_database(domain, subdomains, live_hosts, generate_urls(2000, seed=i))
+                with lock:
+                    counts['saved' if scan_id else 'failed'] += 1
+
+    pool = [threading.Thread(target=save_scans, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((counts['saved'], counts['failed']))
+
+def run(mode, processes, threads, scans_per_thread):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    config = dict(MODES[mode], SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    try:
+        app = create_app(config)
+        results = multiprocessing.Queue()
+        stop = threading.Event()
+        latencies = []
+
+        def read_loop():
+            with app.app_context():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        db.session.execute(db.text("SELECT count(*) FROM scan")).scalar()
+                    except Exception:
+                        pass
+                    db.session.remove()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    time.sleep(0.01)
+
+        reader = threading.Thread(target=read_loop)
+        reader.start()
+        start = time.perf_counter()
+        pool = [multiprocessing.Process(target=worker, args=(config, p, threads, scans_per_thread, results))
+                for p in range(processes)]
+        for process in pool:
+            process.start()
+        saved = failed = 0
+        for _ in pool:
+            s, f = results.get()
+            saved += s
+            failed += f
+        for process in pool:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reader.join()
+
+        with app.app_context():
+            stored = db.session.execute(db.text("SELECT count(*) FROM scan")).scalar()
+            db.engine.dispose()
+        latencies.sort()
+        print(f"{mode:>10}: {saved} saved, {failed} failed, {stored} in database, "
+              f"{saved / elapsed:.1f} scans/s, read p50 {latencies[len(latencies) // 2]:.1f}ms "
+              f"max {latencies[-1]:.1f}ms")
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    scans_per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    for mode in MODES:
+        run(mode, processes, threads, scans_per_thread)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Measure per-task Flask/database overhead: create_app() per call vs the shared worker app.
+
+Usage: python benchmarks/bench_task_overhead.py [task_count]
+
+"before" reproduces the old pattern: FlaskTask built an app for every task
+and the save helper built another one inside it. "after" calls a task
+through FlaskTask, which reuses the process's app, engine and pool. Both do
+the same trivial query, so the difference is pure overhead.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.celery_app import celery
+from reconaug.utils.database import ensure_app_context
+
+@celery.task(bind=True)
+def overhead_probe(self):
+    # Mirrors a task calling a save helper from reconaug.utils.celery_db
+    with ensure_app_context():
+        return db.session.execute(db.text('SELECT 1')).scalar()
+
+def before(config):
+    app = create_app(config)
+    with app.app_context():
+        helper_app = create_app(config)
+        with helper_app.app_context():
+            return db.session.execute(db.text('SELECT 1')).scalar()
+
+def measure(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) * 1000 / count
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        config = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}
+        celery.flask_app = create_app(config)  # what the worker_process_init hook does
+
+        before_ms = measure(lambda: before(config), count)
+        celery.flask_app = create_app(config)
+        after_ms = measure(overhead_probe, count)
+
+        print(f"\nPer-task overhead over {count} tasks:")
+        print(f"  before (create_app per call): {before_ms:8.2f}ms")
+        print(f"  after (shared worker app):    {after_ms:8.2f}ms")
+        print(f"  {before_ms / after_ms:.0f}x less overhead")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Compare historical URL storage: one row per URL vs compressed URL blocks.
+
+Usage: python benchmarks/bench_url_store.py [url_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reconaug import create_app, db
+from reconaug.models import Scan
+from reconaug.utils.url_store import save_scan_urls, get_scan_urls, iter_block_urls
+
+def generate_urls(count, seed=1):
+    """Generate gau-like URLs spread over a handful of hosts"""
+    rng = random.Random(seed)
+    hosts = [f"{name}.example.com" for name in ('www', 'api', 'cdn', 'shop', 'blog', 'admin', 'static', 'm')]
+    words = ['index', 'login', 'search', 'products', 'assets', 'images', 'js', 'css', 'user', 'account',
+             'cart', 'checkout', 'api', 'v1', 'v2', 'docs', 'help', 'about', 'static', 'media']
+    extensions = ['', '', '', '.php', '.html', '.js', '.css', '.png', '.json', '.bak']
+    params = ['', '', '?id=', '?q=', '?page=', '?token=', '?utm_source=']
+
+    urls = []
+    for _ in range(count):
+        path = '/'.join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        param = rng.choice(params)
+        if param:
+            param += str(rng.randint(1, 100000))
+        urls.append(f"https://{rng.choice(hosts)}/{path}{rng.choice(extensions)}{param}")
+    return urls
+
+def run_backend(backend, urls):
+    """Store and read back the URLs with one backend, returning timings and size"""
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'HISTORICAL_URL_STORAGE': backend
+        })
+        with app.app_context():
+            db.create_all()
+            scan = Scan(domain='example.com')
+            db.session.add(scan)
+            db.session.flush()
+
+            start = time.perf_counter()
+            save_scan_urls(scan.id, urls)
+            db.session.commit()
+            write_time = time.perf_counter() - start
+
+            db.session.execute(db.text('VACUUM'))
+            size = os.path.getsize(path)
+
+            start = time.perf_counter()
+            read_back = get_scan_urls(scan.id)
+            read_time = time.perf_counter() - start
+
+            # Read a 100-URL page from the middle of the scan
+            middle = sorted(read_back)[len(read_back) // 2]
+            start = time.perf_counter()
+            if backend == 'blocks':
+                page = []
+                for url in iter_block_urls(scan.id, start_after=middle):
+                    page.append(url)
+                    if len(page) == 100:
+                        break
+            else:
+                from reconaug.models import HistoricalUrl
+                page = [u for (u,) in db.session.query(HistoricalUrl.url)
+                        .filter(HistoricalUrl.scan_id == scan.id, HistoricalUrl.url > middle)
+                        .order_by(HistoricalUrl.url).limit(100)]
+            page_time = time.perf_counter() - start
+
+            db.session.remove()
+            db.engine.dispose()
+
+        return {
+            'backend': backend,
+            'stored': len(read_back),
+            'size_mb': size / (1024 * 1024),
+            'write_s': write_time,
+            'read_all_s': read_time,
+            'read_page_ms': page_time * 1000
+        }
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Generating {count} URLs...")
+    urls = generate_urls(count)
+
+    for backend in ('rows', 'blocks'):
+        result = run_backend(backend, urls)
+        print(f"{result['backend']:>6}: {result['stored']} URLs, {result['size_mb']:.2f} MB on disk, "
+              f"write {result['write_s']:.2f}s, read all {result['read_all_s']:.2f}s, "
+              f"read 100-URL page {result['read_page_ms']:.1f}ms")
@@ -1,4 +1,9 @@
-from celery import Celery
+import os
+import threading
+from celery import Celery, states
+from celery.backends.redis import RedisBackend
+from kombu import Queue
+from celery.signals import worker_init, worker_process_init
 from flask import Flask
 
 # Create Celery app
@@ -9,6 +14,21 @@ celery = Celery(
     include=['reconaug.tasks']
 )
 
+# Queues, so that long scans cannot starve quick interactive lookups. Each
+# is served by its own workers in docker-compose.yml; a worker started
+# without -Q serves all of them.
+INTERACTIVE_QUEUE = 'interactive'
+SCAN_QUEUE = 'scans'
+MAINTENANCE_QUEUE = 'maintenance'
+
+# Message priorities within a queue. The Redis transport serves the LOWEST
+# number first, so the stages of scans already running (0-3) are taken
+# before a newly submitted scan (6) starts.
+PRIORITY_URGENT = 0
+PRIORITY_RUNNING_SCAN = 3
+PRIORITY_DEFAULT = 5
+PRIORITY_NEW_SCAN = 6
+
 # Configure Celery
 celery.conf.update(
     task_serializer='json',
@@ -21,18 +41,123 @@ celery.conf.update(
     task_track_started=True,
     task_time_limit=3600,  # 1 hour
     task_soft_time_limit=3540,  # 59 minutes
+    # Results and progress are kept in Redis this long. Tasks return
+    # summaries pointing to data saved in the database, so they stay small.
+    result_expires=int(os.environ.get('RECONAUG_RESULT_EXPIRES', str(6 * 3600))),
+    task_queues=(
+        Queue(INTERACTIVE_QUEUE),
+        Queue(SCAN_QUEUE),
+        Queue(MAINTENANCE_QUEUE),
+    ),
+    # Tasks that are not routed below (e.g. Celery's own chord helpers) are
+    # treated as heavy work
+    task_default_queue=SCAN_QUEUE,
+    task_default_priority=PRIORITY_DEFAULT,
+    task_routes={
+        # Lookups a user is waiting for on the scan details page
+        'reconaug.tasks.run_gau_task': {'queue': INTERACTIVE_QUEUE, 'priority': PRIORITY_URGENT},
+        'reconaug.tasks.run_port_scan_task': {'queue': INTERACTIVE_QUEUE, 'priority': PRIORITY_URGENT},
+        'reconaug.tasks.identify_port_services_task': {'queue': INTERACTIVE_QUEUE, 'priority': PRIORITY_URGENT},
+        'reconaug.tasks.diff_scans_task': {'queue': INTERACTIVE_QUEUE, 'priority': PRIORITY_URGENT},
+        # Full scans and their workflow stages
+        'reconaug.tasks.run_scan_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_NEW_SCAN},
+        'reconaug.tasks.discover_subdomains_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_RUNNING_SCAN},
+        'reconaug.tasks.probe_subdomains_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_RUNNING_SCAN},
+        'reconaug.tasks.probe_hosts_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_RUNNING_SCAN},
+        'reconaug.tasks.save_scan_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_URGENT},
+        'reconaug.tasks.run_bulk_port_scan_task': {'queue': SCAN_QUEUE, 'priority': PRIORITY_NEW_SCAN},
+        # Periodic housekeeping
+        'reconaug.tasks.archive_scans_task': {'queue': MAINTENANCE_QUEUE},
+    },
+    broker_transport_options={
+        # One Redis list per priority (the default is only 0, 3, 6 and 9)
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
+    # Periodic jobs, run when celery beat is started
+    beat_schedule={
+        'archive-old-scans': {
+            'task': 'reconaug.tasks.archive_scans_task',
+            'schedule': 24 * 3600,
+        },
+    },
 )
 
+def get_redis_client():
+    """Return the Redis client of the result backend, or None for other backends
+
+    Shared coordination state (workflow counters, single-flight locks)
+    lives next to the task results.
+    """
+    if not isinstance(celery.backend, RedisBackend):
+        return None
+    return celery.backend.client
+
+_flask_app_lock = threading.Lock()
+
+def get_flask_app():
+    """Return the process's Flask app, creating it on first use
+
+    In the web process this is the app that registered Celery; in a worker
+    it is built once in the main process (by the worker_init hook), inherited
+    by the pool processes and shared by every task, so the engine and its
+    connection pool are reused.
+    """
+    app = getattr(celery, 'flask_app', None)
+    if app is None:
+        with _flask_app_lock:
+            app = getattr(celery, 'flask_app', None)
+            if app is None:
+                from reconaug import create_app
+                app = create_app()  # registers itself as celery.flask_app
+    return app
+
+@worker_init.connect
+def init_worker_parent_app(**kwargs):
+    """Build the Flask app, and so migrate the schema, once in the worker's main process
+
+    Prefork pool processes inherit the app rather than each running the
+    migrations again on start.
+    """
+    from reconaug import db
+    app = get_flask_app()
+    with app.app_context():
+        # Pool processes open their own connections
+        db.engine.dispose()
+
+@worker_process_init.connect
+def init_worker_app(**kwargs):
+    """Set up the Flask app inherited from the main process once per worker process instead of once per task"""
+    from reconaug import db
+    app = get_flask_app()
+    with app.app_context():
+        # Connections inherited from the parent over fork must not be shared
+        db.engine.dispose(close=False)
+
 # Define a base task class that ensures we have an app context
 class FlaskTask(celery.Task):
     abstract = True
 
     def __call__(self, *args, **kwargs):
-        from reconaug import create_app
-        app = create_app()
-        with app.app_context():
+        # Each task runs in its own app context, so it gets a fresh scoped
+        # session that is removed again when the context is popped
+        with get_flask_app().app_context():
             return self.run(*args, **kwargs)
 
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        # Also push the change to the browsers watching the task
+        # (see reconaug.utils.progress)
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        from reconaug.utils.progress import publish_progress
+        publish_progress(task_id or self.request.id, state, meta)
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        # The final result or error ends the watchers' event streams
+        if status in (states.SUCCESS, states.FAILURE):
+            from reconaug.utils.progress import publish_progress
+            publish_progress(task_id, status, retval if status == states.SUCCESS else str(retval))
+
 # Set the default task base class
 celery.Task = FlaskTask
 
@@ -0,0 +1,64 @@
+import click
+from flask.cli import with_appcontext
+from reconaug.utils.export import export_scan, EXPORT_KINDS, EXPORT_FORMATS
+from reconaug.utils.archive import (
+    archive_scan, archive_old_scans, scans_due_for_archive, compact_database, get_scan_or_archive
+)
+
+@click.command('export')
+@click.argument('scan_id', type=int)
+@click.argument('kind', type=click.Choice(list(EXPORT_KINDS)))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write to (default: standard output)')
+@with_appcontext
+def export_command(scan_id, kind, fmt, output):
+    """Export the subdomains, live hosts, ports or historical URLs of a scan
+
+    Rows are streamed from the database (or an archived scan's files), so
+    large scans can be exported without loading them into memory, e.g.:
+
+        flask --app new_app export 42 urls --format csv -o urls.csv
+    """
+    scan = get_scan_or_archive(scan_id)
+    if scan is None:
+        raise click.ClickException(f"Scan {scan_id} not found")
+    for chunk in export_scan(scan, kind, fmt):
+        output.write(chunk)
+
+@click.command('archive')
+@click.option('--days', type=int, help='Archive scans older than this many days (default: SCAN_RETENTION_DAYS)')
+@click.option('--keep', type=int, help='Newest scans of each domain to keep live (default: SCAN_RETENTION_KEEP)')
+@click.option('--scan', 'scan_ids', type=int, multiple=True, help='Archive these scans instead of applying the policy')
+@click.option('--dry-run', is_flag=True, help='Only list the scans that would be archived')
+@click.option('--no-compact', is_flag=True, help='Do not VACUUM the database afterwards')
+@with_appcontext
+def archive_command(days, keep, scan_ids, dry_run, no_compact):
+    """Move old scans to compressed archives on disk and compact the database
+
+    Archived scans stay readable from the scan details and diff endpoints,
+    e.g.:
+
+        flask --app new_app archive --days 30 --keep 2
+    """
+    if dry_run:
+        for scan_id in scan_ids or scans_due_for_archive(days, keep):
+            click.echo(scan_id)
+        return
+
+    if scan_ids:
+        for scan_id in scan_ids:
+            try:
+                archive = archive_scan(scan_id)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            click.echo(f"Archived scan {scan_id} to {archive['size']} bytes")
+        if not no_compact:
+            click.echo(f"Compacted the database: {compact_database()} bytes freed")
+        return
+
+    result = archive_old_scans(days, keep, compact=not no_compact)
+    for scan_id, reason in result['skipped'].items():
+        click.echo(f"Skipped scan {scan_id}: {reason}", err=True)
+    click.echo(f"Archived {len(result['archived'])} scans; database size "
+               f"{result['size_before']} -> {result['size_after']} bytes")
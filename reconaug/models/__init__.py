@@ -1,2 +1,2 @@
 # Import models to make them available when importing the package
-from reconaug.models.scan import Scan, Subdomain, LiveHost, Port, HistoricalUrl
+from reconaug.models.scan import Scan, Subdomain, LiveHost, Port, HistoricalUrl, HistoricalUrlBlock, UrlFingerprint, PortScanCache, ScanAsset, ScanStats, ScanArchive
@@ -1,6 +1,13 @@
+import json
 from datetime import datetime
+from sqlalchemy.dialects import postgresql
 from reconaug import db
 
+# Text that compares and sorts by code point on every database, as URL path
+# prefix ranges and URL block cursors assume: SQLite's default BINARY
+# collation already does, PostgreSQL needs the "C" collation
+CodepointText = db.Text().with_variant(postgresql.TEXT(collation='C'), 'postgresql')
+
 class Scan(db.Model):
     """Main scan information"""
     id = db.Column(db.Integer, primary_key=True)
@@ -9,11 +16,23 @@ class Scan(db.Model):
     status = db.Column(db.String(50), default='complete')
     subdomains_count = db.Column(db.Integer, default=0)
     live_hosts_count = db.Column(db.Integer, default=0)
+    # 'rows': subdomains and live hosts stored per scan; 'inventory': shared
+    # per-domain rows with ScanAsset observations (see reconaug.utils.inventory)
+    asset_storage = db.Column(db.String(16), default='rows')
+    # True: historical URLs are rows shared by the domain's delta scans, with
+    # ScanAsset 'url' observations (see reconaug.utils.url_store)
+    url_delta = db.Column(db.Boolean, default=False)
     
     # Relationships
     subdomains = db.relationship('Subdomain', backref='scan', lazy=True, cascade='all, delete-orphan')
     live_hosts = db.relationship('LiveHost', backref='scan', lazy=True, cascade='all, delete-orphan')
     historical_urls = db.relationship('HistoricalUrl', backref='scan', lazy=True, cascade='all, delete-orphan')
+    historical_url_blocks = db.relationship('HistoricalUrlBlock', backref='scan', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_scan_domain_timestamp', 'domain', 'timestamp'),
+        db.Index('ix_scan_timestamp', 'timestamp'),
+    )
     
     def __repr__(self):
         return f'<Scan {self.domain} at {self.timestamp}>'
@@ -34,6 +53,10 @@ class Subdomain(db.Model):
     scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     source = db.Column(db.String(50))  # subfinder, crtsh, chaos, sublist3r
+
+    __table_args__ = (
+        db.Index('ix_subdomain_scan_name', 'scan_id', 'name', unique=True),
+    )
     
     def __repr__(self):
         return f'<Subdomain {self.name}>'
@@ -56,6 +79,11 @@ class LiveHost(db.Model):
     
     # Relationships
     ports = db.relationship('Port', backref='host', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_live_host_scan_url', 'scan_id', 'url', unique=True),
+        db.Index('ix_live_host_url', 'url'),
+    )
     
     def __repr__(self):
         return f'<LiveHost {self.url}>'
@@ -70,11 +98,24 @@ class LiveHost(db.Model):
         }
 
 class Port(db.Model):
-    """Port information"""
+    """Port information
+
+    Each row belongs to the scan whose port scan found it. Under inventory
+    storage a LiveHost row is shared by every scan of its domain, so a
+    later port scan adds rows for the later scan instead of changing what
+    earlier scans report.
+    """
     id = db.Column(db.Integer, primary_key=True)
     host_id = db.Column(db.Integer, db.ForeignKey('live_host.id'), nullable=False)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
     port_number = db.Column(db.Integer, nullable=False)
     service = db.Column(db.String(50))
+    confidence = db.Column(db.Float)  # 0-1, banner match vs port-table guess
+
+    __table_args__ = (
+        db.Index('ix_port_scan_host_port', 'scan_id', 'host_id', 'port_number', unique=True),
+        db.Index('ix_port_host', 'host_id'),
+    )
     
     def __repr__(self):
         return f'<Port {self.port_number}>'
@@ -83,8 +124,10 @@ class Port(db.Model):
         return {
             'id': self.id,
             'host_id': self.host_id,
+            'scan_id': self.scan_id,
             'port_number': self.port_number,
-            'service': self.service
+            'service': self.service,
+            'confidence': self.confidence
         }
 
 class HistoricalUrl(db.Model):
@@ -92,6 +135,18 @@ class HistoricalUrl(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
     url = db.Column(db.Text, nullable=False)
+
+    # Fields derived from the URL for server-side filtering and keyset pagination
+    host = db.Column(db.String(255))
+    path = db.Column(CodepointText)
+    extension = db.Column(db.String(16))
+    has_params = db.Column(db.Boolean)
+
+    __table_args__ = (
+        db.Index('ix_historical_url_scan_path', 'scan_id', 'path', 'id'),
+        db.Index('ix_historical_url_scan_host_path', 'scan_id', 'host', 'path', 'id'),
+        db.Index('ix_historical_url_scan_ext_path', 'scan_id', 'extension', 'path', 'id'),
+    )
     
     def __repr__(self):
         return f'<HistoricalUrl {self.url[:50]}...>'
@@ -100,5 +155,193 @@ class HistoricalUrl(db.Model):
         return {
             'id': self.id,
             'scan_id': self.scan_id,
-            'url': self.url
+            'url': self.url,
+            'host': self.host,
+            'path': self.path,
+            'extension': self.extension,
+            'has_params': self.has_params
+        }
+
+class HistoricalUrlBlock(db.Model):
+    """Compressed block of sorted historical URLs for a scan"""
+    id = db.Column(db.Integer, primary_key=True)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
+    block_index = db.Column(db.Integer, nullable=False)
+    first_url = db.Column(CodepointText, nullable=False)
+    last_url = db.Column(CodepointText, nullable=False)
+    url_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    # Summaries of the block's URLs, so filtered reads skip blocks without
+    # decompressing them: newline-delimited hosts and extensions (with a
+    # newline at each end) and the number of URLs with a query string.
+    # NULL for blocks stored before they existed, which are always read.
+    hosts = db.Column(db.Text)
+    extensions = db.Column(db.Text)
+    param_urls = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('ix_historical_url_block_scan_block', 'scan_id', 'block_index', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<HistoricalUrlBlock scan={self.scan_id} block={self.block_index} urls={self.url_count}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'scan_id': self.scan_id,
+            'block_index': self.block_index,
+            'first_url': self.first_url,
+            'last_url': self.last_url,
+            'url_count': self.url_count,
+            'size': len(self.data)
+        }
+
+class UrlFingerprint(db.Model):
+    """64-bit fingerprint of a historical URL seen for a domain, with first/last sighting"""
+    id = db.Column(db.Integer, primary_key=True)
+    domain = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.BigInteger, nullable=False)
+    first_seen_scan_id = db.Column(db.Integer, nullable=False)
+    last_seen_scan_id = db.Column(db.Integer, nullable=False)
+    url_id = db.Column(db.Integer)  # shared HistoricalUrl row of delta scans, if stored
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_url_fingerprint_domain_fingerprint', 'domain', 'fingerprint', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<UrlFingerprint {self.domain} {self.fingerprint:#x}>'
+
+    def to_dict(self):
+        return {
+            'first_seen_scan_id': self.first_seen_scan_id,
+            'last_seen_scan_id': self.last_seen_scan_id,
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+
+class PortScanCache(db.Model):
+    """Most recent port scan result for an IP address"""
+    id = db.Column(db.Integer, primary_key=True)
+    ip = db.Column(db.String(45), nullable=False, unique=True)
+    ports = db.Column(db.Text, nullable=False)  # JSON list of open ports
+    source_host = db.Column(db.String(255))
+    scanned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<PortScanCache {self.ip} at {self.scanned_at}>'
+
+    def to_dict(self):
+        return {
+            'ip': self.ip,
+            'ports': json.loads(self.ports),
+            'source_host': self.source_host,
+            'scanned_at': self.scanned_at.isoformat()
+        }
+
+class ScanAsset(db.Model):
+    """Observation of a subdomain, live host or URL across a run of consecutive scans of a domain
+
+    Used by inventory asset storage, where each Subdomain/LiveHost row is
+    unique per domain, and by delta URL storage, where each HistoricalUrl
+    row is shared by the domain's delta scans. An asset belongs to every
+    scan of the domain with first_scan_id <= scan.id <= last_scan_id (of
+    the same storage); an unchanged rescan just moves last_scan_id
+    forward, so storage grows with change rather than scans.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    domain = db.Column(db.String(255), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # subdomain, live_host, url
+    asset_id = db.Column(db.Integer, nullable=False)  # Subdomain.id, LiveHost.id or HistoricalUrl.id
+    first_scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
+    last_scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), nullable=False)
+    status_code = db.Column(db.String(10))
+    technology = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_scan_asset_domain_kind_last', 'domain', 'kind', 'last_scan_id'),
+        db.Index('ix_scan_asset_kind_asset', 'kind', 'asset_id'),
+    )
+
+    def __repr__(self):
+        return f'<ScanAsset {self.kind} {self.asset_id} scans {self.first_scan_id}-{self.last_scan_id}>'
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'asset_id': self.asset_id,
+            'first_scan_id': self.first_scan_id,
+            'last_scan_id': self.last_scan_id,
+            'status_code': self.status_code,
+            'technology': self.technology
+        }
+
+class ScanStats(db.Model):
+    """Counts for a scan, maintained on ingest so listings never count child rows
+
+    Updated in the same transaction as the data it describes (see
+    reconaug.utils.scan_stats). Ports count towards the scan whose port
+    scan found them (Port.scan_id).
+    """
+    scan_id = db.Column(db.Integer, db.ForeignKey('scan.id'), primary_key=True)
+    subdomains = db.Column(db.Integer, nullable=False, default=0)
+    live_hosts = db.Column(db.Integer, nullable=False, default=0)
+    ports = db.Column(db.Integer, nullable=False, default=0)
+    urls = db.Column(db.Integer, nullable=False, default=0)
+    status_codes = db.Column(db.Text, nullable=False, default='{}')  # JSON {status code: live hosts}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ScanStats scan={self.scan_id}>'
+
+    def to_dict(self):
+        return {
+            'subdomains': self.subdomains,
+            'live_hosts': self.live_hosts,
+            'ports': self.ports,
+            'urls': self.urls,
+            'status_codes': json.loads(self.status_codes),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ScanArchive(db.Model):
+    """A scan moved out of the live tables into compressed files on disk
+
+    Keeps the scan's id, summary and stats, so archived scans can still be
+    listed, read and diffed (see reconaug.utils.archive) while their rows
+    are gone from the database.
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # the original Scan.id
+    domain = db.Column(db.String(255), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(50))
+    subdomains_count = db.Column(db.Integer, default=0)
+    live_hosts_count = db.Column(db.Integer, default=0)
+    stats = db.Column(db.Text, nullable=False, default='{}')  # JSON ScanStats.to_dict()
+    path = db.Column(db.Text, nullable=False)  # directory relative to SCAN_ARCHIVE_DIR
+    size = db.Column(db.BigInteger, nullable=False, default=0)  # bytes on disk
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_scan_archive_domain_timestamp', 'domain', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f'<ScanArchive {self.domain} at {self.timestamp}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'domain': self.domain,
+            'timestamp': self.timestamp.isoformat(),
+            'status': self.status,
+            'subdomains_count': self.subdomains_count,
+            'live_hosts_count': self.live_hosts_count,
+            'archived': True,
+            'archived_at': self.archived_at.isoformat(),
+            'size': self.size
         }
@@ -1,11 +1,28 @@
-from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
-import time
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, abort
+import json
 from reconaug import db
-from reconaug.models import Scan, Subdomain, LiveHost, Port, HistoricalUrl
+from reconaug.models import Scan, Subdomain, LiveHost, Port, HistoricalUrl, HistoricalUrlBlock, UrlFingerprint, PortScanCache, ScanAsset, ScanStats, ScanArchive
 from reconaug.tools.checker import check_tools
-from reconaug.tools.scanner import get_historical_urls, scan_ports
+from reconaug.tools.scanner import get_historical_urls, clean_host
 from reconaug.utils.database import save_ports_to_database
+from reconaug.utils.port_cache import scan_ports_cached
 from reconaug.utils.task_manager import task_manager
+from reconaug.utils.writer import run_write
+from reconaug.utils.search import search
+from reconaug.utils.schema import get_schema_version
+from reconaug.utils.scan_read import (
+    get_scan_subdomain_names, get_scan_live_hosts, get_scan_subdomain_page, get_scan_live_host_page,
+    find_port_scan_host, DEFAULT_ASSET_PAGE_SIZE
+)
+from reconaug.utils.scan_stats import get_scan_history_page, DEFAULT_HISTORY_PAGE_SIZE
+from reconaug.utils.export import export_scan, EXPORT_FORMATS
+from reconaug.utils.archive import (
+    get_scan_or_archive, get_archive_url_page, get_archived_scan_page, DEFAULT_ARCHIVE_PAGE_SIZE
+)
+from reconaug.utils.scan_diff import get_base_scan, get_diff_page, count_diff, DEFAULT_DIFF_PAGE_SIZE
+from reconaug.utils.url_store import (
+    get_scan_url_page, count_scan_urls, save_scan_urls, get_url_seen_info, DEFAULT_PAGE_SIZE
+)
 
 api_bp = Blueprint('api', __name__)
 
@@ -18,9 +35,9 @@ def tools():
 def scan_details_api(scan_id):
     """API endpoint to get details of a specific scan"""
     try:
-        scan = Scan.query.get_or_404(scan_id)
-        subdomains = [s.name for s in scan.subdomains]
-        live_hosts = [h.to_dict() for h in scan.live_hosts]
+        scan = get_scan_or_archive(scan_id) or abort(404)
+        subdomains = get_scan_subdomain_names(scan)
+        live_hosts = get_scan_live_hosts(scan)
 
         return jsonify({
             'scan': scan.to_dict(),
@@ -30,45 +47,273 @@ def scan_details_api(scan_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/scan/<int:scan_id>/subdomains')
+def scan_subdomains(scan_id):
+    """Get a page of subdomain names for a specific scan, ordered by name (limit, cursor)"""
+    try:
+        scan = get_scan_or_archive(scan_id) or abort(404)
+        try:
+            subdomains, next_cursor = get_scan_subdomain_page(
+                scan,
+                limit=int(request.args.get('limit', DEFAULT_ASSET_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'subdomains': subdomains,
+            'count': len(subdomains),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/scan/<int:scan_id>/live-hosts')
+def scan_live_hosts(scan_id):
+    """Get a page of live hosts for a specific scan, ordered by URL (limit, cursor)"""
+    try:
+        scan = get_scan_or_archive(scan_id) or abort(404)
+        try:
+            live_hosts, next_cursor = get_scan_live_host_page(
+                scan,
+                limit=int(request.args.get('limit', DEFAULT_ASSET_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'live_hosts': live_hosts,
+            'count': len(live_hosts),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/scan/<int:scan_id>/diff')
+def scan_diff(scan_id):
+    """Count the changes between a scan and a base scan (base, default: the previous scan of the domain)"""
+    try:
+        scan = get_scan_or_archive(scan_id) or abort(404)
+        try:
+            base = get_base_scan(scan, request.args.get('base', type=int))
+            counts = count_diff(base, scan)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'scan_id': scan.id,
+            'base_scan_id': base.id,
+            'domain': scan.domain,
+            'changes': counts
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/scan/<int:scan_id>/diff/<change>')
+def scan_diff_change(scan_id, change):
+    """Get a page of one change between a scan and a base scan (base, limit, cursor)"""
+    try:
+        scan = get_scan_or_archive(scan_id) or abort(404)
+        try:
+            base = get_base_scan(scan, request.args.get('base', type=int))
+            items, next_cursor = get_diff_page(
+                base,
+                scan,
+                change,
+                limit=int(request.args.get('limit', DEFAULT_DIFF_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'scan_id': scan.id,
+            'base_scan_id': base.id,
+            'change': change,
+            'items': items,
+            'count': len(items),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/scan/<int:scan_id>/export/<kind>')
+def export_scan_api(scan_id, kind):
+    """Stream all subdomains, live hosts, ports or historical URLs of a scan as NDJSON or CSV
+
+    The response is sent with chunked transfer encoding as rows are read
+    from the database, or from the archive files of an archived scan, so
+    exports of any size use constant memory.
+    """
+    scan = get_scan_or_archive(scan_id) or abort(404)
+    fmt = request.args.get('format', 'ndjson')
+    kind = kind.replace('-', '_')
+    try:
+        chunks = export_scan(scan, kind, fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    filename = f"{scan.domain}-{scan.id}-{kind}.{fmt}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @api_bp.route('/scan-history')
 def scan_history():
-    """Get scan history"""
-    try:
-        print("Fetching scan history from database...")
-        scans = Scan.query.order_by(Scan.timestamp.desc()).all()
-        print(f"Found {len(scans)} scan records in database")
+    """Get a page of scan history, newest first
 
-        # Convert to dict and log for debugging
-        scan_dicts = [scan.to_dict() for scan in scans]
+    Supports cursor-based pagination (limit, cursor) and an exact domain
+    filter. Each scan includes its stored counts and status code histogram
+    as 'stats'.
+    """
+    try:
+        try:
+            rows, next_cursor = get_scan_history_page(
+                limit=int(request.args.get('limit', DEFAULT_HISTORY_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None,
+                domain=request.args.get('domain', '').strip() or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        scan_dicts = []
+        for scan, stats in rows:
+            scan_info = scan.to_dict()
+            scan_info['stats'] = stats.to_dict() if stats else None
+            scan_dicts.append(scan_info)
         print(f"Returning {len(scan_dicts)} scan records as JSON")
 
         return jsonify({
-            'scans': scan_dicts
+            'scans': scan_dicts,
+            'count': len(scan_dicts),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
     except Exception as e:
         print(f"Error fetching scan history: {e}")
         return jsonify({'error': str(e), 'message': 'Failed to fetch scan history'}), 500
 
+@api_bp.route('/archived-scans')
+def archived_scans():
+    """Get a page of archived scans, newest first (limit, cursor, domain)"""
+    try:
+        try:
+            archives, next_cursor = get_archived_scan_page(
+                limit=int(request.args.get('limit', DEFAULT_ARCHIVE_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None,
+                domain=request.args.get('domain', '').strip() or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'scans': [archive.to_dict() for archive in archives],
+            'count': len(archives),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/scan/<int:scan_id>/historical-urls')
 def scan_historical_urls(scan_id):
-    """Get historical URLs for a specific scan"""
+    """Get a page of historical URLs for a specific scan
+
+    Supports cursor-based pagination (limit, cursor) and server-side filters
+    on host, path_prefix, extension and has_params. With seen=1 each URL's
+    first/last-seen scan and time are included as 'items'.
+    """
+    try:
+        has_params = request.args.get('has_params')
+        if has_params is not None:
+            has_params = has_params.lower() in ('1', 'true', 'yes')
+
+        try:
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+            filters = {
+                'cursor': request.args.get('cursor') or None,
+                'host': request.args.get('host', '').strip() or None,
+                'path_prefix': request.args.get('path_prefix') or None,
+                'extension': request.args.get('extension', '').strip() or None,
+                'has_params': has_params
+            }
+            # Archived scans are read from their archive files with the same filters
+            archive = db.session.get(ScanArchive, scan_id)
+            if archive:
+                urls, next_cursor = get_archive_url_page(archive, limit=limit, **filters)
+            else:
+                urls, next_cursor = get_scan_url_page(scan_id, limit=limit, **filters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = {
+            'urls': urls,
+            'count': len(urls),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+
+        # Optionally include first/last-seen information from the domain's fingerprint index
+        if request.args.get('seen', '').lower() in ('1', 'true', 'yes'):
+            seen_info = get_url_seen_info(scan_id, urls)
+            response['items'] = [dict(url=url, **seen_info.get(url, {})) for url in urls]
+
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/search')
+def search_api():
+    """Full-text search over historical URLs or subdomains across all scans"""
     try:
-        urls = HistoricalUrl.query.filter_by(scan_id=scan_id).all()
+        term = request.args.get('q', '').strip()
+        kind = request.args.get('type', 'urls')
+        scan_id = request.args.get('scan_id', type=int)
+
+        try:
+            results, next_cursor = search(
+                term,
+                kind=kind,
+                scan_id=scan_id,
+                limit=int(request.args.get('limit', 50)),
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         return jsonify({
-            'urls': [url.url for url in urls]
+            'query': term,
+            'type': kind,
+            'results': results,
+            'count': len(results),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _latest_port_scan_id(host_id):
+    """Return the newest scan that recorded ports for a live host, or None"""
+    return db.session.query(db.func.max(Port.scan_id)).filter(Port.host_id == host_id).scalar()
+
 @api_bp.route('/host/<int:host_id>/ports')
 def host_ports(host_id):
-    """Get ports for a specific live host"""
+    """Get ports for a specific live host as found by one scan (scan_id, default: the newest scan with ports)"""
     try:
         host = LiveHost.query.get_or_404(host_id)
+        scan_id = request.args.get('scan_id', type=int) or _latest_port_scan_id(host.id)
         ports = [{
             'port': p.port_number,
-            'service': p.service
-        } for p in host.ports]
+            'service': p.service,
+            'confidence': p.confidence
+        } for p in Port.query.filter_by(host_id=host.id, scan_id=scan_id).order_by(Port.port_number)]
 
         return jsonify({
             'host': host.to_dict(),
@@ -105,33 +350,42 @@ def check_host_ports():
 
         print(f"Checking for host with URLs: {possible_urls}")
 
-        # Try to find the host with any of the possible URLs
-        host = None
+        # Try to find the host in the requested scan (default: the newest scan that found it)
+        found = None
         for url in possible_urls:
-            host = LiveHost.query.filter_by(url=url).first()
-            if host:
+            found = find_port_scan_host(url, request.args.get('scan_id', type=int))
+            if found:
                 print(f"Found host with URL: {url}")
                 break
 
-        if not host:
+        if not found:
             return jsonify({
                 'url': host_url,
                 'has_ports': False,
                 'message': 'Host not found in database'
             })
 
-        # Check if the host has ports
-        ports_count = Port.query.filter_by(host_id=host.id).count()
+        # Check if the host has ports in that scan
+        host_id, scan_id = found
+        ports_count = Port.query.filter_by(host_id=host_id, scan_id=scan_id).count()
 
         return jsonify({
             'url': host_url,
-            'host_id': host.id,
+            'host_id': host_id,
+            'scan_id': scan_id,
             'has_ports': ports_count > 0,
             'ports_count': ports_count
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _write_urls_if_none(scan_id, urls):
+    """Write job for run_gau: save a scan's historical URLs unless it has some, returning the count it had"""
+    existing = count_scan_urls(scan_id)
+    if existing == 0:
+        save_scan_urls(scan_id, urls)
+    return existing
+
 @api_bp.route('/run-gau', methods=['GET'])
 def run_gau():
     domain = request.args.get('domain', '').strip()
@@ -172,17 +426,9 @@ def run_gau():
 
                 if scan:
                     print(f"Found scan ID {scan.id} for domain {scan.domain}")
-                    # Check if we already have historical URLs for this scan
-                    existing_urls = HistoricalUrl.query.filter_by(scan_id=scan.id).count()
+                    # Save historical URLs to database unless the scan already has some
+                    existing_urls = run_write(_write_urls_if_none, scan.id, urls)
                     if existing_urls == 0:
-                        print(f"No existing historical URLs for scan ID {scan.id}, saving {len(urls)} URLs")
-                        # Save historical URLs to database
-                        for url in urls:
-                            db.session.add(HistoricalUrl(
-                                scan_id=scan.id,
-                                url=url
-                            ))
-                        db.session.commit()
                         print(f"Saved {len(urls)} historical URLs to database for scan ID {scan.id}")
                     else:
                         print(f"Found {existing_urls} existing historical URLs for scan ID {scan.id}, skipping")
@@ -210,13 +456,14 @@ def run_gau():
 @api_bp.route('/scan-ports', methods=['GET'])
 def scan_ports_api():
     host = request.args.get('host', '').strip()
+    scan_id = request.args.get('scan_id', type=int)
 
     if not host:
         return jsonify({'error': 'Host is required'}), 400
 
     print(f"Scanning ports for {host}...")
-    # Run port scan for the specific host
-    ports, error = scan_ports(host)
+    # Run port scan for the specific host, answered from the per-IP cache when fresh
+    ports, error, cache_info = scan_ports_cached(host)
 
     if error:
         print(f"Error scanning ports for {host}: {error}")
@@ -227,11 +474,12 @@ def scan_ports_api():
 
     print(f"Found {len(ports)} open ports for {host}")
 
-    # Save port scan results to database
+    # Save port scan results to database, with the port table's service guesses for now
+    success = False
     try:
         # Use application context for database operations
         with current_app.app_context():
-            success = save_ports_to_database(host, ports)
+            success = save_ports_to_database(host, ports, scan_id=scan_id)
             if success:
                 print(f"Saved {len(ports)} ports to database for host {host}")
             else:
@@ -241,12 +489,30 @@ def scan_ports_api():
         import traceback
         traceback.print_exc()
 
+    # Identifying services from banners takes seconds per port: a worker
+    # does it and updates the stored guesses
+    services_task_id = None
+    if success and ports:
+        try:
+            from reconaug.tasks import identify_port_services_task
+            address = cache_info['ip'] or clean_host(host)
+            services_task_id = identify_port_services_task.delay(host, address, ports, scan_id).id
+        except Exception as e:
+            print(f"Could not queue service identification for {host}: {e}")
+
     return jsonify({
         'host': host,
         'count': len(ports),
-        'ports': ports
+        'ports': ports,
+        'services_task_id': services_task_id,
+        'cache': cache_info
     })
 
+# Subdomains and live hosts included with a completed scan task, so polling
+# it stays cheap; the rest are paged from /api/scan/<id>/subdomains and
+# /live-hosts from the returned cursors
+TASK_RESULT_PAGE_SIZE = 50
+
 @api_bp.route('/task/<task_id>')
 def get_task(task_id):
     """Get task details from Celery"""
@@ -272,20 +538,24 @@ def get_task(task_id):
         elif task.state == 'SUCCESS':
             response = task.result
 
-            # If the task is complete, include the full results
-            if response.get('status') == 'complete' and response.get('scan_id'):
+            # If a scan is complete, include the first page of its results and
+            # where to fetch the rest, so the response stays small however
+            # large the scan is
+            if response.get('status') == 'complete' and response.get('scan_id') and 'subdomains_count' in response:
                 try:
-                    # Get the scan from the database
                     scan_id = response.get('scan_id')
-                    scan = Scan.query.get(scan_id)
+                    scan = get_scan_or_archive(scan_id)
                     if scan:
-                        # Get subdomains and live hosts
-                        subdomains = [s.name for s in scan.subdomains]
-                        live_hosts = [h.to_dict() for h in scan.live_hosts]
+                        subdomains, subdomains_cursor = get_scan_subdomain_page(scan, limit=TASK_RESULT_PAGE_SIZE)
+                        live_hosts, live_hosts_cursor = get_scan_live_host_page(scan, limit=TASK_RESULT_PAGE_SIZE)
 
                         # Add to the response
                         response['subdomains'] = subdomains
                         response['live_hosts'] = live_hosts
+                        response['subdomains_url'] = f'/api/scan/{scan_id}/subdomains'
+                        response['live_hosts_url'] = f'/api/scan/{scan_id}/live-hosts'
+                        response['subdomains_next_cursor'] = subdomains_cursor
+                        response['live_hosts_next_cursor'] = live_hosts_cursor
                 except Exception as e:
                     print(f"Error getting scan details: {e}")
         else:
@@ -306,101 +576,117 @@ def get_task(task_id):
 
 @api_bp.route('/task/<task_id>/events')
 def task_events(task_id):
-    """Server-sent events endpoint for real-time updates"""
-    print(f"SSE connection established for task: {task_id}")
-
-    def generate():
-        last_status = None
-        counter = 0
-        while True:
-            counter += 1
-            task = task_manager.get_task(task_id)
-
-            if counter % 10 == 0:  # Log every 10 seconds
-                print(f"SSE heartbeat for task {task_id}, counter: {counter}")
-                if task:
-                    print(f"Task status: {task['status']}, progress: {task['progress']}, complete: {task['complete']}")
-                else:
-                    print(f"Task not found: {task_id}")
-
-            if not task:
-                print(f"Task not found in SSE: {task_id}")
-                yield f"data: {{'error': 'Task not found'}}\\n\\n"
-                break
+    """Server-sent events endpoint for real-time updates
 
-            # Always send updates to ensure client gets the latest data
-            current_status = f"{task['status']}-{task['progress']}-{task['message']}"
-            if current_status != last_status or counter % 5 == 0:  # Send update if status changed or every 5 seconds
-                print(f"Sending SSE update for task {task_id}: {current_status}")
+    Scans run in a background thread (task_manager) are streamed as they
+    update; Celery tasks as their progress is published to Redis (see
+    reconaug.utils.progress). Neither polls.
+    """
+    print(f"SSE connection established for task: {task_id}")
 
-                # Include subdomains_count and live_hosts_count if available
-                subdomains_count = task.get('subdomains_count', 0)
-                live_hosts_count = task.get('live_hosts_count', 0)
+    if not task_manager.get_task(task_id):
+        from reconaug.utils.progress import task_event_stream
+        return Response(stream_with_context(task_event_stream(task_id)), content_type='text/event-stream')
 
-                data_json = f"data: {{'status': '{task['status']}', 'progress': {task['progress']}, 'message': '{task['message']}', 'complete': {str(task['complete']).lower()}, 'subdomains_count': {subdomains_count}, 'live_hosts_count': {live_hosts_count}}}\\n\\n"
-                yield data_json
-                last_status = current_status
-                print(f"SSE update sent for task {task_id} with subdomains: {subdomains_count}, live hosts: {live_hosts_count}")
+    def generate():
+        task = task_manager.get_task(task_id)
+        while task:
+            yield "data: " + json.dumps({
+                'status': task['status'],
+                'progress': task['progress'],
+                'message': task['message'],
+                'complete': task['complete'],
+                'subdomains_count': task.get('subdomains_count', 0),
+                'live_hosts_count': task.get('live_hosts_count', 0)
+            }) + "\n\n"
 
             # If the task is complete, stop sending updates
             if task['complete']:
                 print(f"Task {task_id} is complete, closing SSE connection")
                 break
 
-            time.sleep(1)
+            timestamp = task['timestamp']
+            task = task_manager.wait_for_update(task_id, timestamp, timeout=15)
+            if task and task['timestamp'] == timestamp:
+                # No update for a while: keep the connection alive
+                yield ": keepalive\n\n"
 
     return Response(stream_with_context(generate()), content_type='text/event-stream')
 
 @api_bp.route('/debug/database')
 def debug_database():
-    """Debug endpoint to check database contents"""
+    """Debug endpoint to check database contents
+
+    Scans are paged like /api/scan-history (limit, cursor) and their
+    actual counts come from the stats maintained on ingest, as do the
+    totals: the sums of the scans' counts, so a subdomain found by three
+    scans counts three times.
+    """
     try:
-        # Get all scans
-        scans = Scan.query.all()
-        scan_data = []
+        try:
+            rows, next_cursor = get_scan_history_page(
+                limit=int(request.args.get('limit', DEFAULT_HISTORY_PAGE_SIZE)),
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        for scan in scans:
+        scan_data = []
+        for scan, stats in rows:
             scan_info = scan.to_dict()
-            scan_info['subdomains_count_actual'] = Subdomain.query.filter_by(scan_id=scan.id).count()
-            scan_info['live_hosts_count_actual'] = LiveHost.query.filter_by(scan_id=scan.id).count()
+            scan_info['subdomains_count_actual'] = stats.subdomains if stats else None
+            scan_info['live_hosts_count_actual'] = stats.live_hosts if stats else None
+            scan_info['stats'] = stats.to_dict() if stats else None
             scan_data.append(scan_info)
 
-        # Get database stats
-        stats = {
-            'total_scans': Scan.query.count(),
-            'total_subdomains': Subdomain.query.count(),
-            'total_live_hosts': LiveHost.query.count(),
-            'total_ports': Port.query.count(),
-            'total_historical_urls': HistoricalUrl.query.count()
-        }
+        # Totals summed over the scans' stats rather than counted over every
+        # row of the child tables
+        totals = db.session.query(
+            db.func.count(Scan.id),
+            db.func.coalesce(db.func.sum(ScanStats.subdomains), 0),
+            db.func.coalesce(db.func.sum(ScanStats.live_hosts), 0),
+            db.func.coalesce(db.func.sum(ScanStats.ports), 0),
+            db.func.coalesce(db.func.sum(ScanStats.urls), 0)
+        ).outerjoin(ScanStats, ScanStats.scan_id == Scan.id).one()
+        stats = dict(zip(
+            ('total_scans', 'total_subdomains', 'total_live_hosts', 'total_ports', 'total_historical_urls'),
+            (int(total) for total in totals)
+        ))
 
         return jsonify({
             'stats': stats,
-            'scans': scan_data
+            'schema_version': get_schema_version(),
+            'scans': scan_data,
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _write_clear_database():
+    """Write job for clear_database: delete all records from all tables"""
+    HistoricalUrl.query.delete()
+    HistoricalUrlBlock.query.delete()
+    UrlFingerprint.query.delete()
+    PortScanCache.query.delete()
+    ScanAsset.query.delete()
+    ScanStats.query.delete()
+    ScanArchive.query.delete()
+    Port.query.delete()
+    LiveHost.query.delete()
+    Subdomain.query.delete()
+    Scan.query.delete()
+
 @api_bp.route('/debug/clear-database')
 def clear_database():
     """Debug endpoint to clear the database"""
     try:
-        # Delete all records from all tables
-        HistoricalUrl.query.delete()
-        Port.query.delete()
-        LiveHost.query.delete()
-        Subdomain.query.delete()
-        Scan.query.delete()
-
-        # Commit the changes
-        db.session.commit()
+        run_write(_write_clear_database)
 
         return jsonify({
             'message': 'Database cleared successfully',
             'status': 'success'
         })
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             'error': str(e),
             'status': 'error'
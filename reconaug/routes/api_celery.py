@@ -1,6 +1,4 @@
 from flask import Blueprint, request, jsonify, Response, stream_with_context
-import time
-import json
 
 api_celery_bp = Blueprint('api_celery', __name__)
 
@@ -60,13 +58,6 @@ def get_task(task_id):
                 # Make sure we have a status field
                 if 'status' not in response:
                     response['status'] = 'complete'
-
-                # Special handling for GAU results
-                if 'urls' in response and isinstance(response['urls'], list):
-                    # Make sure we're not returning too much data
-                    if len(response['urls']) > 1000:
-                        response['urls'] = response['urls'][:1000]
-                        response['limited'] = True
             else:
                 # If result is not a dict, create a basic response
                 response.update({
@@ -97,71 +88,14 @@ def get_task(task_id):
 
 @api_celery_bp.route('/task/<task_id>/events')
 def task_events(task_id):
-    """Server-sent events endpoint for real-time updates using Celery"""
-    print(f"SSE connection established for task: {task_id}")
-
-    def generate():
-        from reconaug.tasks import celery
-
-        last_state = None
-        counter = 0
-
-        while True:
-            counter += 1
-            task = celery.AsyncResult(task_id)
-
-            if counter % 10 == 0:  # Log every 10 seconds
-                print(f"SSE heartbeat for task {task_id}, counter: {counter}")
-                print(f"Task state: {task.state}")
+    """Server-sent events endpoint for real-time updates using Celery
 
-            if task.state == 'PENDING':
-                current_state = 'pending-0-Task is pending...'
-                data = {
-                    'status': 'pending',
-                    'progress': 0,
-                    'message': 'Task is pending...',
-                    'subdomains_count': 0,
-                    'live_hosts_count': 0
-                }
-            elif task.state == 'FAILURE':
-                current_state = 'error-100-Task failed'
-                data = {
-                    'status': 'error',
-                    'progress': 100,
-                    'message': str(task.info),
-                    'complete': True
-                }
-                # Task failed, send update and stop
-                yield f"data: {json.dumps(data)}\n\n"
-                break
-            elif task.state == 'SUCCESS':
-                current_state = 'complete-100-Task completed'
-                data = task.result
-                # Task completed, send update and stop
-                yield f"data: {json.dumps(data)}\n\n"
-                break
-            else:
-                # Task is in progress
-                info = task.info or {}
-                current_state = f"{info.get('status', 'running')}-{info.get('progress', 0)}-{info.get('message', 'Task is running...')}"
-                data = {
-                    'status': info.get('status', 'running'),
-                    'progress': info.get('progress', 0),
-                    'message': info.get('message', 'Task is running...'),
-                    'subdomains_count': info.get('subdomains_count', 0),
-                    'live_hosts_count': info.get('live_hosts_count', 0)
-                }
-
-            # Only send updates if the state has changed or every 5 seconds
-            if current_state != last_state or counter % 5 == 0:
-                print(f"Sending SSE update for task {task_id}: {current_state}")
-                yield f"data: {json.dumps(data)}\n\n"
-                last_state = current_state
-                print(f"SSE update sent for task {task_id}")
-
-            time.sleep(1)
-
-    return Response(stream_with_context(generate()), content_type='text/event-stream')
+    Events are relayed from the task's Redis progress channel as they are
+    published (see reconaug.utils.progress) rather than polled.
+    """
+    print(f"SSE connection established for task: {task_id}")
+    from reconaug.utils.progress import task_event_stream
+    return Response(stream_with_context(task_event_stream(task_id)), content_type='text/event-stream')
 
 @api_celery_bp.route('/celery/run-gau', methods=['GET'])
 def celery_run_gau():
@@ -172,20 +106,23 @@ def celery_run_gau():
 
     print(f"Running GAU for {domain}...")
 
-    # Start the Celery task
+    # Start the Celery task, or attach to a GAU run for the domain already running
     from reconaug.tasks import run_gau_task
-    task = run_gau_task.delay(domain)
+    from reconaug.utils.single_flight import submit_once
+    task, attached = submit_once(run_gau_task, (domain,), domain)
 
     # Return the task ID
     return jsonify({
         'task_id': task.id,
         'domain': domain,
-        'status': 'started'
+        'status': 'started',
+        'attached': attached
     })
 
 @api_celery_bp.route('/celery/scan-ports', methods=['GET'])
 def celery_scan_ports():
     host = request.args.get('host', '').strip()
+    scan_id = request.args.get('scan_id', type=int)
 
     if not host:
         return jsonify({'error': 'Host is required'}), 400
@@ -203,14 +140,16 @@ def celery_scan_ports():
 
         # Start the task
         print(f"Starting Celery task for {host}...")
-        task = run_port_scan_task.delay(host)
-        print(f"Celery task started with ID: {task.id}")
+        from reconaug.utils.single_flight import submit_once
+        task, attached = submit_once(run_port_scan_task, (host, scan_id), host, {'scan_id': scan_id})
+        print(f"Celery task {'attached' if attached else 'started'} with ID: {task.id}")
 
         # Return the task ID
         return jsonify({
             'task_id': task.id,
             'host': host,
-            'status': 'started'
+            'status': 'started',
+            'attached': attached
         })
     except Exception as e:
         import traceback
@@ -221,3 +160,69 @@ def celery_scan_ports():
             'host': host,
             'status': 'error'
         }), 500
+
+@api_celery_bp.route('/celery/scan/<int:scan_id>/scan-ports', methods=['GET'])
+def celery_scan_all_ports(scan_id):
+    """Start a single port scan covering every live host of a scan"""
+    try:
+        from reconaug.tasks import run_bulk_port_scan_task
+        from reconaug.utils.single_flight import submit_once
+        task, attached = submit_once(run_bulk_port_scan_task, (scan_id,), scan_id)
+        print(f"{'Attached to' if attached else 'Started'} bulk port scan task {task.id} for scan {scan_id}")
+
+        return jsonify({
+            'task_id': task.id,
+            'scan_id': scan_id,
+            'status': 'started',
+            'attached': attached
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': f"Error starting bulk port scan task: {str(e)}",
+            'scan_id': scan_id,
+            'status': 'error'
+        }), 500
+
+@api_celery_bp.route('/celery/scan/<int:scan_id>/diff', methods=['GET'])
+def celery_scan_diff(scan_id):
+    """Start counting the changes between a scan and a base scan (base, default: the previous scan)"""
+    try:
+        from reconaug.tasks import diff_scans_task
+        task = diff_scans_task.delay(scan_id, request.args.get('base', type=int))
+        print(f"Started diff task {task.id} for scan {scan_id}")
+
+        return jsonify({
+            'task_id': task.id,
+            'scan_id': scan_id,
+            'status': 'started'
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': f"Error starting diff task: {str(e)}",
+            'scan_id': scan_id,
+            'status': 'error'
+        }), 500
+
+@api_celery_bp.route('/celery/archive', methods=['GET'])
+def celery_archive():
+    """Start archiving old scans (days, keep: default to the retention settings)"""
+    try:
+        from reconaug.tasks import archive_scans_task
+        task = archive_scans_task.delay(request.args.get('days', type=int), request.args.get('keep', type=int))
+        print(f"Started archive task {task.id}")
+
+        return jsonify({
+            'task_id': task.id,
+            'status': 'started'
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': f"Error starting archive task: {str(e)}",
+            'status': 'error'
+        }), 500
@@ -1,7 +1,7 @@
 import os
 import threading
 import re
-from flask import Blueprint, request, jsonify, render_template, current_app
+from flask import Blueprint, request, jsonify, render_template, current_app, abort
 from concurrent.futures import ThreadPoolExecutor
 
 from reconaug import db
@@ -13,6 +13,9 @@ from reconaug.tools.subdomain import (
 from reconaug.tools.scanner import check_live_hosts, scan_ports, get_historical_urls
 from reconaug.utils.task_manager import task_manager
 from reconaug.utils.database import save_scan_to_database, save_ports_to_database
+from reconaug.utils.url_store import get_scan_url_page, count_scan_urls
+from reconaug.utils.scan_read import get_scan_subdomain_page, get_scan_live_host_page, get_scan_asset_counts
+from reconaug.utils.archive import get_scan_or_archive, is_archived, get_archive_url_page, get_archive_stats
 
 scan_bp = Blueprint('scan', __name__)
 
@@ -34,16 +37,18 @@ def scan():
             print(f"Error: Invalid domain format: {domain}")
             return jsonify({'error': 'Invalid domain format'}), 400
 
-        # Start the Celery task
+        # Start the Celery task, or attach to a scan of the domain already running
         from reconaug.tasks import run_scan_task
-        task = run_scan_task.delay(domain)
-        print(f"Started Celery task with ID: {task.id}")
+        from reconaug.utils.single_flight import submit_once
+        task, attached = submit_once(run_scan_task, (domain,), domain)
+        print(f"{'Attached to' if attached else 'Started'} Celery task with ID: {task.id}")
 
         # Redirect to the history page instead of the scan progress page
         return jsonify({
             'task_id': task.id,
             'domain': domain,
             'status': 'started',
+            'attached': attached,
             'redirect': '/history'
         })
     except Exception as e:
@@ -123,19 +128,33 @@ def task_status(task_id):
 def details(scan_id):
     """Page to display details of a specific scan"""
     try:
-        scan = Scan.query.get_or_404(scan_id)
-        subdomains = [s.name for s in scan.subdomains]
-        live_hosts = [h.to_dict() for h in scan.live_hosts]
+        scan = get_scan_or_archive(scan_id) or abort(404)
+
+        # Only the first page of each list is rendered, the rest is loaded on demand
+        subdomains, subdomains_cursor = get_scan_subdomain_page(scan)
+        live_hosts, live_hosts_cursor = get_scan_live_host_page(scan)
+        subdomains_total, live_hosts_total = get_scan_asset_counts(scan)
 
         # Get historical URLs
-        historical_urls = [h.url for h in HistoricalUrl.query.filter_by(scan_id=scan_id).all()]
+        if is_archived(scan):
+            historical_urls, historical_urls_cursor = get_archive_url_page(scan)
+            historical_urls_count = get_archive_stats(scan)['urls']
+        else:
+            historical_urls, historical_urls_cursor = get_scan_url_page(scan_id)
+            historical_urls_count = count_scan_urls(scan_id)
 
         return render_template(
             'scan_details.html',
             scan=scan,
             subdomains=subdomains,
+            subdomains_cursor=subdomains_cursor,
+            subdomains_total=subdomains_total,
             live_hosts=live_hosts,
-            historical_urls=historical_urls
+            live_hosts_cursor=live_hosts_cursor,
+            live_hosts_total=live_hosts_total,
+            historical_urls=historical_urls,
+            historical_urls_cursor=historical_urls_cursor,
+            historical_urls_count=historical_urls_count
         )
     except Exception as e:
         print(f"Error rendering scan details page: {e}")
@@ -1,125 +1,247 @@
 import os
-from concurrent.futures import ThreadPoolExecutor
 import json
 
-from reconaug.celery_app import celery
+from celery import chord, group
+from reconaug.celery_app import celery, get_redis_client
 from reconaug.tools.subdomain import get_subdomains_subfinder, get_subdomains_crtsh, get_subdomains_sublist3r
-from reconaug.tools.scanner import check_live_hosts, get_historical_urls, scan_ports
-from reconaug.utils.celery_db import save_scan_results, save_port_scan_results
+from reconaug.tools.scanner import check_live_hosts, get_historical_urls, scan_ports, clean_host
+from reconaug.tools.services import identify_services
+from reconaug.utils.celery_db import save_scan_results, save_port_scan_results, save_host_ports
+from reconaug.utils.database import save_ports_to_database
+from reconaug.utils.checkpoint import (
+    has_checkpoint, load_checkpoint, save_checkpoint, discard_checkpoints, finish_checkpoints, SAVED_STAGE
+)
+
+# Subdomain discovery sources, each run as its own task in the scan workflow
+DISCOVERY_SOURCES = {
+    'subfinder': get_subdomains_subfinder,
+    'sublist3r': get_subdomains_sublist3r,
+    'crtsh': get_subdomains_crtsh,
+}
+
+# Seconds the shared progress counters of a scan workflow are kept
+WORKFLOW_STATE_TTL = 24 * 3600
+
+def _workflow_id(task):
+    """Return the id of the scan workflow a stage task belongs to: its root task, the id the client polls"""
+    return task.request.root_id or task.request.id
+
+def _report_progress(task, progress, message, **fields):
+    """Record progress on the scan workflow's root task"""
+    task.update_state(
+        task_id=_workflow_id(task),
+        state='PROGRESS',
+        meta=dict(status='running', progress=progress, message=message, **fields)
+    )
+
+def _roll_up(workflow_id, **increments):
+    """Add to the shared counters of a scan workflow, returning their new totals
+
+    Tasks running in parallel cannot see each other's progress, so they
+    add to one Redis hash per workflow in the result backend and report
+    its totals. Returns None if the result backend is not Redis.
+    """
+    client = get_redis_client()
+    if client is None:
+        return None
+    key = f'reconaug:scan-workflow:{workflow_id}'
+    pipe = client.pipeline()
+    for field, amount in increments.items():
+        pipe.hincrby(key, field, amount)
+    pipe.expire(key, WORKFLOW_STATE_TTL)
+    return dict(zip(increments, pipe.execute()))
+
+def _reset_roll_up(workflow_id, *fields):
+    """Zero some of the shared counters of a scan workflow"""
+    client = get_redis_client()
+    if client is not None:
+        client.hdel(f'reconaug:scan-workflow:{workflow_id}', *fields)
+
+def _clear_roll_up(workflow_id):
+    client = get_redis_client()
+    if client is not None:
+        client.delete(f'reconaug:scan-workflow:{workflow_id}')
 
 @celery.task(bind=True)
 def run_scan_task(self, domain):
-    """Run a full scan as a Celery task"""
+    """Run a full scan as a workflow of stage tasks spread across the workers
+
+    The task replaces itself with a chord: one discover_subdomains_task
+    per source runs as a group, then probe_subdomains_task merges the
+    names and fans them out to probe_hosts_task in chunks of
+    SCAN_PROBE_CHUNK_SIZE, whose chord callback save_scan_task persists
+    the scan. Every stage reports progress on this task's id, and the final
+    result is stored under it too, so callers poll one id as before.
+
+    Each stage checkpoints its output under this task's id (see
+    reconaug.utils.checkpoint): a stage that is redelivered or retried
+    within the same scan reuses the completed stages and chunks instead of
+    redoing them. A new scan of the domain always starts from scratch.
+    """
     try:
         # Create output directory if it doesn't exist
         os.makedirs('output', exist_ok=True)
 
-        # Clean up any existing output files
-        for file_pattern in [f"output/subfinder_{domain}.txt", f"output/crtsh_{domain}.txt",
-                            f"output/domain_{domain}.txt", f"output/httpx_{domain}.txt",
-                            f"output/gau_{domain}.txt", f"output/sublist3r_{domain}.txt"]:
-            if os.path.exists(file_pattern):
-                os.remove(file_pattern)
+        # Only a redelivery of this very task finds checkpoints
+        resumed = has_checkpoint(self.request.id)
+        if not resumed:
+            # Clean up any existing output files
+            for file_pattern in [f"output/subfinder_{domain}.txt", f"output/crtsh_{domain}.txt",
+                                f"output/domain_{domain}.txt", f"output/httpx_{domain}.txt",
+                                f"output/gau_{domain}.txt", f"output/sublist3r_{domain}.txt"]:
+                if os.path.exists(file_pattern):
+                    os.remove(file_pattern)
 
-        # Update task state
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'status': 'running',
-                'progress': 10,
-                'message': 'Running subfinder and Sublist3r...',
-                'subdomains_count': 0,
-                'live_hosts_count': 0
-            }
+        _report_progress(
+            self, 10,
+            ('Resuming the unfinished scan: ' if resumed else '') + f'Running {", ".join(DISCOVERY_SOURCES)}...',
+            subdomains_count=0, live_hosts_count=0
         )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': f'Error: {str(e)}',
+            'error': str(e),
+            'complete': True
+        }
 
-        # Run subdomain discovery tools in parallel
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            subfinder_future = executor.submit(get_subdomains_subfinder, domain)
-            sublist3r_future = executor.submit(get_subdomains_sublist3r, domain)
+    discovery = group(discover_subdomains_task.s(domain, source) for source in DISCOVERY_SOURCES)
+    return self.replace(chord(discovery, probe_subdomains_task.s(domain)))
 
-            # Update progress
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'status': 'running',
-                    'progress': 15,
-                    'message': 'Running crt.sh and other passive sources...',
-                    'subdomains_count': 0,
-                    'live_hosts_count': 0
-                }
-            )
+# Stage tasks are safe to run again thanks to their checkpoints, so a task
+# whose worker process died is requeued rather than failed
+@celery.task(bind=True, reject_on_worker_lost=True)
+def discover_subdomains_task(self, domain, source):
+    """Scan workflow stage: find subdomains of a domain with one source
 
-            crtsh_future = executor.submit(get_subdomains_crtsh, domain)
+    A failing source yields no subdomains rather than failing the scan, and
+    is neither checkpointed nor counted in the roll-up, so a resumed scan
+    tries it again.
+    """
+    workflow_id = _workflow_id(self)
+    stage = f'discover:{source}'
+    subdomains = load_checkpoint(workflow_id, stage)
+    # A source is counted by the delivery that checkpoints it, not again
+    # when its task is redelivered
+    counted = subdomains is None
+    if subdomains is None:
+        try:
+            subdomains = DISCOVERY_SOURCES[source](domain)
+            counted = save_checkpoint(workflow_id, stage, subdomains)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            print(f"Subdomain source {source} failed for {domain}: {e}")
+            subdomains = []
+            # Nothing was checkpointed, so a retry must not count it again
+            counted = False
 
-            subfinder_results = subfinder_future.result()
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'status': 'running',
-                    'progress': 25,
-                    'message': f'Found {len(subfinder_results)} subdomains with subfinder',
-                    'subdomains_count': len(subfinder_results),
-                    'live_hosts_count': 0
-                }
-            )
+    totals = _roll_up(workflow_id, sources=int(counted), subdomains=len(subdomains) if counted else 0)
+    done = min(totals['sources'], len(DISCOVERY_SOURCES)) if totals else 1
+    _report_progress(
+        self, 10 + 30 * done // len(DISCOVERY_SOURCES),
+        f'Found {len(subdomains)} subdomains with {source}',
+        subdomains_count=totals['subdomains'] if totals else len(subdomains),
+        live_hosts_count=0
+    )
+    return subdomains
 
-            sublist3r_results = sublist3r_future.result()
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'status': 'running',
-                    'progress': 30,
-                    'message': f'Found {len(sublist3r_results)} subdomains with Sublist3r',
-                    'subdomains_count': len(subfinder_results) + len(sublist3r_results),
-                    'live_hosts_count': 0
-                }
-            )
+@celery.task(bind=True, reject_on_worker_lost=True)
+def probe_subdomains_task(self, results, domain):
+    """Scan workflow stage: merge the discovered subdomains and fan out the live host checks
 
-            crtsh_results = crtsh_future.result()
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'status': 'running',
-                    'progress': 40,
-                    'message': f'Found {len(crtsh_results)} subdomains with passive sources',
-                    'subdomains_count': len(subfinder_results) + len(sublist3r_results) + len(crtsh_results),
-                    'live_hosts_count': 0
-                }
-            )
+    The merged list and chunk size are checkpointed as the probe plan, so
+    chunk numbers mean the same chunks when the scan resumes. The plan is
+    only reused as is if every source had a checkpoint when it was made;
+    otherwise a source that failed then has run again, and the plan is
+    rebuilt from what the sources returned this time, dropping the probed
+    chunks if the names changed.
+    """
+    from flask import current_app
 
-        # Combine and deduplicate results
-        all_domains = list(set(subfinder_results + sublist3r_results + crtsh_results))
+    workflow_id = _workflow_id(self)
+    subdomains = sorted(set(name for names in results for name in names))
+    plan = load_checkpoint(workflow_id, 'plan')
+    if plan is not None and set(plan['sources']) != set(DISCOVERY_SOURCES):
+        if plan['subdomains'] != subdomains:
+            # The chunks probed for the old plan are not the chunks of the new one
+            discard_checkpoints(workflow_id, 'probe:')
+            _reset_roll_up(workflow_id, 'chunks', 'live_hosts')
+        plan = dict(plan, subdomains=subdomains)
+    elif plan is None:
+        plan = {
+            'subdomains': subdomains,
+            'chunk_size': max(1, current_app.config.get('SCAN_PROBE_CHUNK_SIZE', 100))
+        }
+    # The sources whose output the plan includes for good
+    plan['sources'] = [source for source in DISCOVERY_SOURCES
+                       if has_checkpoint(workflow_id, f'discover:{source}')]
+    save_checkpoint(workflow_id, 'plan', plan, replace=True)
+    all_domains, chunk_size = plan['subdomains'], plan['chunk_size']
 
-        # Save all domains to a file
-        output_file = f"output/domain_{domain}.txt"
-        with open(output_file, 'w') as f:
-            for d in all_domains:
-                f.write(f"{d}\n")
+    # Save all domains to a file
+    output_file = f"output/domain_{domain}.txt"
+    with open(output_file, 'w') as f:
+        for d in all_domains:
+            f.write(f"{d}\n")
 
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'status': 'running',
-                'progress': 50,
-                'message': f'Found {len(all_domains)} unique subdomains. Checking live hosts...',
-                'subdomains_count': len(all_domains),
-                'live_hosts_count': 0
-            }
-        )
+    chunks = [all_domains[i:i + chunk_size] for i in range(0, len(all_domains), chunk_size)]
+    _report_progress(
+        self, 50,
+        f'Found {len(all_domains)} unique subdomains. Checking live hosts in {len(chunks)} batches...',
+        subdomains_count=len(all_domains), live_hosts_count=0
+    )
 
-        # Check which domains are live
-        live_hosts = check_live_hosts(all_domains)
+    save = save_scan_task.s(domain, all_domains)
+    if not chunks:
+        return self.replace(save.clone(args=([],)))
+    probes = group(
+        probe_hosts_task.s(domain, index, chunk, len(chunks), len(all_domains))
+        for index, chunk in enumerate(chunks)
+    )
+    return self.replace(chord(probes, save))
 
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'status': 'running',
-                'progress': 80,
-                'message': f'Found {len(live_hosts)} live hosts',
-                'subdomains_count': len(all_domains),
-                'live_hosts_count': len(live_hosts)
-            }
+@celery.task(bind=True, reject_on_worker_lost=True)
+def probe_hosts_task(self, domain, index, subdomains, chunk_count, subdomains_count):
+    """Scan workflow stage: check which of a chunk of subdomains are live"""
+    workflow_id = _workflow_id(self)
+    stage = f'probe:{index}'
+    live_hosts = load_checkpoint(workflow_id, stage)
+    # Only the delivery that checkpoints a chunk counts it
+    counted = False
+    if live_hosts is None:
+        live_hosts = check_live_hosts(subdomains)
+        counted = save_checkpoint(workflow_id, stage, live_hosts)
+
+    totals = _roll_up(workflow_id, chunks=int(counted), live_hosts=len(live_hosts) if counted else 0)
+    done = min(totals['chunks'], chunk_count) if totals else 1
+    _report_progress(
+        self, 50 + 30 * done // chunk_count,
+        f'Checked {done} of {chunk_count} batches of subdomains',
+        subdomains_count=subdomains_count,
+        live_hosts_count=totals['live_hosts'] if totals else len(live_hosts)
+    )
+    return live_hosts
+
+@celery.task(bind=True, reject_on_worker_lost=True)
+def save_scan_task(self, results, domain, all_domains):
+    """Scan workflow stage: combine the live hosts of every chunk and save the scan
+
+    The final result is checkpointed once the scan is saved, so a
+    redelivered task returns it instead of saving the scan twice.
+    """
+    try:
+        saved = load_checkpoint(_workflow_id(self), SAVED_STAGE)
+        if saved is not None:
+            return saved
+
+        live_hosts = [host for hosts in results for host in hosts]
+        _report_progress(
+            self, 90, f'Found {len(live_hosts)} live hosts. Saving results...',
+            subdomains_count=len(all_domains), live_hosts_count=len(live_hosts)
         )
 
         # Save results to database
@@ -130,7 +252,7 @@ def run_scan_task(self, domain):
             db_message = 'Note: Failed to save results to database.'
 
         # Return the final result
-        return {
+        result = {
             'status': 'complete',
             'progress': 100,
             'message': f'Scan complete. Found {len(all_domains)} subdomains and {len(live_hosts)} live hosts. {db_message}',
@@ -139,6 +261,9 @@ def run_scan_task(self, domain):
             'domain': domain,
             'scan_id': scan_id
         }
+        if scan_id:
+            finish_checkpoints(_workflow_id(self), result)
+        return result
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -149,6 +274,8 @@ def run_scan_task(self, domain):
             'error': str(e),
             'complete': True
         }
+    finally:
+        _clear_roll_up(_workflow_id(self))
 
 @celery.task(bind=True)
 def run_gau_task(self, domain):
@@ -173,6 +300,7 @@ def run_gau_task(self, domain):
             }
 
         # Save URLs to the database
+        scan_id = None
         try:
             from reconaug.utils.celery_db import save_historical_urls
             scan_id = save_historical_urls(domain, urls)
@@ -183,14 +311,17 @@ def run_gau_task(self, domain):
             traceback.print_exc()
             print(f"Error saving historical URLs to database: {e}")
 
+        # The URLs themselves stay in the database: the result only points to
+        # them, so it is small in the result backend and in every poll
         return {
             'status': 'complete',
             'progress': 100,
-            'message': f'Found {len(urls)} historical URLs for {domain}',
+            'message': f'Found {len(urls)} historical URLs for {domain}' + (
+                '' if scan_id else '. Note: Failed to save them to the database.'),
             'domain': domain,
             'count': len(urls),
-            'urls': urls[:1000] if len(urls) > 1000 else urls,
-            'limited': len(urls) > 1000
+            'scan_id': scan_id,
+            'urls_url': f'/api/scan/{scan_id}/historical-urls' if scan_id else None
         }
     except Exception as e:
         import traceback
@@ -204,8 +335,8 @@ def run_gau_task(self, domain):
         }
 
 @celery.task(bind=True)
-def run_port_scan_task(self, host):
-    """Run port scan as a Celery task"""
+def run_port_scan_task(self, host, scan_id=None):
+    """Run port scan as a Celery task, recording the ports against scan_id (default: the newest scan that found the host)"""
     print(f"Starting port scan task for {host}")
     try:
         # Update task state to PROGRESS
@@ -220,10 +351,11 @@ def run_port_scan_task(self, host):
         )
         print(f"Task state updated for {host}")
 
-        # Run the port scan
+        # Run the port scan, reusing a fresh result for the same IP if there is one
         print(f"Running port scan for {host}")
-        ports, error = scan_ports(host)
-        print(f"Port scan completed for {host}. Found {len(ports)} ports. Error: {error}")
+        from reconaug.utils.port_cache import scan_ports_cached
+        ports, error, cache_info = scan_ports_cached(host)
+        print(f"Port scan completed for {host}. Found {len(ports)} ports. Error: {error}. Cached: {cache_info['cached']}")
 
         if error:
             print(f"Error scanning ports for {host}: {error}")
@@ -233,57 +365,264 @@ def run_port_scan_task(self, host):
                 'ports': []
             }
 
+        # Identify services from banners, falling back to the port table
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'status': 'running',
+                'progress': 70,
+                'message': f'Identifying services on {len(ports)} open ports...'
+            }
+        )
+        address = cache_info['ip'] or clean_host(host)
+        services = identify_services({address: ports}).get(address, {})
+
         # Save ports to database
-        success = save_port_scan_results(host, ports)
-
-        # Convert port numbers to port objects with service information
-        port_objects = []
-        for port in ports:
-            service = 'Unknown'
-            # Add common service names
-            if port == 21:
-                service = 'FTP'
-            elif port == 22:
-                service = 'SSH'
-            elif port == 23:
-                service = 'Telnet'
-            elif port == 25:
-                service = 'SMTP'
-            elif port == 53:
-                service = 'DNS'
-            elif port == 80:
-                service = 'HTTP'
-            elif port == 110:
-                service = 'POP3'
-            elif port == 143:
-                service = 'IMAP'
-            elif port == 443:
-                service = 'HTTPS'
-            elif port == 445:
-                service = 'SMB'
-            elif port == 3306:
-                service = 'MySQL'
-            elif port == 3389:
-                service = 'RDP'
-            elif port == 5432:
-                service = 'PostgreSQL'
-            elif port == 8080:
-                service = 'HTTP-Proxy'
-            elif port == 8443:
-                service = 'HTTPS-Alt'
-
-            port_objects.append({
-                'port_number': port,
-                'service': service
-            })
+        success = save_port_scan_results(host, ports, services, scan_id)
+
+        port_objects = [{
+            'port_number': port,
+            'service': services[port][0],
+            'confidence': services[port][1]
+        } for port in ports]
 
         return {
             'status': 'complete',
             'progress': 100,
-            'message': f'Found {len(ports)} open ports for {host}',
+            'message': f'Found {len(ports)} open ports for {host}' + (' (cached)' if cache_info['cached'] else ''),
             'host': host,
             'count': len(ports),
-            'ports': port_objects
+            'ports': port_objects,
+            'cache': cache_info
+        }
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': f'Error: {str(e)}',
+            'error': str(e),
+            'complete': True
+        }
+
+@celery.task(bind=True)
+def identify_port_services_task(self, host, address, ports, scan_id=None):
+    """Identify services on a host's open ports and update the port-table guesses already stored for them"""
+    try:
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'status': 'running',
+                'progress': 10,
+                'message': f'Identifying services on {len(ports)} open ports of {host}...'
+            }
+        )
+        services = identify_services({address: ports}).get(address, {})
+        save_ports_to_database(host, ports, services, scan_id)
+        return {
+            'status': 'complete',
+            'progress': 100,
+            'message': f'Identified services on {len(services)} ports of {host}',
+            'host': host,
+            'services': {str(port): {'service': service, 'confidence': confidence}
+                         for port, (service, confidence) in services.items()}
+        }
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': f'Error: {str(e)}',
+            'error': str(e),
+            'complete': True
+        }
+
+@celery.task(bind=True)
+def run_bulk_port_scan_task(self, scan_id):
+    """Scan ports for all live hosts of a scan with a single naabu run"""
+    try:
+        from reconaug import db
+        from reconaug.models import Scan
+        from reconaug.utils.scan_read import get_scan_live_host_urls
+
+        # Map each hostname to the live host rows (http/https) that use it
+        host_ids = {}
+        scan = db.session.get(Scan, scan_id)
+        for host_id, url in (get_scan_live_host_urls(scan) if scan else []):
+            host_ids.setdefault(clean_host(url), []).append(host_id)
+
+        if not host_ids:
+            return {
+                'status': 'complete',
+                'progress': 100,
+                'message': f'No live hosts to scan for scan {scan_id}',
+                'scan_id': scan_id,
+                'hosts_count': 0,
+                'ports_count': 0
+            }
+
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'status': 'running',
+                'progress': 10,
+                'message': f'Scanning ports for {len(host_ids)} hosts...',
+                'scan_id': scan_id,
+                'hosts_count': len(host_ids),
+                'ports_count': 0
+            }
+        )
+
+        found = {'ports': 0}
+
+        def on_result(hostnames, port):
+            # Persist each open port as naabu reports it
+            ids = [host_id for hostname in hostnames for host_id in host_ids.get(hostname, [])]
+            found['ports'] += save_host_ports(scan_id, ids, [port])
+            self.update_state(
+                state='PROGRESS',
+                meta={
+                    'status': 'running',
+                    'progress': 50,
+                    'message': f'Found {found["ports"]} open ports so far...',
+                    'scan_id': scan_id,
+                    'hosts_count': len(host_ids),
+                    'ports_count': found['ports']
+                }
+            )
+
+        # Addresses with a fresh per-IP cache entry are answered from the cache
+        from reconaug.utils.port_cache import scan_ports_bulk_cached
+        results, addresses, cached, error = scan_ports_bulk_cached(
+            list(host_ids), on_result=on_result, list_name=f"scan_{scan_id}")
+        if error:
+            return {
+                'status': 'error',
+                'progress': 100,
+                'message': f'Error scanning ports: {error}',
+                'scan_id': scan_id,
+                'ports_count': found['ports'],
+                'complete': True
+            }
+
+        # Identify services once per address (hostnames sharing an IP share
+        # its services) and update the stored port-table guesses
+        targets = {ip: ports for ip, ports in results.items() if ports}
+        if targets:
+            self.update_state(
+                state='PROGRESS',
+                meta={
+                    'status': 'running',
+                    'progress': 80,
+                    'message': f'Identifying services on {len(targets)} addresses...',
+                    'scan_id': scan_id,
+                    'hosts_count': len(host_ids),
+                    'ports_count': found['ports']
+                }
+            )
+            for ip, services in identify_services(targets).items():
+                ids = [host_id for hostname in addresses[ip] for host_id in host_ids.get(hostname, [])]
+                save_host_ports(scan_id, ids, list(services), services)
+
+        hosts_with_ports = sum(len(addresses[ip]) for ip in targets)
+        return {
+            'status': 'complete',
+            'progress': 100,
+            'message': f'Found open ports on {hosts_with_ports} of {len(host_ids)} hosts ({found["ports"]} new port records)'
+                       + (f', {cached} addresses from cache' if cached else ''),
+            'scan_id': scan_id,
+            'hosts_count': len(host_ids),
+            'ports_count': found['ports'],
+            'cached_count': cached
+        }
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': f'Error: {str(e)}',
+            'error': str(e),
+            'complete': True
+        }
+
+@celery.task(bind=True)
+def diff_scans_task(self, scan_id, base_scan_id=None):
+    """Count the changes between a scan and a base scan (default: the previous scan of the domain)
+
+    Only the counts are returned: the changes themselves are paged from
+    /api/scan/<scan_id>/diff/<change>.
+    """
+    try:
+        from reconaug import db
+        from reconaug.models import Scan
+        from reconaug.utils.scan_diff import get_base_scan, count_diff
+
+        scan = db.session.get(Scan, scan_id)
+        if scan is None:
+            raise ValueError(f"Scan {scan_id} not found")
+        base = get_base_scan(scan, base_scan_id)
+
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'status': 'running',
+                'progress': 10,
+                'message': f'Comparing scan {scan_id} with scan {base.id}...',
+                'scan_id': scan_id,
+                'base_scan_id': base.id
+            }
+        )
+
+        changes = count_diff(base, scan)
+        return {
+            'status': 'complete',
+            'progress': 100,
+            'message': f'Found {sum(changes.values())} changes since scan {base.id}',
+            'scan_id': scan_id,
+            'base_scan_id': base.id,
+            'changes': changes,
+            'complete': True
+        }
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': f'Error: {str(e)}',
+            'error': str(e),
+            'complete': True
+        }
+
+@celery.task(bind=True)
+def archive_scans_task(self, days=None, keep=None):
+    """Archive the scans due under the retention policy and compact the database
+
+    days and keep default to SCAN_RETENTION_DAYS and SCAN_RETENTION_KEEP.
+    Run daily by celery beat (see beat_schedule in reconaug.celery_app).
+    """
+    try:
+        from reconaug.utils.archive import archive_old_scans
+
+        self.update_state(
+            state='PROGRESS',
+            meta={
+                'status': 'running',
+                'progress': 10,
+                'message': 'Archiving old scans...'
+            }
+        )
+
+        result = archive_old_scans(days, keep)
+        return {
+            'status': 'complete',
+            'progress': 100,
+            'message': f'Archived {len(result["archived"])} scans',
+            'complete': True,
+            **result
         }
     except Exception as e:
         import traceback
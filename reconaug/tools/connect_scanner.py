@@ -0,0 +1,109 @@
+import os
+import asyncio
+import socket
+
+# Port profiles for the connect scanner (top-100 mirrors naabu's default)
+TOP_20_PORTS = [21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 993, 995, 1723, 3306, 3389, 5900, 8080]
+
+TOP_100_PORTS = [
+    7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110, 111, 113, 119, 135,
+    139, 143, 144, 179, 199, 389, 427, 443, 444, 445, 465, 513, 514, 515, 543, 544, 548, 554, 587, 631,
+    646, 873, 990, 993, 995, 1025, 1026, 1027, 1028, 1029, 1110, 1433, 1720, 1723, 1755, 1900, 2000, 2001, 2049, 2121,
+    2717, 3000, 3128, 3306, 3389, 3986, 4899, 5000, 5009, 5051, 5060, 5101, 5190, 5357, 5432, 5631, 5666, 5800, 5900, 6000,
+    6001, 6646, 7070, 8000, 8008, 8009, 8080, 8081, 8443, 8888, 9100, 9999, 10000, 32768, 49152, 49153, 49154, 49155, 49156, 49157
+]
+
+PORT_PROFILES = {
+    'top-20': TOP_20_PORTS,
+    'top-100': TOP_100_PORTS,
+    'full': list(range(1, 65536)),
+}
+
+# Defaults, overridable through the environment
+DEFAULT_PROFILE = os.environ.get('RECONAUG_PORT_PROFILE', 'top-100')
+DEFAULT_TIMEOUT = float(os.environ.get('RECONAUG_CONNECT_TIMEOUT', '1.0'))
+DEFAULT_GLOBAL_CONCURRENCY = int(os.environ.get('RECONAUG_CONNECT_CONCURRENCY', '500'))
+DEFAULT_HOST_CONCURRENCY = int(os.environ.get('RECONAUG_CONNECT_HOST_CONCURRENCY', '100'))
+
+def get_profile_ports(profile):
+    """Return the port list for a profile name, or raise ValueError"""
+    if profile not in PORT_PROFILES:
+        raise ValueError(f"Unknown port profile '{profile}' (choose from {', '.join(PORT_PROFILES)})")
+    return PORT_PROFILES[profile]
+
+async def _probe(address, port, timeout, host_limit):
+    """Return True if a TCP connection to address:port succeeds within the timeout"""
+    async with host_limit:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+async def connect_scan_async(addresses, ports, timeout=DEFAULT_TIMEOUT,
+                             global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                             host_concurrency=DEFAULT_HOST_CONCURRENCY, on_result=None):
+    """Connect-scan ports on many addresses concurrently, returning {address: [open ports]}
+
+    A fixed pool of global_concurrency workers takes (address, port) pairs
+    from one shared iterator, so memory stays flat however many pairs
+    there are, and at most host_concurrency connections are open against
+    any single address. Pairs are handed out port by port across the
+    addresses, which keeps the workers spread over the hosts.
+    on_result(address, port) is called as each open port is found.
+    """
+    results = {address: [] for address in addresses}
+    host_limits = {address: asyncio.Semaphore(host_concurrency) for address in results}
+    # Single-threaded event loop: next() on the shared iterator needs no lock
+    pairs = ((address, port) for port in ports for address in results)
+
+    async def worker():
+        for address, port in pairs:
+            if await _probe(address, port, timeout, host_limits[address]):
+                results[address].append(port)
+                if on_result:
+                    on_result(address, port)
+
+    workers = min(global_concurrency, len(results) * len(ports))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    for open_ports in results.values():
+        open_ports.sort()
+    return results
+
+def connect_scan_many(addresses, profile=None, ports=None, timeout=DEFAULT_TIMEOUT,
+                      global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                      host_concurrency=DEFAULT_HOST_CONCURRENCY, on_result=None):
+    """Synchronous wrapper around connect_scan_async for a list of addresses"""
+    if ports is None:
+        ports = get_profile_ports(profile or DEFAULT_PROFILE)
+    return asyncio.run(connect_scan_async(
+        addresses, ports, timeout=timeout,
+        global_concurrency=global_concurrency,
+        host_concurrency=host_concurrency,
+        on_result=on_result
+    ))
+
+def connect_scan(host, profile=None, ports=None, timeout=DEFAULT_TIMEOUT,
+                 global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                 host_concurrency=DEFAULT_HOST_CONCURRENCY):
+    """Scan a single host with TCP connects, returning (ports, error) like scan_ports"""
+    try:
+        address = socket.gethostbyname(host)
+    except (socket.gaierror, UnicodeError) as e:
+        return [], f"Could not resolve {host}: {e}"
+
+    try:
+        results = connect_scan_many(
+            [address], profile=profile, ports=ports, timeout=timeout,
+            global_concurrency=global_concurrency, host_concurrency=host_concurrency
+        )
+        return results[address], None
+    except ValueError as e:
+        return [], str(e)
+    except Exception as e:
+        return [], f"Unexpected error in connect scan: {e}"
@@ -1,8 +1,12 @@
 import os
+import json
+import socket
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import urllib3
 from reconaug.tools.checker import check_tools
+from reconaug.tools.connect_scanner import connect_scan, connect_scan_many
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -117,7 +121,8 @@ def scan_ports(host):
         # Check if naabu is available
         tools = check_tools()
         if not tools['naabu']:
-            return [], "naabu tool not available"
+            print(f"naabu not available, using connect scan for {clean_host}")
+            return connect_scan(clean_host)
 
         # Run naabu with verbose output
         print(f"Running naabu command: naabu -host {clean_host} -o {output_file}")
@@ -183,34 +188,108 @@ def scan_ports(host):
                         except ValueError:
                             pass
 
-                    # If still no ports, add some common ports as a fallback
+                    # If still no ports, confirm them with a connect scan instead of guessing
                     if not ports:
-                        print("Adding common ports as fallback")
-                        ports = [80, 443]  # Add common web ports as fallback
+                        print("Ports missing from naabu output, falling back to connect scan")
+                        return connect_scan(clean_host)
 
         return ports, None
     except subprocess.CalledProcessError as e:
-        return [], f"Error running naabu: {e}"
+        # naabu fails without raw-socket privileges among other reasons
+        print(f"Error running naabu ({e}), falling back to connect scan for {clean_host}")
+        return connect_scan(clean_host)
     except Exception as e:
         return [], f"Unexpected error: {e}"
 
-def get_common_service(port):
-    """Return common service name for a port number"""
-    common_ports = {
-        21: 'FTP',
-        22: 'SSH',
-        23: 'Telnet',
-        25: 'SMTP',
-        53: 'DNS',
-        80: 'HTTP',
-        110: 'POP3',
-        143: 'IMAP',
-        443: 'HTTPS',
-        445: 'SMB',
-        3306: 'MySQL',
-        3389: 'RDP',
-        5432: 'PostgreSQL',
-        8080: 'HTTP-Proxy',
-        8443: 'HTTPS-Alt'
-    }
-    return common_ports.get(port, 'Unknown')
+def clean_host(host):
+    """Strip protocol, path and port from a host or URL, leaving the hostname"""
+    clean = host.strip()
+    if '://' in clean:
+        clean = clean.split('://', 1)[1]
+    clean = clean.split('/', 1)[0]
+    if ':' in clean:
+        clean = clean.split(':', 1)[0]
+    return clean.lower()
+
+def resolve_hosts(hostnames, max_workers=50):
+    """Resolve hostnames to IPv4 addresses, returning ({ip: [hostnames]}, [unresolved])"""
+    def resolve(hostname):
+        try:
+            return hostname, socket.gethostbyname(hostname)
+        except (socket.gaierror, UnicodeError):
+            return hostname, None
+
+    addresses = {}
+    unresolved = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for hostname, ip in executor.map(resolve, sorted(set(hostnames))):
+            if ip:
+                addresses.setdefault(ip, []).append(hostname)
+            else:
+                unresolved.append(hostname)
+    return addresses, unresolved
+
+def scan_addresses(addresses, on_result=None, list_name='bulk'):
+    """Scan ports for resolved addresses ({ip: [hostnames]}) with a single naabu run
+
+    on_result(hostnames, port) is called for every open port as soon as
+    naabu reports it. Returns ({ip: [ports]}, error).
+    """
+    if not addresses:
+        return {}, None
+
+    try:
+        results = {ip: [] for ip in addresses}
+
+        def record(ip, port):
+            if ip not in results or port in results[ip]:
+                return
+            results[ip].append(port)
+            if on_result:
+                on_result(addresses[ip], port)
+
+        tools = check_tools()
+        if not tools['naabu']:
+            print("naabu not available, using connect scan")
+            connect_scan_many(list(addresses), on_result=record)
+            return results, None
+
+        os.makedirs('output', exist_ok=True)
+        list_file = f"output/naabu_list_{list_name}.txt"
+        with open(list_file, 'w') as f:
+            for ip in sorted(addresses):
+                f.write(f"{ip}\n")
+
+        process = subprocess.Popen(
+            ['naabu', '-list', list_file, '-json', '-silent'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+        for line in process.stdout:
+            line = line.strip()
+            if not line.startswith('{'):
+                if line:
+                    print(f"naabu: {line}")
+                continue
+            try:
+                entry = json.loads(line)
+                ip = entry.get('ip') or entry.get('host')
+                port = entry.get('port')
+                if isinstance(port, dict):
+                    port = port.get('Port') or port.get('port')
+                port = int(port)
+            except (ValueError, TypeError):
+                print(f"Could not parse naabu output line: {line}")
+                continue
+
+            record(ip, port)
+
+        returncode = process.wait()
+        if returncode != 0:
+            # naabu fails without raw-socket privileges among other reasons
+            print(f"naabu exited with code {returncode}, falling back to connect scan")
+            connect_scan_many(list(addresses), on_result=record)
+        return results, None
+    except Exception as e:
+        return {}, f"Unexpected error: {e}"
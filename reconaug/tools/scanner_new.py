@@ -121,24 +121,3 @@ def scan_ports(host):
         return [], f"Error running naabu: {e}"
     except Exception as e:
         return [], f"Unexpected error: {e}"
-
-def get_common_service(port):
-    """Return common service name for a port number"""
-    common_ports = {
-        21: 'FTP',
-        22: 'SSH',
-        23: 'Telnet',
-        25: 'SMTP',
-        53: 'DNS',
-        80: 'HTTP',
-        110: 'POP3',
-        143: 'IMAP',
-        443: 'HTTPS',
-        445: 'SMB',
-        3306: 'MySQL',
-        3389: 'RDP',
-        5432: 'PostgreSQL',
-        8080: 'HTTP-Proxy',
-        8443: 'HTTPS-Alt'
-    }
-    return common_ports.get(port, 'Unknown')
@@ -0,0 +1,187 @@
+import os
+import re
+import ssl
+import asyncio
+
+# Preferred names for well-known ports; these override /etc/services
+COMMON_SERVICES = {
+    21: 'FTP',
+    22: 'SSH',
+    23: 'Telnet',
+    25: 'SMTP',
+    53: 'DNS',
+    80: 'HTTP',
+    110: 'POP3',
+    111: 'RPCbind',
+    135: 'MSRPC',
+    139: 'NetBIOS-SSN',
+    143: 'IMAP',
+    389: 'LDAP',
+    443: 'HTTPS',
+    445: 'SMB',
+    465: 'SMTPS',
+    587: 'SMTP-Submission',
+    636: 'LDAPS',
+    993: 'IMAPS',
+    995: 'POP3S',
+    1433: 'MSSQL',
+    1521: 'Oracle',
+    2049: 'NFS',
+    3306: 'MySQL',
+    3389: 'RDP',
+    5432: 'PostgreSQL',
+    5900: 'VNC',
+    6379: 'Redis',
+    8080: 'HTTP-Proxy',
+    8443: 'HTTPS-Alt',
+    9200: 'Elasticsearch',
+    11211: 'Memcached',
+    27017: 'MongoDB'
+}
+
+# Confidence of a service name taken from the port table rather than a banner
+PORT_TABLE_CONFIDENCE = 0.4
+
+SERVICES_FILE = '/etc/services'
+
+def _load_port_table():
+    """Build a 65536-entry list mapping port number to service name"""
+    table = [None] * 65536
+    if os.path.exists(SERVICES_FILE):
+        with open(SERVICES_FILE, 'r') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) < 2 or not fields[1].endswith('/tcp'):
+                    continue
+                try:
+                    port = int(fields[1].split('/', 1)[0])
+                except ValueError:
+                    continue
+                if 0 < port < 65536 and table[port] is None:
+                    table[port] = fields[0]
+    for port, name in COMMON_SERVICES.items():
+        table[port] = name
+    return table
+
+# Loaded once at import time
+PORT_TABLE = _load_port_table()
+
+def get_common_service(port):
+    """Return common service name for a port number"""
+    if 0 < port < 65536 and PORT_TABLE[port]:
+        return PORT_TABLE[port]
+    return 'Unknown'
+
+# Probes sent when the server does not speak first
+HTTP_PROBE = b'HEAD / HTTP/1.0\r\n\r\n'
+
+# Banner match database: (service, pattern, confidence), compiled once
+MATCHES = [(service, re.compile(pattern, re.DOTALL), confidence) for service, pattern, confidence in [
+    ('SSH', rb'^SSH-\d+\.\d+-', 0.95),
+    ('FTP', rb'^220[ -][^\r\n]*(?i:ftp)', 0.9),
+    ('SMTP', rb'^220[ -][^\r\n]*(?i:smtp|mail|postfix|exim|sendmail)', 0.9),
+    ('FTP', rb'^220[ -]', 0.6),
+    ('POP3', rb'^\+OK', 0.85),
+    ('IMAP', rb'^\* (?:OK|PREAUTH)[^\r\n]*(?i:imap)', 0.9),
+    ('MySQL', rb'^.\x00\x00\x00\x0a\d+\.\d+', 0.9),
+    ('Telnet', rb'^\xff[\xfb-\xfe]', 0.8),
+    ('VNC', rb'^RFB \d{3}\.\d{3}', 0.95),
+    ('Redis', rb'^-(?:ERR|NOAUTH|DENIED)', 0.7),
+    ('HTTP', rb'^HTTP/\d\.\d \d{3}', 0.95),
+]]
+
+def match_banner(banner):
+    """Return (service, confidence) for a banner, or (None, 0.0) if nothing matches"""
+    for service, pattern, confidence in MATCHES:
+        if pattern.search(banner):
+            return service, confidence
+    return None, 0.0
+
+def _tls_context():
+    """Return a TLS context that accepts any certificate (we only want the banner)"""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def _read_banner(address, port, timeout, probe=None, use_tls=False, max_bytes=1024):
+    """Connect, optionally send a probe, and read up to max_bytes within the timeout
+
+    Returns None if the connection (or TLS handshake) fails, else the bytes read.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port, ssl=_tls_context() if use_tls else None),
+            timeout
+        )
+    except (OSError, ssl.SSLError, asyncio.TimeoutError):
+        return None
+    try:
+        if probe:
+            writer.write(probe)
+            await writer.drain()
+        return await asyncio.wait_for(reader.read(max_bytes), timeout)
+    except (OSError, ssl.SSLError, asyncio.TimeoutError):
+        return b''
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+async def identify_service(address, port, timeout=2.0, limit=None):
+    """Identify the service on one open port, returning (service, confidence)
+
+    The banner the server sends on connect is matched first; if there is
+    none (or it does not match) an HTTP probe is tried in plain text and
+    then over TLS. Ports that match nothing fall back to the port table
+    with low confidence.
+    """
+    async def run():
+        banner = await _read_banner(address, port, timeout)
+        service, confidence = match_banner(banner) if banner else (None, 0.0)
+        if service:
+            return service, confidence
+
+        banner = await _read_banner(address, port, timeout, probe=HTTP_PROBE)
+        service, confidence = match_banner(banner) if banner else (None, 0.0)
+        if service and port not in (443, 8443):
+            return service, confidence
+
+        # Plain-text probes to TLS ports often get an HTTP 400 or nothing at all
+        banner = await _read_banner(address, port, timeout, probe=HTTP_PROBE, use_tls=True)
+        if banner is not None:
+            service, confidence = match_banner(banner)
+            if service == 'HTTP':
+                return 'HTTPS', confidence
+            return f"SSL/{get_common_service(port)}", 0.6
+
+        if service:
+            return service, confidence
+
+        name = get_common_service(port)
+        return name, PORT_TABLE_CONFIDENCE if name != 'Unknown' else 0.0
+
+    if limit is None:
+        return await run()
+    async with limit:
+        return await run()
+
+async def identify_services_async(targets, timeout=2.0, concurrency=50):
+    """Identify services for {address: [ports]}, returning {address: {port: (service, confidence)}}"""
+    limit = asyncio.Semaphore(concurrency)
+    results = {address: {} for address in targets}
+
+    async def check(address, port):
+        results[address][port] = await identify_service(address, port, timeout, limit)
+
+    await asyncio.gather(*(check(address, port) for address, ports in targets.items() for port in ports))
+    return results
+
+def identify_services(targets, timeout=2.0, concurrency=50):
+    """Synchronous wrapper around identify_services_async"""
+    targets = {address: ports for address, ports in targets.items() if ports}
+    if not targets:
+        return {}
+    return asyncio.run(identify_services_async(targets, timeout=timeout, concurrency=concurrency))
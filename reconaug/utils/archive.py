@@ -0,0 +1,352 @@
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from itertools import islice
+from flask import current_app
+from reconaug import db
+from reconaug.models import (
+    Scan, Subdomain, LiveHost, Port, ScanAsset, ScanStats, ScanArchive
+)
+from reconaug.utils.inventory import uses_inventory
+from reconaug.utils.scan_read import scan_subdomain_query, scan_live_host_query, scan_port_query, STREAM_BATCH_SIZE
+from reconaug.utils.url_store import (
+    iter_scan_urls, remove_scan_urls, matches_url_filters, encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
+)
+from reconaug.utils.search import optimize_fts_indexes
+from reconaug.utils.writer import run_write
+
+# Layout version recorded in each archive's manifest
+ARCHIVE_FORMAT = 1
+
+# Default and maximum page sizes for the archived scan listing
+DEFAULT_ARCHIVE_PAGE_SIZE = 50
+MAX_ARCHIVE_PAGE_SIZE = 500
+
+# Statuses of scans that are no longer written to; only these are archived
+FINISHED_SCAN_STATUSES = ('complete', 'error')
+
+def _query_rows(query_for, *order):
+    def rows(scan):
+        for row in query_for(scan).order_by(*order).yield_per(STREAM_BATCH_SIZE):
+            yield row._asdict()
+    return rows
+
+# kind -> function yielding a live scan's rows as dicts, in the order they are archived
+ARCHIVE_KINDS = {
+    'subdomains': _query_rows(scan_subdomain_query, Subdomain.name),
+    'live_hosts': _query_rows(scan_live_host_query, LiveHost.url),
+    'ports': _query_rows(scan_port_query, LiveHost.url, Port.port_number),
+    'urls': lambda scan: ({'url': url} for url in iter_scan_urls(scan.id))
+}
+
+def archive_root():
+    """Return the directory archives are written to (SCAN_ARCHIVE_DIR)"""
+    return current_app.config['SCAN_ARCHIVE_DIR']
+
+def is_archived(scan):
+    """Whether scan is an archived scan (ScanArchive) rather than a live Scan"""
+    return isinstance(scan, ScanArchive)
+
+def get_scan_or_archive(scan_id):
+    """Return the Scan with this id, its ScanArchive if it was archived, or None"""
+    return db.session.get(Scan, scan_id) or db.session.get(ScanArchive, scan_id)
+
+def _write_rows(path, rows):
+    """Write row dicts to a gzip-compressed NDJSON file, returning the number of rows"""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+def write_scan_archive(scan):
+    """Write a live scan's rows to its archive directory, returning (relative path, manifest, size in bytes)
+
+    Each kind of row goes to its own <kind>.ndjson.gz file, streamed from
+    the database in batches, next to a manifest.json with the scan's
+    summary, stats and row counts. The files are written to a staging
+    directory that replaces the archive in one rename, so an interrupted
+    run never leaves a partial archive behind.
+    """
+    relative = os.path.join(re.sub(r'[^A-Za-z0-9.-]', '_', scan.domain), f'scan_{scan.id}')
+    final = os.path.join(archive_root(), relative)
+    staging = final + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    counts = {}
+    for kind, rows in ARCHIVE_KINDS.items():
+        counts[kind] = _write_rows(os.path.join(staging, f'{kind}.ndjson.gz'), rows(scan))
+
+    stats = db.session.get(ScanStats, scan.id)
+    manifest = {
+        'format': ARCHIVE_FORMAT,
+        'scan': scan.to_dict(),
+        'asset_storage': scan.asset_storage,
+        'stats': {
+            'subdomains': counts['subdomains'],
+            'live_hosts': counts['live_hosts'],
+            'ports': counts['ports'],
+            'urls': counts['urls'],
+            'status_codes': json.loads(stats.status_codes) if stats else {}
+        },
+        'archived_at': datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(staging, final)
+    size = sum(os.path.getsize(os.path.join(final, name)) for name in os.listdir(final))
+    return relative, manifest, size
+
+def _detach_inventory_scan(scan):
+    """Remove an inventory scan from its domain's observations and re-home the shared rows it owns
+
+    Observations of this scan alone are deleted, and runs that start or end
+    at it are shortened to the neighbouring inventory scan. Subdomain and
+    LiveHost rows first seen in this scan move to the first scan still
+    observing them, or are deleted (with their ports) if none does.
+    Returns the ids of scans that took over live hosts, whose port counts
+    change.
+    """
+    inventory_scans = db.session.query(Scan.id).filter(Scan.domain == scan.domain, Scan.asset_storage == 'inventory')
+    previous_id = inventory_scans.filter(Scan.id < scan.id).with_entities(db.func.max(Scan.id)).scalar()
+    next_id = inventory_scans.filter(Scan.id > scan.id).with_entities(db.func.min(Scan.id)).scalar()
+
+    domain = (ScanAsset.domain == scan.domain, ScanAsset.kind.in_(('subdomain', 'live_host')))
+    db.session.execute(db.delete(ScanAsset).where(
+        *domain, ScanAsset.first_scan_id == scan.id, ScanAsset.last_scan_id == scan.id
+    ))
+    # Any run still starting or ending here continues past it, so the neighbour exists
+    db.session.execute(db.update(ScanAsset).where(*domain, ScanAsset.first_scan_id == scan.id).values(
+        first_scan_id=next_id
+    ))
+    db.session.execute(db.update(ScanAsset).where(*domain, ScanAsset.last_scan_id == scan.id).values(
+        last_scan_id=previous_id
+    ))
+
+    for kind, model in (('subdomain', Subdomain), ('live_host', LiveHost)):
+        observed = db.exists().where(ScanAsset.kind == kind, ScanAsset.asset_id == model.id)
+        if model is LiveHost:
+            orphans = db.select(LiveHost.id).where(LiveHost.scan_id == scan.id, ~observed)
+            db.session.execute(db.delete(Port).where(Port.host_id.in_(orphans)))
+        db.session.execute(db.delete(model).where(model.scan_id == scan.id, ~observed))
+
+        first_seen = db.select(db.func.min(ScanAsset.first_scan_id)).where(
+            ScanAsset.kind == kind, ScanAsset.asset_id == model.id
+        ).scalar_subquery()
+        db.session.execute(db.update(model).where(model.scan_id == scan.id).values(scan_id=first_seen))
+
+def _delete_scan(scan_id, archive):
+    """Write job: delete a scan and its rows and record its archive"""
+    scan = db.session.get(Scan, scan_id)
+    db.session.execute(db.delete(Port).where(Port.scan_id == scan_id))
+    if uses_inventory(scan):
+        _detach_inventory_scan(scan)
+    else:
+        host_ids = db.select(LiveHost.id).where(LiveHost.scan_id == scan_id)
+        db.session.execute(db.delete(Port).where(Port.host_id.in_(host_ids)))
+        db.session.execute(db.delete(LiveHost).where(LiveHost.scan_id == scan_id))
+        db.session.execute(db.delete(Subdomain).where(Subdomain.scan_id == scan_id))
+
+    remove_scan_urls(scan)
+    db.session.execute(db.delete(ScanStats).where(ScanStats.scan_id == scan_id))
+    db.session.execute(db.delete(Scan).where(Scan.id == scan_id))
+    db.session.execute(db.delete(ScanArchive).where(ScanArchive.id == scan_id))
+    db.session.execute(ScanArchive.__table__.insert().values(**archive))
+
+def archive_scan(scan_id):
+    """Move a scan to compressed files on disk and delete its rows from the database
+
+    The archive is written first and the rows are deleted afterwards in one
+    write transaction, which also records the scan in ScanArchive, so a
+    failure at any point leaves the scan either live or archived. The
+    newest scan cannot be archived: SQLite would give its id to the next
+    scan. Raises ValueError if the scan does not exist or is the newest.
+    Returns the ScanArchive dict.
+    """
+    scan = db.session.get(Scan, scan_id)
+    if scan is None:
+        raise ValueError(f"Scan {scan_id} not found")
+    if scan.id == db.session.query(db.func.max(Scan.id)).scalar():
+        raise ValueError(f"Scan {scan_id} is the newest scan and cannot be archived")
+
+    relative, manifest, size = write_scan_archive(scan)
+    archive = {
+        'id': scan.id,
+        'domain': scan.domain,
+        'timestamp': scan.timestamp,
+        'status': scan.status,
+        'subdomains_count': scan.subdomains_count,
+        'live_hosts_count': scan.live_hosts_count,
+        'stats': json.dumps(manifest['stats'], sort_keys=True),
+        'path': relative,
+        'size': size,
+        'archived_at': datetime.fromisoformat(manifest['archived_at'])
+    }
+    db.session.commit()  # end this session's transaction before the write job runs
+    run_write(_delete_scan, scan_id, archive)
+    print(f"Archived scan {scan_id} ({archive['domain']}) to {relative}: {size} bytes")
+    return db.session.get(ScanArchive, scan_id).to_dict()
+
+def scans_due_for_archive(days=None, keep=None):
+    """Return the ids of scans the retention policy archives, oldest first
+
+    A scan is due when it has finished, is older than days
+    (SCAN_RETENTION_DAYS) and is not one of the keep (SCAN_RETENTION_KEEP)
+    newest finished scans of its domain, so every domain keeps its latest
+    results live and a scan still being written is never archived.
+    """
+    days = current_app.config['SCAN_RETENTION_DAYS'] if days is None else days
+    keep = current_app.config['SCAN_RETENTION_KEEP'] if keep is None else keep
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    rank = db.func.row_number().over(
+        partition_by=Scan.domain, order_by=(Scan.timestamp.desc(), Scan.id.desc())
+    ).label('rank')
+    ranked = db.select(Scan.id, Scan.timestamp, rank).where(Scan.status.in_(FINISHED_SCAN_STATUSES)).subquery()
+    rows = db.session.execute(
+        db.select(ranked.c.id).where(ranked.c.timestamp < cutoff, ranked.c.rank > max(keep, 0))
+        .order_by(ranked.c.timestamp, ranked.c.id)
+    )
+    return [scan_id for (scan_id,) in rows]
+
+def database_size():
+    """Return the size of the database in bytes (SQLite file and WAL, or pg_database_size)"""
+    if db.engine.dialect.name == 'sqlite':
+        path = db.engine.url.database
+        return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+    return db.session.execute(db.text('SELECT pg_database_size(current_database())')).scalar()
+
+def compact_database():
+    """Return the space freed by deletes: VACUUM (and a WAL truncate) on SQLite, VACUUM ANALYZE on PostgreSQL
+
+    On SQLite the full-text indexes are optimized first, as they keep
+    deleted entries until then. VACUUM cannot run in a transaction, so it
+    uses its own autocommit connection. Returns the bytes freed, from
+    database_size() before and after.
+    """
+    size_before = database_size()
+    run_write(optimize_fts_indexes)
+    db.session.remove()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if db.engine.dialect.name == 'sqlite':
+            connection.execute(db.text('VACUUM'))
+            connection.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        else:
+            connection.execute(db.text('VACUUM ANALYZE'))
+    return size_before - database_size()
+
+def archive_old_scans(days=None, keep=None, compact=True):
+    """Archive every scan due under the retention policy, then compact the database
+
+    Returns {'archived': [scan ids], 'skipped': {scan id: reason},
+    'size_before': bytes, 'size_after': bytes}.
+    """
+    size_before = database_size()
+    archived = []
+    skipped = {}
+    for scan_id in scans_due_for_archive(days, keep):
+        try:
+            archive_scan(scan_id)
+            archived.append(scan_id)
+        except ValueError as e:
+            skipped[scan_id] = str(e)
+    if archived and compact:
+        compact_database()
+    return {
+        'archived': archived,
+        'skipped': skipped,
+        'size_before': size_before,
+        'size_after': database_size()
+    }
+
+def iter_archive_rows(archive, kind):
+    """Yield the rows of one kind (see ARCHIVE_KINDS) of an archived scan as dicts, in archive order"""
+    if kind not in ARCHIVE_KINDS:
+        raise ValueError(f"Unknown archive kind '{kind}', expected one of: {', '.join(ARCHIVE_KINDS)}")
+    path = os.path.join(archive_root(), archive.path, f'{kind}.ndjson.gz')
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def iter_scan_rows(scan, kind):
+    """Yield the rows of one kind of a scan as dicts, from the database or its archive"""
+    if is_archived(scan):
+        return iter_archive_rows(scan, kind)
+    return ARCHIVE_KINDS[kind](scan)
+
+def get_archive_rows_page(archive, kind, limit=None, cursor=None, match=None):
+    """Return one page of an archived scan's rows as (row dicts, next_cursor)
+
+    Archives are read sequentially, so the cursor is the position of the
+    next row in the file and each page decompresses up to it. match
+    optionally filters rows. Without a limit every remaining row is
+    returned. Raises ValueError for an invalid cursor.
+    """
+    start = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 1 or not isinstance(position[0], int) or position[0] < 0:
+            raise ValueError("Invalid cursor")
+        start = position[0]
+
+    rows = []
+    for index, row in islice(enumerate(iter_archive_rows(archive, kind)), start, None):
+        if match and not match(row):
+            continue
+        if limit is not None and len(rows) == limit:
+            return rows, encode_cursor([index])
+        rows.append(row)
+    return rows, None
+
+def get_archive_url_page(archive, limit=DEFAULT_PAGE_SIZE, cursor=None, host=None, path_prefix=None,
+                         extension=None, has_params=None):
+    """Return one page of an archived scan's historical URLs as (urls, next_cursor)
+
+    Takes the same filters as url_store.get_scan_url_page, applied while
+    reading the archive.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if host:
+        host = host.lower()
+    if extension:
+        extension = extension.lower().lstrip('.')
+    rows, next_cursor = get_archive_rows_page(
+        archive, 'urls', limit, cursor,
+        match=lambda row: matches_url_filters(row['url'], host, path_prefix, extension, has_params)
+    )
+    return [row['url'] for row in rows], next_cursor
+
+def get_archive_stats(archive):
+    """Return the stats dict recorded for an archived scan (counts and status code histogram)"""
+    return json.loads(archive.stats)
+
+def get_archived_scan_page(limit=DEFAULT_ARCHIVE_PAGE_SIZE, cursor=None, domain=None):
+    """Return one page of archived scans, newest first, as (archives, next_cursor)"""
+    limit = max(1, min(int(limit), MAX_ARCHIVE_PAGE_SIZE))
+    query = ScanArchive.query
+    if domain:
+        query = query.filter(ScanArchive.domain == domain)
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 2:
+            raise ValueError("Invalid cursor")
+        try:
+            timestamp = datetime.fromisoformat(position[0])
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        query = query.filter(db.tuple_(ScanArchive.timestamp, ScanArchive.id) < (timestamp, position[1]))
+
+    rows = query.order_by(ScanArchive.timestamp.desc(), ScanArchive.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].timestamp.isoformat(), rows[-1].id])
+    return rows, next_cursor
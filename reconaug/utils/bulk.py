@@ -0,0 +1,143 @@
+import io
+from datetime import datetime
+from flask import current_app
+from reconaug import db
+from reconaug.models import Scan, Subdomain, LiveHost
+
+# Rows per executemany (or COPY) batch, so memory stays flat on very large scans
+INSERT_CHUNK_SIZE = 5000
+
+def _use_copy():
+    """Whether bulk inserts can use PostgreSQL's COPY (psycopg2 or psycopg 3 only)"""
+    dialect = db.session.get_bind().dialect
+    return (dialect.name == 'postgresql' and dialect.driver in ('psycopg2', 'psycopg')
+            and current_app.config.get('DB_COPY_INGEST', True))
+
+def _copy_value(value):
+    """Format a value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (bytes, bytearray)):
+        return '\\\\x' + value.hex()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def _copy_batch(table, batch):
+    """Load a batch of row dicts into a table with COPY ... FROM STDIN
+
+    Runs on the session's own connection, so it is part of the caller's
+    transaction. Column defaults are not applied: rows must carry every
+    value they need.
+    """
+    columns = list(batch[0])
+    buffer = io.StringIO()
+    for row in batch:
+        buffer.write('\t'.join(_copy_value(row.get(column)) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, buffer)  # psycopg2
+        else:
+            with cursor.copy(sql) as copy:  # psycopg 3
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+def bulk_insert(model, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """Insert row dicts into a model's table chunk by chunk
+
+    Bypasses the ORM unit of work entirely: no objects are built and no
+    primary keys are fetched back. On PostgreSQL the chunks are streamed
+    with COPY, elsewhere they go through Core executemany. Must be called
+    within an app context; the caller commits. Returns the number of rows
+    inserted.
+    """
+    table = model.__table__
+    if _use_copy():
+        write = lambda batch: _copy_batch(table, batch)
+    else:
+        statement = table.insert()
+        write = lambda batch: db.session.execute(statement, batch)
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            write(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        write(batch)
+        count += len(batch)
+    return count
+
+def _live_host_rows(scan_id, live_hosts):
+    """Yield insert rows for live host dicts, skipping malformed entries"""
+    for host in live_hosts:
+        try:
+            yield {
+                'scan_id': scan_id,
+                'url': host['url'],
+                'status_code': host['status_code'],
+                'technology': host['technology']
+            }
+        except KeyError as ke:
+            print(f"KeyError in live host data: {ke}. Host data: {host}")
+            # Continue with other hosts even if one fails
+            continue
+
+def insert_scan(domain, subdomains, live_hosts, status='complete'):
+    """Insert a scan with its subdomains and live hosts, returning the scan id
+
+    The scan row is inserted once to get its id, then subdomains and live
+    hosts go in with chunked multi-row inserts. Must be called within an
+    app context; the caller commits. Duplicate subdomains and live host
+    URLs are dropped, as the tables are unique per scan. With ASSET_STORAGE
+    set to 'inventory' they are recorded in the domain's asset inventory
+    instead (see reconaug.utils.inventory). The scan's stats row is
+    written in the same transaction.
+    """
+    from reconaug.utils.inventory import asset_storage_mode, record_scan_assets
+    from reconaug.utils.scan_stats import record_scan_stats
+
+    subdomains = list(dict.fromkeys(subdomains))
+    unique_hosts = {}
+    for host in live_hosts:
+        unique_hosts.setdefault(host.get('url'), host)
+    live_hosts = list(unique_hosts.values())
+    storage = asset_storage_mode()
+
+    result = db.session.execute(Scan.__table__.insert().values(
+        domain=domain,
+        timestamp=datetime.utcnow(),
+        status=status,
+        subdomains_count=len(subdomains),
+        live_hosts_count=len(live_hosts),
+        asset_storage=storage
+    ))
+    scan_id = result.inserted_primary_key[0]
+    print(f"Created scan record with ID: {scan_id}")
+    record_scan_stats(scan_id, subdomains, live_hosts)
+
+    if storage == 'inventory':
+        record_scan_assets(scan_id, domain, subdomains, live_hosts)
+        return scan_id
+
+    print(f"Adding {len(subdomains)} subdomains to database")
+    bulk_insert(Subdomain, ({
+        'scan_id': scan_id,
+        'name': subdomain,
+        'source': 'combined'  # We don't track individual sources in this version
+    } for subdomain in subdomains))
+
+    print(f"Adding {len(live_hosts)} live hosts to database")
+    bulk_insert(LiveHost, _live_host_rows(scan_id, live_hosts))
+    return scan_id
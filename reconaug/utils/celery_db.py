@@ -1,150 +1,139 @@
 from datetime import datetime
-from reconaug import create_app
 from reconaug.models import Scan, Subdomain, LiveHost, Port, HistoricalUrl
+from reconaug.tools.services import get_common_service, PORT_TABLE_CONFIDENCE
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.database import ensure_app_context
+from reconaug.utils.scan_read import find_port_scan_host
+from reconaug.utils.scan_stats import add_port_stats, rebuild_scan_stats
+from reconaug.utils.writer import run_write
 
 def save_scan_results(domain, subdomains, live_hosts):
     """Save scan results to the database using a new app context"""
     try:
-        # Create a new Flask app and context
-        app = create_app()
-        with app.app_context():
-            from reconaug import db
-
+        # Reuse the task's app context, or the worker's shared app
+        with ensure_app_context():
             print(f"Starting database save for domain: {domain}")
 
-            # Create a new scan record
+            scan_id = run_write(insert_scan, domain, subdomains, live_hosts)
+            print(f"Scan results for {domain} saved to database successfully")
+            return scan_id
+    except Exception as e:
+        print(f"Error saving scan results to database: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def _write_port_scan_results(host_url, ports, services=None, scan_id=None):
+    """Write job for save_port_scan_results: find or create the live host and add its ports"""
+    from reconaug import db
+
+    # Normalize the URL for comparison
+    normalized_url = host_url
+
+    # Try different URL formats
+    possible_urls = [host_url]  # Start with the original URL
+
+    # If URL has a protocol, add version without protocol
+    if '://' in host_url:
+        domain = host_url.split('://', 1)[1]
+        if domain.endswith('/'):
+            domain = domain[:-1]  # Remove trailing slash
+        possible_urls.append(domain)
+    else:
+        # If URL doesn't have a protocol, add versions with protocols
+        possible_urls.append(f"http://{host_url}")
+        possible_urls.append(f"https://{host_url}")
+
+    print(f"Checking for host with URLs: {possible_urls}")
+
+    # Try to find the host, and the scan the ports belong to, with any of the possible URLs
+    found = None
+    for url in possible_urls:
+        found = find_port_scan_host(url, scan_id)
+        if found:
+            print(f"Found host with URL: {url}")
+            break
+
+    # If host not found, try to create it
+    created = not found
+    if created:
+        print(f"Live host {host_url} not found in database, creating new entry")
+
+        # Extract domain from URL
+        domain = host_url
+        if '://' in host_url:
+            domain = host_url.split('://', 1)[1].split('/', 1)[0]
+        if ':' in domain:
+            domain = domain.split(':', 1)[0]
+
+        # Use the requested scan, or the most recent scan for this domain
+        if scan_id is not None:
+            scan = db.session.get(Scan, scan_id)
+        else:
+            scan = db.session.query(Scan).filter(Scan.domain.like(f'%{domain}%')).order_by(Scan.timestamp.desc()).first()
+
+        if not scan:
+            print(f"No scan found for domain {domain}, creating new scan record")
             scan = Scan(
                 domain=domain,
                 timestamp=datetime.utcnow(),
                 status='complete',
-                subdomains_count=len(subdomains),
-                live_hosts_count=len(live_hosts)
+                subdomains_count=0,
+                live_hosts_count=1
             )
             db.session.add(scan)
             db.session.flush()  # Get the scan ID without committing
-            print(f"Created scan record with ID: {scan.id}")
-
-            # Add subdomains
-            print(f"Adding {len(subdomains)} subdomains to database")
-            for subdomain in subdomains:
-                db.session.add(Subdomain(
-                    scan_id=scan.id,
-                    name=subdomain,
-                    source='combined'  # We don't track individual sources in this version
-                ))
-
-            # Add live hosts
-            print(f"Adding {len(live_hosts)} live hosts to database")
-            for host in live_hosts:
-                try:
-                    live_host = LiveHost(
-                        scan_id=scan.id,
-                        url=host['url'],
-                        status_code=host['status_code'],
-                        technology=host['technology']
-                    )
-                    db.session.add(live_host)
-                    db.session.flush()  # Get the live host ID
-                except KeyError as ke:
-                    print(f"KeyError in live host data: {ke}. Host data: {host}")
-                    # Continue with other hosts even if one fails
-                    continue
-
-            # Commit all changes
-            db.session.commit()
-            print(f"Scan results for {domain} saved to database successfully")
-            return scan.id
-    except Exception as e:
-        print(f"Error saving scan results to database: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
 
-def save_port_scan_results(host_url, ports):
-    """Save port scan results to the database using a new app context"""
+        # Create new live host record
+        host = LiveHost(
+            scan_id=scan.id,
+            url=host_url,
+            status_code='200',  # Default status code
+            technology='Unknown'
+        )
+        db.session.add(host)
+        db.session.flush()  # Get the host ID without committing
+        print(f"Created new live host record with ID: {host.id}")
+        found = (host.id, scan.id)
+    host_id, scan_id = found
+
+    # Add ports, updating any already recorded in this scan (e.g. a cached result saved again)
+    existing = {p.port_number: p for p in Port.query.filter_by(host_id=host_id, scan_id=scan_id)}
+    added = 0
+    for port in dict.fromkeys(ports):
+        service, confidence = _port_service(port, services)
+        if port in existing:
+            if services and port in services:
+                existing[port].service = service
+                existing[port].confidence = confidence
+            continue
+        db.session.add(Port(
+            host_id=host_id,
+            scan_id=scan_id,
+            port_number=port,
+            service=service,
+            confidence=confidence
+        ))
+        added += 1
+
+    if created:
+        # A new host changes the live host counts too
+        rebuild_scan_stats(scan_id)
+    else:
+        add_port_stats({scan_id: added})
+
+def save_port_scan_results(host_url, ports, services=None, scan_id=None):
+    """Save port scan results to the database using a new app context
+
+    services optionally maps port -> (service, confidence) from service
+    identification; ports without an entry use the port table. The ports
+    are recorded against scan_id, or the newest scan that found the host.
+    """
     print(f"Saving port scan results for {host_url} with {len(ports)} ports")
     try:
-        # Create a new Flask app and context
-        print(f"Creating Flask app context for {host_url}")
-        app = create_app()
-        with app.app_context():
-            print(f"Flask app context created for {host_url}")
-            from reconaug import db
-
-            # Normalize the URL for comparison
-            normalized_url = host_url
-
-            # Try different URL formats
-            possible_urls = [host_url]  # Start with the original URL
-
-            # If URL has a protocol, add version without protocol
-            if '://' in host_url:
-                domain = host_url.split('://', 1)[1]
-                if domain.endswith('/'):
-                    domain = domain[:-1]  # Remove trailing slash
-                possible_urls.append(domain)
-            else:
-                # If URL doesn't have a protocol, add versions with protocols
-                possible_urls.append(f"http://{host_url}")
-                possible_urls.append(f"https://{host_url}")
-
-            print(f"Checking for host with URLs: {possible_urls}")
-
-            # Try to find the host with any of the possible URLs
-            host = None
-            for url in possible_urls:
-                host = LiveHost.query.filter_by(url=url).first()
-                if host:
-                    print(f"Found host with URL: {url}")
-                    break
-
-            # If host not found, try to create it
-            if not host:
-                print(f"Live host {host_url} not found in database, creating new entry")
-
-                # Extract domain from URL
-                domain = host_url
-                if '://' in host_url:
-                    domain = host_url.split('://', 1)[1].split('/', 1)[0]
-                if ':' in domain:
-                    domain = domain.split(':', 1)[0]
-
-                # Find the most recent scan for this domain
-                scan = db.session.query(Scan).filter(Scan.domain.like(f'%{domain}%')).order_by(Scan.timestamp.desc()).first()
-
-                if not scan:
-                    print(f"No scan found for domain {domain}, creating new scan record")
-                    scan = Scan(
-                        domain=domain,
-                        timestamp=datetime.utcnow(),
-                        status='complete',
-                        subdomains_count=0,
-                        live_hosts_count=1
-                    )
-                    db.session.add(scan)
-                    db.session.flush()  # Get the scan ID without committing
-
-                # Create new live host record
-                host = LiveHost(
-                    scan_id=scan.id,
-                    url=host_url,
-                    status_code='200',  # Default status code
-                    technology='Unknown'
-                )
-                db.session.add(host)
-                db.session.flush()  # Get the host ID without committing
-                print(f"Created new live host record with ID: {host.id}")
-
-            # Add ports
-            for port in ports:
-                db.session.add(Port(
-                    host_id=host.id,
-                    port_number=port,
-                    service=get_common_service(port)
-                ))
-
-            # Commit changes
-            db.session.commit()
+        # Reuse the task's app context, or the worker's shared app
+        with ensure_app_context():
+            run_write(_write_port_scan_results, host_url, ports, services, scan_id)
             print(f"Port scan results for {host_url} saved to database")
             return True
     except Exception as e:
@@ -153,89 +142,103 @@ def save_port_scan_results(host_url, ports):
         traceback.print_exc()
         return False
 
+def _port_service(port, services=None):
+    """Return (service, confidence) for a port from identification results or the port table"""
+    if services and port in services:
+        return services[port]
+    service = get_common_service(port)
+    return service, PORT_TABLE_CONFIDENCE if service != 'Unknown' else 0.0
+
+def save_host_ports(scan_id, host_ids, ports, services=None):
+    """Add open ports to existing live hosts of a scan, updating the service of ports already recorded
+
+    services optionally maps port -> (service, confidence). Must be called
+    within an app context (e.g. from a Celery task). Returns the number of
+    ports added.
+    """
+    if not host_ids or not ports:
+        return 0
+    return run_write(_write_host_ports, scan_id, host_ids, ports, services)
+
+def _write_host_ports(scan_id, host_ids, ports, services=None):
+    """Write job for save_host_ports"""
+    from reconaug import db
+
+    existing = {(p.host_id, p.port_number): p for p in Port.query.filter(
+        Port.scan_id == scan_id,
+        Port.host_id.in_(host_ids),
+        Port.port_number.in_(ports)
+    )}
+
+    added = 0
+    for host_id in host_ids:
+        for port in dict.fromkeys(ports):
+            service, confidence = _port_service(port, services)
+            if (host_id, port) in existing:
+                if services and port in services:
+                    existing[(host_id, port)].service = service
+                    existing[(host_id, port)].confidence = confidence
+                continue
+            db.session.add(Port(
+                host_id=host_id,
+                scan_id=scan_id,
+                port_number=port,
+                service=service,
+                confidence=confidence
+            ))
+            added += 1
+    add_port_stats({scan_id: added})
+    return added
+
+def _write_historical_urls(domain, urls):
+    """Write job for save_historical_urls: store the URLs on the domain's latest scan"""
+    from reconaug import db
+
+    # Find the most recent scan for this domain
+    from reconaug.models import Scan
+    scan = db.session.query(Scan).filter_by(domain=domain).order_by(Scan.timestamp.desc()).first()
+
+    # If no scan found, try with/without www prefix
+    if not scan and domain.startswith('www.'):
+        base_domain = domain[4:]
+        scan = db.session.query(Scan).filter_by(domain=base_domain).order_by(Scan.timestamp.desc()).first()
+    if not scan and not domain.startswith('www.'):
+        www_domain = f"www.{domain}"
+        scan = db.session.query(Scan).filter_by(domain=www_domain).order_by(Scan.timestamp.desc()).first()
+
+    # If still no scan found, create a new one
+    if not scan:
+        print(f"No existing scan found for {domain}, creating new scan record")
+        scan = Scan(
+            domain=domain,
+            timestamp=datetime.utcnow(),
+            status='complete',
+            subdomains_count=0,
+            live_hosts_count=0
+        )
+        db.session.add(scan)
+        db.session.flush()  # Get the scan ID without committing
+
+    print(f"Using scan ID: {scan.id} for historical URLs")
+
+    # Replace any existing historical URLs for this scan
+    from reconaug.utils.url_store import save_scan_urls
+    print(f"Adding {len(urls)} historical URLs to database")
+    stored = save_scan_urls(scan.id, urls)
+    print(f"Stored {stored} historical URLs for scan ID: {scan.id}")
+    return scan.id
+
 def save_historical_urls(domain, urls):
     """Save historical URLs to the database using a new app context"""
     try:
-        # Create a new Flask app and context
-        app = create_app()
-        with app.app_context():
-            from reconaug import db
-
+        # Reuse the task's app context, or the worker's shared app
+        with ensure_app_context():
             print(f"Saving historical URLs for domain: {domain}")
-
-            # Find the most recent scan for this domain
-            from reconaug.models import Scan
-            scan = db.session.query(Scan).filter_by(domain=domain).order_by(Scan.timestamp.desc()).first()
-
-            # If no scan found, try with/without www prefix
-            if not scan and domain.startswith('www.'):
-                base_domain = domain[4:]
-                scan = db.session.query(Scan).filter_by(domain=base_domain).order_by(Scan.timestamp.desc()).first()
-            if not scan and not domain.startswith('www.'):
-                www_domain = f"www.{domain}"
-                scan = db.session.query(Scan).filter_by(domain=www_domain).order_by(Scan.timestamp.desc()).first()
-
-            # If still no scan found, create a new one
-            if not scan:
-                print(f"No existing scan found for {domain}, creating new scan record")
-                scan = Scan(
-                    domain=domain,
-                    timestamp=datetime.utcnow(),
-                    status='complete',
-                    subdomains_count=0,
-                    live_hosts_count=0
-                )
-                db.session.add(scan)
-                db.session.flush()  # Get the scan ID without committing
-
-            print(f"Using scan ID: {scan.id} for historical URLs")
-
-            # Check if we already have historical URLs for this scan
-            existing_count = db.session.query(HistoricalUrl).filter_by(scan_id=scan.id).count()
-            if existing_count > 0:
-                print(f"Found {existing_count} existing historical URLs for scan ID: {scan.id}, deleting them")
-                db.session.query(HistoricalUrl).filter_by(scan_id=scan.id).delete()
-
-            # Add historical URLs
-            print(f"Adding {len(urls)} historical URLs to database")
-            batch_size = 100
-            for i in range(0, len(urls), batch_size):
-                batch = urls[i:i+batch_size]
-                for url in batch:
-                    if isinstance(url, str):
-                        db.session.add(HistoricalUrl(
-                            scan_id=scan.id,
-                            url=url
-                        ))
-                db.session.flush()
-
-            # Commit all changes
-            db.session.commit()
+            scan_id = run_write(_write_historical_urls, domain, urls)
             print(f"Historical URLs for {domain} saved to database successfully")
-            return scan.id
+            return scan_id
     except Exception as e:
         print(f"Error saving historical URLs to database: {e}")
         import traceback
         traceback.print_exc()
         return None
-
-def get_common_service(port):
-    """Return common service name for a port number"""
-    common_ports = {
-        21: 'FTP',
-        22: 'SSH',
-        23: 'Telnet',
-        25: 'SMTP',
-        53: 'DNS',
-        80: 'HTTP',
-        110: 'POP3',
-        143: 'IMAP',
-        443: 'HTTPS',
-        445: 'SMB',
-        3306: 'MySQL',
-        3389: 'RDP',
-        5432: 'PostgreSQL',
-        8080: 'HTTP-Proxy',
-        8443: 'HTTPS-Alt'
-    }
-    return common_ports.get(port, 'Unknown')
@@ -0,0 +1,78 @@
+import json
+from reconaug.celery_app import get_redis_client
+
+KEY_PREFIX = 'reconaug:scan-checkpoint'
+
+# Seconds a scan workflow's checkpoints are kept for a redelivered or retried
+# stage to resume from
+CHECKPOINT_TTL = 24 * 3600
+
+# Stage recorded once the scan is saved; a redelivered save returns it
+SAVED_STAGE = 'saved'
+
+def checkpoint_key(workflow_id):
+    """Return the Redis hash of a scan workflow's checkpoints
+
+    Checkpoints belong to one scan attempt (the workflow's root task id),
+    so a new scan of the same domain never picks up another scan's output.
+    """
+    return f'{KEY_PREFIX}:{workflow_id}'
+
+def has_checkpoint(workflow_id, stage=None):
+    """Whether a stage of a scan workflow (or, without a stage, any of them) has completed"""
+    client = get_redis_client()
+    if client is None:
+        return False
+    if stage is None:
+        return bool(client.exists(checkpoint_key(workflow_id)))
+    return bool(client.hexists(checkpoint_key(workflow_id), stage))
+
+def load_checkpoint(workflow_id, stage):
+    """Return the checkpointed output of a stage of a scan workflow, or None if it has not completed"""
+    client = get_redis_client()
+    if client is None:
+        return None
+    value = client.hget(checkpoint_key(workflow_id), stage)
+    return None if value is None else json.loads(value)
+
+def save_checkpoint(workflow_id, stage, value, replace=False):
+    """Record the output of a completed stage, returning True if it was recorded
+
+    Unless replace is set, an existing checkpoint of the stage is kept and
+    False returned: another delivery of the same task got there first, and
+    its work must not be counted twice.
+    """
+    client = get_redis_client()
+    if client is None:
+        return False
+    key = checkpoint_key(workflow_id)
+    pipe = client.pipeline()
+    if replace:
+        pipe.hset(key, stage, json.dumps(value))
+    else:
+        pipe.hsetnx(key, stage, json.dumps(value))
+    pipe.expire(key, CHECKPOINT_TTL)
+    return bool(pipe.execute()[0]) or replace
+
+def discard_checkpoints(workflow_id, prefix):
+    """Remove the checkpoints of a workflow's stages whose names start with prefix"""
+    client = get_redis_client()
+    if client is None:
+        return
+    key = checkpoint_key(workflow_id)
+    stages = [stage for stage in client.hkeys(key)
+              if (stage.decode() if isinstance(stage, bytes) else stage).startswith(prefix)]
+    if stages:
+        client.hdel(key, *stages)
+
+def finish_checkpoints(workflow_id, result):
+    """Keep only the final result of a saved scan, dropping its stages' outputs"""
+    client = get_redis_client()
+    if client is None:
+        return
+    key = checkpoint_key(workflow_id)
+    pipe = client.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, SAVED_STAGE, json.dumps(result))
+    pipe.expire(key, CHECKPOINT_TTL)
+    pipe.execute()
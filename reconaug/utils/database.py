@@ -1,21 +1,37 @@
-from datetime import datetime
-from flask import current_app
-from reconaug import db, create_app
-from reconaug.models import Scan, Subdomain, LiveHost, Port, HistoricalUrl
 import contextlib
+from flask import has_app_context
+from reconaug import db
+from reconaug.celery_app import get_flask_app
+from reconaug.models import Scan, Subdomain, LiveHost, Port, HistoricalUrl
+from reconaug.tools.services import get_common_service, PORT_TABLE_CONFIDENCE
+from reconaug.utils.bulk import insert_scan
+from reconaug.utils.scan_read import find_port_scan_host
+from reconaug.utils.scan_stats import add_port_stats
+from reconaug.utils.url_store import save_scan_urls
+from reconaug.utils.writer import run_write
 
 @contextlib.contextmanager
 def ensure_app_context():
-    """Ensure we have a Flask application context"""
-    try:
-        # Check if we're already in an app context
-        current_app._get_current_object()
+    """Ensure we have a Flask application context
+
+    Reuses the current context if there is one, otherwise pushes one for the
+    process's shared app rather than building a new app each time.
+    """
+    if has_app_context():
+        yield
+        return
+    with get_flask_app().app_context():
         yield
-    except RuntimeError:
-        # Create a new app context if we're not in one
-        app = create_app()
-        with app.app_context():
-            yield
+
+def _write_scan(domain, subdomains, live_hosts, historical_urls=None):
+    """Write job for save_scan_to_database"""
+    scan_id = insert_scan(domain, subdomains, live_hosts)
+
+    # Add historical URLs if available
+    if historical_urls:
+        print(f"Adding {len(historical_urls)} historical URLs to database")
+        save_scan_urls(scan_id, historical_urls)
+    return scan_id
 
 def save_scan_to_database(domain, subdomains, live_hosts, historical_urls=None):
     """Save scan results to the database"""
@@ -23,111 +39,61 @@ def save_scan_to_database(domain, subdomains, live_hosts, historical_urls=None):
         print(f"Starting database save for domain: {domain}")
 
         with ensure_app_context():
-            # Create a new scan record
-            scan = Scan(
-                domain=domain,
-                timestamp=datetime.utcnow(),
-                status='complete',
-                subdomains_count=len(subdomains),
-                live_hosts_count=len(live_hosts)
-            )
-            db.session.add(scan)
-            db.session.flush()  # Get the scan ID without committing
-            print(f"Created scan record with ID: {scan.id}")
-
-        with ensure_app_context():
-            # Add subdomains
-            print(f"Adding {len(subdomains)} subdomains to database")
-            for subdomain in subdomains:
-                db.session.add(Subdomain(
-                    scan_id=scan.id,
-                    name=subdomain,
-                    source='combined'  # We don't track individual sources in this version
-                ))
-
-            # Add live hosts
-            print(f"Adding {len(live_hosts)} live hosts to database")
-            for host in live_hosts:
-                try:
-                    live_host = LiveHost(
-                        scan_id=scan.id,
-                        url=host['url'],
-                        status_code=host['status_code'],
-                        technology=host['technology']
-                    )
-                    db.session.add(live_host)
-                    db.session.flush()  # Get the live host ID
-                except KeyError as ke:
-                    print(f"KeyError in live host data: {ke}. Host data: {host}")
-                    # Continue with other hosts even if one fails
-                    continue
-
-            # Add historical URLs if available
-            if historical_urls:
-                print(f"Adding {len(historical_urls)} historical URLs to database")
-                for url in historical_urls:
-                    db.session.add(HistoricalUrl(
-                        scan_id=scan.id,
-                        url=url
-                    ))
-
-            # Commit all changes
-            db.session.commit()
+            scan_id = run_write(_write_scan, domain, subdomains, live_hosts, historical_urls)
             print(f"Scan results for {domain} saved to database successfully")
-            return scan.id
+            return scan_id
     except Exception as e:
-        with ensure_app_context():
-            db.session.rollback()
         print(f"Error saving scan results to database: {e}")
         import traceback
         traceback.print_exc()
         return None
 
-def save_ports_to_database(host_url, ports):
-    """Save port scan results to the database"""
+def _write_ports(host_url, ports, services=None, scan_id=None):
+    """Write job for save_ports_to_database, returning False if the host is unknown"""
+    # Find the live host record and the scan the ports belong to
+    found = find_port_scan_host(host_url, scan_id)
+    if not found:
+        print(f"Live host {host_url} not found in database")
+        return False
+    host_id, scan_id = found
+
+    # Add ports, updating any already recorded for this host in this scan
+    existing = {p.port_number: p for p in Port.query.filter_by(host_id=host_id, scan_id=scan_id)}
+    added = 0
+    for port in dict.fromkeys(ports):
+        if services and port in services:
+            service, confidence = services[port]
+        else:
+            service = get_common_service(port)
+            confidence = PORT_TABLE_CONFIDENCE if service != 'Unknown' else 0.0
+        if port in existing:
+            existing[port].service = service
+            existing[port].confidence = confidence
+            continue
+        db.session.add(Port(
+            host_id=host_id,
+            scan_id=scan_id,
+            port_number=port,
+            service=service,
+            confidence=confidence
+        ))
+        added += 1
+    add_port_stats({scan_id: added})
+    return True
+
+def save_ports_to_database(host_url, ports, services=None, scan_id=None):
+    """Save port scan results to the database
+
+    services optionally maps port -> (service, confidence) from service
+    identification; ports without an entry use the port table. The ports
+    are recorded against scan_id, or the newest scan that found the host.
+    """
     try:
         with ensure_app_context():
-            # Find the live host record
-            host = LiveHost.query.filter_by(url=host_url).first()
-            if not host:
-                print(f"Live host {host_url} not found in database")
+            if not run_write(_write_ports, host_url, ports, services, scan_id):
                 return False
-
-            # Add ports
-            for port in ports:
-                db.session.add(Port(
-                    host_id=host.id,
-                    port_number=port,
-                    service=get_common_service(port)
-                ))
-
-            # Commit changes
-            db.session.commit()
             print(f"Port scan results for {host_url} saved to database")
             return True
     except Exception as e:
-        with ensure_app_context():
-            db.session.rollback()
         print(f"Error saving port scan results to database: {e}")
         return False
-
-def get_common_service(port):
-    """Return common service name for a port number"""
-    common_ports = {
-        21: 'FTP',
-        22: 'SSH',
-        23: 'Telnet',
-        25: 'SMTP',
-        53: 'DNS',
-        80: 'HTTP',
-        110: 'POP3',
-        143: 'IMAP',
-        443: 'HTTPS',
-        445: 'SMB',
-        3306: 'MySQL',
-        3389: 'RDP',
-        5432: 'PostgreSQL',
-        8080: 'HTTP-Proxy',
-        8443: 'HTTPS-Alt'
-    }
-    return common_ports.get(port, 'Unknown')
@@ -0,0 +1,46 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from reconaug import db
+
+def engine_options(config):
+    """Return SQLALCHEMY_ENGINE_OPTIONS for the configured database
+
+    Server databases (PostgreSQL) get a sized connection pool that checks
+    connections before use and recycles them, so the API and workers reuse
+    connections instead of opening one per request. SQLite keeps
+    SQLAlchemy's default pool.
+    """
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+def configure_engine(app):
+    """Apply per-connection settings to the app's database engine
+
+    For SQLite every new connection gets a busy timeout, so a writer waits
+    for the lock instead of failing with "database is locked", and (with
+    SQLITE_WAL) the WAL journal, so readers never block behind a long
+    ingest. Must be called within an app context.
+    """
+    engine = db.engine
+    if engine.url.get_backend_name() != 'sqlite':
+        return
+
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 30000))
+    wal = app.config.get('SQLITE_WAL', True)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        if wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            # Safe with WAL: a crash can lose the last commits but never corrupts
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+        cursor.close()
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from reconaug.utils.scan_read import (
+    iter_scan_subdomain_names, iter_scan_live_hosts, iter_scan_ports
+)
+from reconaug.utils.url_store import iter_scan_urls
+from reconaug.utils.archive import is_archived, iter_archive_rows
+
+# Approximate size of each chunk of encoded output
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# kind -> (columns, function yielding row dicts for a scan)
+EXPORT_KINDS = {
+    'subdomains': (['name'], lambda scan: ({'name': name} for name in iter_scan_subdomain_names(scan))),
+    'live_hosts': (['id', 'url', 'status_code', 'technology'],
+                   lambda scan: ({key: host[key] for key in ('id', 'url', 'status_code', 'technology')}
+                                 for host in iter_scan_live_hosts(scan))),
+    'ports': (['host_id', 'url', 'port_number', 'service', 'confidence'], iter_scan_ports),
+    'urls': (['url'], lambda scan: ({'url': url} for url in iter_scan_urls(scan.id)))
+}
+
+def _ndjson_chunks(rows):
+    """Encode row dicts as newline-delimited JSON, yielding chunks of about EXPORT_CHUNK_SIZE"""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, separators=(',', ':')) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
+
+def _csv_chunks(columns, rows):
+    """Encode row dicts as CSV with a header row, yielding chunks of about EXPORT_CHUNK_SIZE"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_scan(scan, kind, fmt='ndjson'):
+    """Return a generator of text chunks exporting one kind of a scan's results
+
+    kind is one of EXPORT_KINDS (subdomains, live_hosts, ports, urls) and
+    fmt one of EXPORT_FORMATS. Rows are streamed from the database in
+    batches and encoded as they arrive, so memory use does not depend on
+    the size of the scan. Raises ValueError for an unknown kind or format
+    before anything is read. Must be iterated within an app context.
+
+    scan may also be a ScanArchive: its rows are then streamed from the
+    archive files, with the same columns.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export kind '{kind}', expected one of: {', '.join(EXPORT_KINDS)}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}")
+
+    columns, iter_rows = EXPORT_KINDS[kind]
+    if is_archived(scan):
+        rows = ({column: row.get(column) for column in columns} for row in iter_archive_rows(scan, kind))
+    else:
+        rows = iter_rows(scan)
+    if fmt == 'csv':
+        return _csv_chunks(columns, rows)
+    return _ndjson_chunks(rows)
@@ -0,0 +1,126 @@
+from flask import current_app
+from reconaug import db
+from reconaug.models import Scan, Subdomain, LiveHost, ScanAsset
+from reconaug.utils.bulk import bulk_insert
+
+# Ids per UPDATE ... WHERE id IN (...) statement
+UPDATE_CHUNK_SIZE = 500
+
+def asset_storage_mode():
+    """Return the configured asset storage for new scans: 'rows' or 'inventory'"""
+    mode = current_app.config.get('ASSET_STORAGE', 'rows')
+    return mode if mode in ('rows', 'inventory') else 'rows'
+
+def uses_inventory(scan):
+    """Whether a scan's subdomains and live hosts are stored in the inventory"""
+    return scan.asset_storage == 'inventory'
+
+def _previous_scan_id(domain, scan_id):
+    """Return the id of the latest inventory scan of a domain before scan_id, or None"""
+    return db.session.query(db.func.max(Scan.id)).filter(
+        Scan.domain == domain,
+        Scan.asset_storage == 'inventory',
+        Scan.id < scan_id
+    ).scalar()
+
+def _domain_assets(model, value_column, domain):
+    """Return {value: id} for the inventory rows of a domain"""
+    rows = db.session.query(value_column, model.id).join(Scan, Scan.id == model.scan_id).filter(
+        Scan.domain == domain,
+        Scan.asset_storage == 'inventory'
+    )
+    return dict(rows)
+
+def _record_kind(scan_id, domain, previous_scan_id, kind, model, value_column, items):
+    """Upsert the assets of one kind and extend or open their observations
+
+    items maps value -> (row for a new asset, observed attributes). Returns
+    (new assets, extended observations, new observations).
+    """
+    assets = _domain_assets(model, value_column, domain)
+    new_rows = [row for value, (row, _) in items.items() if value not in assets]
+    if new_rows:
+        bulk_insert(model, new_rows)
+        assets.update(dict(db.session.query(value_column, model.id).filter(model.scan_id == scan_id)))
+
+    # Observations still open at the previous scan can be extended if nothing changed
+    open_observations = {}
+    if previous_scan_id is not None:
+        rows = db.session.query(
+            ScanAsset.id, ScanAsset.asset_id, ScanAsset.status_code, ScanAsset.technology
+        ).filter(
+            ScanAsset.domain == domain,
+            ScanAsset.kind == kind,
+            ScanAsset.last_scan_id == previous_scan_id
+        )
+        open_observations = {asset_id: (id, (status_code, technology))
+                             for id, asset_id, status_code, technology in rows}
+
+    extend = []
+    observations = []
+    for value, (_, attributes) in items.items():
+        asset_id = assets[value]
+        current = open_observations.get(asset_id)
+        if current and current[1] == attributes:
+            extend.append(current[0])
+        else:
+            observations.append({
+                'domain': domain,
+                'kind': kind,
+                'asset_id': asset_id,
+                'first_scan_id': scan_id,
+                'last_scan_id': scan_id,
+                'status_code': attributes[0],
+                'technology': attributes[1]
+            })
+
+    for i in range(0, len(extend), UPDATE_CHUNK_SIZE):
+        db.session.execute(
+            db.update(ScanAsset)
+            .where(ScanAsset.id.in_(extend[i:i + UPDATE_CHUNK_SIZE]))
+            .values(last_scan_id=scan_id)
+        )
+    bulk_insert(ScanAsset, observations)
+    return len(new_rows), len(extend), len(observations)
+
+def record_scan_assets(scan_id, domain, subdomains, live_hosts):
+    """Store a scan's subdomains and live hosts in the domain's asset inventory
+
+    Subdomain and LiveHost rows are shared by all inventory scans of the
+    domain (scan_id is the scan that first saw them). Each scan only adds
+    rows for assets never seen before and observations for assets that
+    (re)appeared or changed status/technology; everything else extends the
+    observation from the previous scan. Must be called within an app
+    context; the caller commits.
+    """
+    previous_scan_id = _previous_scan_id(domain, scan_id)
+
+    names = {name: ({'scan_id': scan_id, 'name': name, 'source': 'combined'}, (None, None))
+             for name in subdomains}
+    counts = _record_kind(scan_id, domain, previous_scan_id, 'subdomain', Subdomain, Subdomain.name, names)
+    print(f"Inventory subdomains for {domain}: {counts[0]} new, {counts[1]} unchanged, {counts[2]} observations added")
+
+    hosts = {}
+    for host in live_hosts:
+        try:
+            row = {
+                'scan_id': scan_id,
+                'url': host['url'],
+                'status_code': host['status_code'],
+                'technology': host['technology']
+            }
+        except KeyError as ke:
+            print(f"KeyError in live host data: {ke}. Host data: {host}")
+            continue
+        hosts[row['url']] = (row, (row['status_code'], row['technology']))
+    counts = _record_kind(scan_id, domain, previous_scan_id, 'live_host', LiveHost, LiveHost.url, hosts)
+    print(f"Inventory live hosts for {domain}: {counts[0]} new, {counts[1]} unchanged, {counts[2]} observations added")
+
+def scan_observations(scan, kind):
+    """Query the observations of a kind ('subdomain', 'live_host' or 'url') that include a scan"""
+    return db.session.query(ScanAsset).filter(
+        ScanAsset.domain == scan.domain,
+        ScanAsset.kind == kind,
+        ScanAsset.last_scan_id >= scan.id,
+        ScanAsset.first_scan_id <= scan.id
+    )
@@ -0,0 +1,111 @@
+import json
+import socket
+from datetime import datetime, timedelta
+from flask import current_app
+from reconaug import db
+from reconaug.models import PortScanCache
+from reconaug.tools.scanner import clean_host, resolve_hosts, scan_addresses, scan_ports
+from reconaug.utils.writer import run_write
+
+def resolve_ip(host):
+    """Resolve a host or URL to an IPv4 address, or None"""
+    try:
+        return socket.gethostbyname(clean_host(host))
+    except (socket.gaierror, UnicodeError):
+        return None
+
+def get_cached_ports(ip, ttl=None):
+    """Return the cache entry for an IP if it is younger than the TTL, else None"""
+    if ttl is None:
+        ttl = current_app.config.get('PORT_CACHE_TTL', 3600)
+    if not ip or ttl <= 0:
+        return None
+
+    entry = PortScanCache.query.filter_by(ip=ip).first()
+    if entry and entry.scanned_at >= datetime.utcnow() - timedelta(seconds=ttl):
+        return entry
+    return None
+
+def store_cached_ports(ip, ports, source_host=None):
+    """Record the port scan result for an IP, replacing any previous entry"""
+    if not ip:
+        return
+    run_write(_write_cached_ports, ip, ports, source_host)
+
+def _write_cached_ports(ip, ports, source_host=None):
+    """Write job for store_cached_ports"""
+    entry = PortScanCache.query.filter_by(ip=ip).first()
+    if not entry:
+        entry = PortScanCache(ip=ip)
+        db.session.add(entry)
+    entry.ports = json.dumps(sorted(set(ports)))
+    entry.source_host = source_host
+    entry.scanned_at = datetime.utcnow()
+
+def scan_ports_cached(host):
+    """Scan ports for a host, answering from the per-IP cache when it is fresh
+
+    Returns (ports, error, cache_info) where cache_info describes where the
+    result came from: the resolved IP, whether it was a cache hit, when the
+    ports were scanned and through which hostname.
+    """
+    ip = resolve_ip(host)
+    entry = get_cached_ports(ip)
+    if entry:
+        age = (datetime.utcnow() - entry.scanned_at).total_seconds()
+        print(f"Port cache hit for {host} ({ip}), scanned {age:.0f}s ago via {entry.source_host}")
+        return json.loads(entry.ports), None, {
+            'cached': True,
+            'ip': ip,
+            'scanned_at': entry.scanned_at.isoformat(),
+            'age_seconds': int(age),
+            'source_host': entry.source_host
+        }
+
+    ports, error = scan_ports(host)
+    cache_info = {
+        'cached': False,
+        'ip': ip,
+        'scanned_at': datetime.utcnow().isoformat(),
+        'age_seconds': 0,
+        'source_host': clean_host(host)
+    }
+    if not error:
+        store_cached_ports(ip, ports, source_host=clean_host(host))
+    return ports, error, cache_info
+
+def scan_ports_bulk_cached(hosts, on_result=None, list_name='bulk'):
+    """Scan ports for many hosts at once, answering addresses with a fresh cache entry from the cache
+
+    Hosts are resolved and only addresses without a fresh entry go to the
+    single naabu run; their results are cached in turn. on_result(hostnames,
+    port) is called for cached ports as well as scanned ones. Returns
+    ({ip: [ports]}, {ip: [hostnames]}, cached_count, error).
+    """
+    hostnames = {clean_host(host) for host in hosts if host}
+    if not hostnames:
+        return {}, {}, 0, None
+    addresses, unresolved = resolve_hosts(hostnames)
+
+    results = {}
+    to_scan = {}
+    for ip, names in addresses.items():
+        entry = get_cached_ports(ip)
+        if entry is None:
+            to_scan[ip] = names
+            continue
+        results[ip] = json.loads(entry.ports)
+        if on_result:
+            for port in results[ip]:
+                on_result(names, port)
+    print(f"Bulk port scan: {len(hostnames)} hosts resolved to {len(addresses)} unique addresses "
+          f"({len(unresolved)} unresolved, {len(results)} cached)")
+
+    cached = len(results)
+    scanned, error = scan_addresses(to_scan, on_result=on_result, list_name=list_name)
+    if error:
+        return results, addresses, cached, error
+    for ip, ports in scanned.items():
+        store_cached_ports(ip, ports, source_host=to_scan[ip][0])
+        results[ip] = ports
+    return results, addresses, cached, None
@@ -0,0 +1,162 @@
+import json
+import queue
+import threading
+import time
+from celery import states
+from reconaug.celery_app import celery, get_redis_client
+
+# Tasks publish every state change on CHANNEL_PREFIX + task id
+CHANNEL_PREFIX = 'reconaug:progress:'
+
+# Seconds between keep-alive comments on an idle event stream. Each one also
+# re-reads the task's state, in case an event was missed while Redis was away.
+KEEPALIVE_INTERVAL = 15
+
+def publish_progress(task_id, state, info):
+    """Publish a task's new state and its meta (or result) to the task's progress channel"""
+    client = get_redis_client()
+    if client is None or not task_id:
+        return
+    try:
+        client.publish(CHANNEL_PREFIX + task_id, json.dumps({'state': state, 'info': info}, default=str))
+    except Exception as e:
+        # Watchers fall back to re-reading the state; the task must not fail
+        print(f"Could not publish progress of task {task_id}: {e}")
+
+def event_data(state, info):
+    """Return the event sent to the browser for a task state and its meta or result"""
+    if state == states.PENDING:
+        return {
+            'status': 'pending',
+            'progress': 0,
+            'message': 'Task is pending...',
+            'subdomains_count': 0,
+            'live_hosts_count': 0
+        }
+    if state == states.FAILURE:
+        return {
+            'status': 'error',
+            'progress': 100,
+            'message': str(info),
+            'complete': True
+        }
+    if state == states.SUCCESS:
+        return info
+    info = info if isinstance(info, dict) else {}
+    return {
+        'status': info.get('status', 'running'),
+        'progress': info.get('progress', 0),
+        'message': info.get('message', 'Task is running...'),
+        'subdomains_count': info.get('subdomains_count', 0),
+        'live_hosts_count': info.get('live_hosts_count', 0)
+    }
+
+def _sse(data):
+    return f"data: {json.dumps(data, default=str)}\n\n"
+
+def _current_state(task_id):
+    task = celery.AsyncResult(task_id)
+    return task.state, task.info
+
+class ProgressRelay:
+    """Hands progress events published by the workers to the event streams of this process
+
+    One thread holds a single pattern subscription for the whole process
+    and puts each event on the queues of the streams watching that task,
+    so a watcher costs a queue rather than a Redis connection or a polling
+    loop.
+    """
+
+    def __init__(self):
+        self._watchers = {}  # task id -> set of queues
+        self._lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self._thread = None
+
+    def watch(self, task_id):
+        """Return a queue that receives the events of a task until unwatch() is called"""
+        events = queue.Queue()
+        with self._lock:
+            self._watchers.setdefault(task_id, set()).add(events)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='progress-relay', daemon=True)
+                self._thread.start()
+        # Events published before the subscription is active would be lost
+        self._subscribed.wait(timeout=5)
+        return events
+
+    def unwatch(self, task_id, events):
+        with self._lock:
+            watchers = self._watchers.get(task_id)
+            if watchers is not None:
+                watchers.discard(events)
+                if not watchers:
+                    del self._watchers[task_id]
+
+    def _run(self):
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub()
+                pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                for message in pubsub.listen():
+                    if message['type'] == 'psubscribe':
+                        self._subscribed.set()
+                    elif message['type'] == 'pmessage':
+                        self._dispatch(message['channel'], message['data'])
+            except Exception as e:
+                self._subscribed.clear()
+                print(f"Progress relay lost its subscription, reconnecting: {e}")
+                time.sleep(1)
+
+    def _dispatch(self, channel, data):
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        with self._lock:
+            watchers = list(self._watchers.get(channel[len(CHANNEL_PREFIX):], ()))
+        if watchers:
+            event = json.loads(data)
+            for events in watchers:
+                events.put(event)
+
+relay = ProgressRelay()
+
+def task_event_stream(task_id):
+    """Yield server-sent events for a Celery task: its current state, then each change as it is published
+
+    The stream ends once the task succeeds or fails. Without a Redis
+    result backend there is nothing to subscribe to, and the state is
+    re-read every second instead.
+    """
+    if get_redis_client() is None:
+        yield from _polled_event_stream(task_id)
+        return
+
+    events = relay.watch(task_id)
+    try:
+        # Subscribed first, so nothing published after this read is missed
+        state, info = _current_state(task_id)
+        yield _sse(event_data(state, info))
+        while state not in states.READY_STATES:
+            try:
+                event = events.get(timeout=KEEPALIVE_INTERVAL)
+                state, info = event['state'], event['info']
+            except queue.Empty:
+                state, info = _current_state(task_id)
+                if state not in states.READY_STATES:
+                    yield ": keepalive\n\n"
+                    continue
+            yield _sse(event_data(state, info))
+    finally:
+        relay.unwatch(task_id, events)
+
+def _polled_event_stream(task_id):
+    last = None
+    while True:
+        state, info = _current_state(task_id)
+        data = event_data(state, info)
+        if data != last:
+            yield _sse(data)
+            last = data
+        if state in states.READY_STATES:
+            break
+        time.sleep(1)
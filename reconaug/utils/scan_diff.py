@@ -0,0 +1,281 @@
+from reconaug import db
+from reconaug.models import Scan, Port, ScanAsset, ScanArchive
+from reconaug.utils.archive import is_archived, get_scan_or_archive, iter_scan_rows
+from reconaug.utils.inventory import uses_inventory
+from reconaug.utils.scan_read import scan_subdomain_query, scan_live_host_query, scan_port_query
+from reconaug.utils.url_store import encode_cursor, decode_cursor
+
+# Default and maximum page sizes for diff results
+DEFAULT_DIFF_PAGE_SIZE = 500
+MAX_DIFF_PAGE_SIZE = 5000
+
+def previous_scan(scan):
+    """Return the latest scan of the same domain before scan, live or archived, or None"""
+    candidates = []
+    for model in (Scan, ScanArchive):
+        candidate = model.query.filter(
+            model.domain == scan.domain,
+            db.tuple_(model.timestamp, model.id) < (scan.timestamp, scan.id)
+        ).order_by(model.timestamp.desc(), model.id.desc()).first()
+        if candidate:
+            candidates.append(candidate)
+    return max(candidates, key=lambda candidate: (candidate.timestamp, candidate.id), default=None)
+
+# kind -> (query of a scan's rows, columns identifying a row across scans)
+_ROWS = {
+    'subdomain': (scan_subdomain_query, ['name']),
+    'live_host': (scan_live_host_query, ['url']),
+    'port': (scan_port_query, ['url', 'port_number']),
+}
+
+def _shared_rows(base, scan):
+    """Whether both scans keep their assets in the inventory, where one name or URL is one row"""
+    return uses_inventory(base) and uses_inventory(scan)
+
+def _observations(scan, kind):
+    """Conditions selecting the inventory observations of a kind that include scan
+
+    Unlike scan_observations() there is no domain condition: asset ids
+    already belong to one domain, and without it SQLite seeks the
+    (kind, asset_id) index for a given asset rather than range scanning
+    every observation of the domain.
+    """
+    return (ScanAsset.kind == kind, ScanAsset.first_scan_id <= scan.id, ScanAsset.last_scan_id >= scan.id)
+
+def _observed_in(scan, kind, asset_id):
+    """Condition: the inventory asset whose id is the column asset_id is observed in scan"""
+    return db.exists().where(ScanAsset.asset_id == asset_id, *_observations(scan, kind))
+
+def _port_in(scan, host_id, port_number=None):
+    """Condition: scan recorded the port (or, without a port_number, any port) of the live host host_id"""
+    conditions = [Port.scan_id == scan.id, Port.host_id == host_id]
+    if port_number is not None:
+        conditions.append(Port.port_number == port_number)
+    return db.exists().where(*conditions)
+
+def _in_scan(rows, kind, other, shared):
+    """Condition: each row of rows (a subquery of one scan) is also in scan other"""
+    if shared:
+        # Same asset, same row: an index seek on its observations (or, for
+        # ports, on the other scan's ports of the host) instead of matching
+        # names against the other scan's rows
+        if kind == 'port':
+            return _port_in(other, rows.c.host_id, rows.c.port_number)
+        return _observed_in(other, kind, rows.c.id)
+    query_for, keys = _ROWS[kind]
+    other_rows = query_for(other).subquery()
+    return db.exists().where(*(other_rows.c[key] == rows.c[key] for key in keys))
+
+def _added(kind):
+    def build(base, scan):
+        query_for, keys = _ROWS[kind]
+        new = query_for(scan).subquery('new')
+        query = db.select(new).where(~_in_scan(new, kind, base, _shared_rows(base, scan)))
+        return query, [new.c[key] for key in keys]
+    return build
+
+def _removed(kind):
+    def build(base, scan):
+        query_for, keys = _ROWS[kind]
+        old = query_for(base).subquery('old')
+        query = db.select(old).where(~_in_scan(old, kind, scan, _shared_rows(base, scan)))
+        return query, [old.c[key] for key in keys]
+    return build
+
+def _live_hosts_changed(base, scan):
+    new = scan_live_host_query(scan).subquery('new')
+    if _shared_rows(base, scan):
+        # Inventory hosts are the same row in both scans: join the base
+        # scan's observation of each host by its id
+        old = db.select(
+            ScanAsset.asset_id, ScanAsset.status_code, ScanAsset.technology
+        ).where(*_observations(base, 'live_host')).subquery('old')
+        on = old.c.asset_id == new.c.id
+    else:
+        old = scan_live_host_query(base).subquery('old')
+        on = old.c.url == new.c.url
+    query = db.select(
+        new.c.id,
+        new.c.url,
+        old.c.status_code.label('old_status_code'),
+        new.c.status_code,
+        old.c.technology.label('old_technology'),
+        new.c.technology
+    ).join(old, on).where(db.or_(
+        old.c.status_code.is_distinct_from(new.c.status_code),
+        old.c.technology.is_distinct_from(new.c.technology)
+    ))
+    return query, [new.c.url]
+
+def _ports_closed(base, scan):
+    old = scan_port_query(base).subquery('old')
+    keys = [old.c.url, old.c.port_number]
+    # Only hosts with port results in the new scan count: a host that was
+    # not port scanned again has unknown, not closed, ports
+    if _shared_rows(base, scan):
+        # Inventory hosts are the same row in both scans: seek the new
+        # scan's ports of each host by its id
+        scanned = _port_in(scan, old.c.host_id)
+        missing = ~_port_in(scan, old.c.host_id, old.c.port_number)
+        return db.select(old).where(scanned, missing), keys
+    new = scan_port_query(scan).subquery('new')
+    scanned = db.select(new.c.url).where(new.c.url == old.c.url).exists()
+    missing = ~db.exists().where(new.c.url == old.c.url, new.c.port_number == old.c.port_number)
+    return db.select(old).where(scanned, missing), keys
+
+# change -> function(base, scan) returning (select, keyset columns)
+DIFF_CHANGES = {
+    'subdomains_added': _added('subdomain'),
+    'subdomains_removed': _removed('subdomain'),
+    'live_hosts_added': _added('live_host'),
+    'live_hosts_removed': _removed('live_host'),
+    'live_hosts_changed': _live_hosts_changed,
+    'ports_opened': _added('port'),
+    'ports_closed': _ports_closed,
+}
+
+def get_base_scan(scan, base_scan_id=None):
+    """Return the scan to diff scan against: base_scan_id if given, else the previous scan
+
+    Either may be an archived scan (ScanArchive).
+    Raises ValueError if the base scan does not exist or scan is the
+    domain's first scan.
+    """
+    if base_scan_id is None:
+        base = previous_scan(scan)
+        if base is None:
+            raise ValueError(f"Scan {scan.id} is the first scan of {scan.domain}, there is nothing to compare with")
+        return base
+    base = get_scan_or_archive(base_scan_id)
+    if base is None:
+        raise ValueError(f"Scan {base_scan_id} not found")
+    return base
+
+def _row_keys(scan, kind, keys):
+    """Return the set of key tuples of a scan's rows of one kind"""
+    return {tuple(row[key] for key in keys) for row in iter_scan_rows(scan, kind)}
+
+def _archived_added(kind, keys):
+    def build(base, scan):
+        old = _row_keys(base, kind, keys)
+        return [row for row in iter_scan_rows(scan, kind) if tuple(row[key] for key in keys) not in old]
+    return build
+
+def _archived_removed(kind, keys):
+    def build(base, scan):
+        new = _row_keys(scan, kind, keys)
+        return [row for row in iter_scan_rows(base, kind) if tuple(row[key] for key in keys) not in new]
+    return build
+
+def _archived_live_hosts_changed(base, scan):
+    old = {row['url']: row for row in iter_scan_rows(base, 'live_hosts')}
+    changes = []
+    for row in iter_scan_rows(scan, 'live_hosts'):
+        previous = old.get(row['url'])
+        if previous and (previous['status_code'], previous['technology']) != (row['status_code'], row['technology']):
+            changes.append({
+                'id': row['id'],
+                'url': row['url'],
+                'old_status_code': previous['status_code'],
+                'status_code': row['status_code'],
+                'old_technology': previous['technology'],
+                'technology': row['technology']
+            })
+    return changes
+
+def _archived_ports_closed(base, scan):
+    new = _row_keys(scan, 'ports', ['url', 'port_number'])
+    scanned = {url for url, _ in new}
+    return [row for row in iter_scan_rows(base, 'ports')
+            if row['url'] in scanned and (row['url'], row['port_number']) not in new]
+
+# The same changes computed in Python from streamed rows, for diffs involving
+# an archived scan: change -> (function(base, scan) returning row dicts, key names)
+ARCHIVED_DIFF_CHANGES = {
+    'subdomains_added': (_archived_added('subdomains', ['name']), ['name']),
+    'subdomains_removed': (_archived_removed('subdomains', ['name']), ['name']),
+    'live_hosts_added': (_archived_added('live_hosts', ['url']), ['url']),
+    'live_hosts_removed': (_archived_removed('live_hosts', ['url']), ['url']),
+    'live_hosts_changed': (_archived_live_hosts_changed, ['url']),
+    'ports_opened': (_archived_added('ports', ['url', 'port_number']), ['url', 'port_number']),
+    'ports_closed': (_archived_ports_closed, ['url', 'port_number']),
+}
+
+def _archived_change_rows(base, scan, change):
+    """Return (row dicts sorted by key, key names) for a change involving an archived scan"""
+    build, keys = ARCHIVED_DIFF_CHANGES[change]
+    rows = build(base, scan)
+    rows.sort(key=lambda row: [row[key] for key in keys])
+    return rows, keys
+
+def _archived_diff_page(base, scan, change, limit, cursor):
+    rows, keys = _archived_change_rows(base, scan, change)
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != len(keys):
+            raise ValueError("Invalid cursor")
+        rows = [row for row in rows if [row[key] for key in keys] > position]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][key] for key in keys])
+
+def _check_scans(base, scan):
+    if base.domain != scan.domain:
+        raise ValueError(f"Scans {base.id} and {scan.id} are of different domains ({base.domain}, {scan.domain})")
+
+def _check_change(base, scan, change):
+    if change not in DIFF_CHANGES:
+        raise ValueError(f"Unknown change '{change}', expected one of: {', '.join(DIFF_CHANGES)}")
+    _check_scans(base, scan)
+
+def _change_query(base, scan, change):
+    _check_change(base, scan, change)
+    return DIFF_CHANGES[change](base, scan)
+
+def get_diff_page(base, scan, change, limit=DEFAULT_DIFF_PAGE_SIZE, cursor=None):
+    """Return one page of a change between two scans of a domain as (row dicts, next_cursor)
+
+    Each change is a single query in the database (an anti-join or join
+    between the two scans' rows) ordered by its key, and pages are fetched
+    with a keyset condition, so the scans are never loaded into Python.
+    Raises ValueError for an unknown change, an invalid cursor or scans of
+    different domains. When either scan is archived the change is computed
+    in Python from the streamed rows of both scans instead.
+    """
+    limit = max(1, min(int(limit), MAX_DIFF_PAGE_SIZE))
+    if is_archived(base) or is_archived(scan):
+        _check_change(base, scan, change)
+        return _archived_diff_page(base, scan, change, limit, cursor)
+
+    query, keys = _change_query(base, scan, change)
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != len(keys):
+            raise ValueError("Invalid cursor")
+        if len(keys) == 1:
+            query = query.where(keys[0] > position[0])
+        else:
+            query = query.where(db.tuple_(*keys) > tuple(position))
+
+    rows = db.session.execute(query.order_by(*keys).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[key.name] for key in keys])
+    return [dict(row._mapping) for row in rows], next_cursor
+
+def count_diff(base, scan):
+    """Return {change: number of rows} for every change between two scans of a domain"""
+    counts = {}
+    for change in DIFF_CHANGES:
+        if is_archived(base) or is_archived(scan):
+            _check_change(base, scan, change)
+            counts[change] = len(_archived_change_rows(base, scan, change)[0])
+            continue
+        query, _ = _change_query(base, scan, change)
+        counts[change] = db.session.execute(
+            db.select(db.func.count()).select_from(query.subquery())
+        ).scalar()
+    return counts
@@ -0,0 +1,195 @@
+import json
+from reconaug import db
+from reconaug.models import Subdomain, LiveHost, Port, ScanAsset, ScanStats, ScanArchive
+from reconaug.utils.inventory import uses_inventory, scan_observations
+from reconaug.utils.url_store import encode_cursor, decode_cursor
+
+# Default and maximum page sizes for subdomain and live host reads
+DEFAULT_ASSET_PAGE_SIZE = 1000
+MAX_ASSET_PAGE_SIZE = 10000
+
+# Rows fetched per round trip when streaming (a server-side cursor on PostgreSQL)
+STREAM_BATCH_SIZE = 2000
+
+def scan_subdomain_query(scan):
+    """Column-only query of (id, name) for a scan's subdomains, whichever storage it uses"""
+    if not uses_inventory(scan):
+        # Covered by the (scan_id, name) index: no table lookups, no sort
+        return db.session.query(Subdomain.id, Subdomain.name).filter(Subdomain.scan_id == scan.id)
+    return scan_observations(scan, 'subdomain').join(
+        Subdomain, Subdomain.id == ScanAsset.asset_id
+    ).with_entities(Subdomain.id, Subdomain.name)
+
+def scan_live_host_query(scan):
+    """Column-only query of (id, url, status_code, technology) for a scan's live hosts"""
+    if not uses_inventory(scan):
+        return db.session.query(LiveHost.id, LiveHost.url, LiveHost.status_code, LiveHost.technology).filter(
+            LiveHost.scan_id == scan.id
+        )
+    return scan_observations(scan, 'live_host').join(
+        LiveHost, LiveHost.id == ScanAsset.asset_id
+    ).with_entities(LiveHost.id, LiveHost.url, ScanAsset.status_code, ScanAsset.technology)
+
+def _page(query, key, limit, cursor):
+    """Run a query ordered by a unique key, returning (rows, next_cursor)
+
+    Pages use a keyset condition on the key, so each one starts with an
+    index seek. Without a limit every remaining row is returned.
+    """
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 1 or not isinstance(position[0], str):
+            raise ValueError("Invalid cursor")
+        query = query.filter(key > position[0])
+    query = query.order_by(key)
+    if limit is None:
+        return query.all(), None
+
+    limit = max(1, min(int(limit), MAX_ASSET_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.key)])
+
+def _live_host_dict(scan, row):
+    return {
+        'id': row.id,
+        'scan_id': scan.id,
+        'url': row.url,
+        'status_code': row.status_code,
+        'technology': row.technology
+    }
+
+def _archive_page(scan, kind, limit, cursor):
+    """Page the rows of an archived scan (see reconaug.utils.archive)"""
+    from reconaug.utils.archive import get_archive_rows_page
+
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_ASSET_PAGE_SIZE))
+    return get_archive_rows_page(scan, kind, limit, cursor)
+
+def get_scan_subdomain_page(scan, limit=DEFAULT_ASSET_PAGE_SIZE, cursor=None):
+    """Return one page of a scan's subdomain names, ordered by name, as (names, next_cursor)
+
+    Archived scans (ScanArchive) are read from their archive files.
+    """
+    if isinstance(scan, ScanArchive):
+        rows, next_cursor = _archive_page(scan, 'subdomains', limit, cursor)
+        return [row['name'] for row in rows], next_cursor
+    rows, next_cursor = _page(scan_subdomain_query(scan), Subdomain.name, limit, cursor)
+    return [row.name for row in rows], next_cursor
+
+def get_scan_live_host_page(scan, limit=DEFAULT_ASSET_PAGE_SIZE, cursor=None):
+    """Return one page of a scan's live hosts, ordered by URL, as (host dicts, next_cursor)
+
+    Host dicts have the shape of LiveHost.to_dict(), with scan_id set to the
+    requested scan, but are built from plain rows rather than ORM objects.
+    Archived scans (ScanArchive) are read from their archive files.
+    """
+    if isinstance(scan, ScanArchive):
+        rows, next_cursor = _archive_page(scan, 'live_hosts', limit, cursor)
+        return [dict(row, scan_id=scan.id) for row in rows], next_cursor
+    rows, next_cursor = _page(scan_live_host_query(scan), LiveHost.url, limit, cursor)
+    return [_live_host_dict(scan, row) for row in rows], next_cursor
+
+def get_scan_subdomain_names(scan):
+    """Return all subdomain names of a scan, ordered by name"""
+    return get_scan_subdomain_page(scan, limit=None)[0]
+
+def get_scan_live_hosts(scan):
+    """Return all live hosts of a scan as LiveHost.to_dict()-shaped dicts, ordered by URL"""
+    return get_scan_live_host_page(scan, limit=None)[0]
+
+def iter_scan_subdomain_names(scan):
+    """Yield all subdomain names of a scan, ordered by name, fetching them in batches"""
+    for row in scan_subdomain_query(scan).order_by(Subdomain.name).yield_per(STREAM_BATCH_SIZE):
+        yield row.name
+
+def iter_scan_live_hosts(scan):
+    """Yield all live hosts of a scan as LiveHost.to_dict()-shaped dicts, ordered by URL, in batches"""
+    for row in scan_live_host_query(scan).order_by(LiveHost.url).yield_per(STREAM_BATCH_SIZE):
+        yield _live_host_dict(scan, row)
+
+def scan_port_query(scan):
+    """Column-only query of (host_id, url, port_number, service, confidence) for a scan's open ports
+
+    Ports belong to the scan whose port scan found them, whichever storage
+    the scan's live hosts use.
+    """
+    return db.session.query(
+        Port.host_id, LiveHost.url, Port.port_number, Port.service, Port.confidence
+    ).join(LiveHost, LiveHost.id == Port.host_id).filter(Port.scan_id == scan.id)
+
+def find_port_scan_host(url, scan_id=None):
+    """Return (live host id, scan id) that a port scan of the live host at url is recorded against, or None
+
+    With a scan_id the host must be one of that scan's live hosts; without
+    one, the newest scan that found the host is used. Inventory scans share
+    one LiveHost row per domain, so its own scan_id is only the scan that
+    first found it and the scans observing it are read from ScanAsset.
+    """
+    observed = db.select(ScanAsset.last_scan_id).where(
+        ScanAsset.kind == 'live_host', ScanAsset.asset_id == LiveHost.id
+    )
+    if scan_id is not None:
+        in_scan = db.or_(
+            LiveHost.scan_id == scan_id,
+            db.exists(observed.where(ScanAsset.first_scan_id <= scan_id, ScanAsset.last_scan_id >= scan_id))
+        )
+        row = db.session.query(LiveHost.id).filter(LiveHost.url == url, in_scan).first()
+        return (row.id, scan_id) if row else None
+
+    last_seen = db.func.coalesce(
+        observed.with_only_columns(db.func.max(ScanAsset.last_scan_id)).scalar_subquery(), LiveHost.scan_id
+    )
+    row = db.session.query(LiveHost.id, last_seen.label('scan_id')).filter(
+        LiveHost.url == url
+    ).order_by(last_seen.desc()).first()
+    return (row.id, row.scan_id) if row else None
+
+def iter_scan_ports(scan):
+    """Yield the open ports of a scan's live hosts as dicts, ordered by host URL and port, in batches"""
+    query = scan_port_query(scan)
+    for row in query.order_by(LiveHost.url, Port.port_number).yield_per(STREAM_BATCH_SIZE):
+        yield {
+            'host_id': row.host_id,
+            'url': row.url,
+            'port_number': row.port_number,
+            'service': row.service,
+            'confidence': row.confidence
+        }
+
+def get_scan_live_host_urls(scan):
+    """Return (live host id, url) pairs of a scan"""
+    return [(row.id, row.url) for row in scan_live_host_query(scan)]
+
+def count_scan_assets(scan):
+    """Return (subdomain count, live host count) actually stored for a scan"""
+    if not uses_inventory(scan):
+        return (db.session.query(db.func.count()).filter(Subdomain.scan_id == scan.id).scalar(),
+                db.session.query(db.func.count()).filter(LiveHost.scan_id == scan.id).scalar())
+    return (scan_observations(scan, 'subdomain').count(),
+            scan_observations(scan, 'live_host').count())
+
+def get_scan_asset_counts(scan):
+    """Return (subdomain count, live host count) from the scan's stats, counting rows if it has none"""
+    if isinstance(scan, ScanArchive):
+        stats = json.loads(scan.stats)
+        return stats['subdomains'], stats['live_hosts']
+    stats = db.session.get(ScanStats, scan.id)
+    if stats:
+        return stats.subdomains, stats.live_hosts
+    return count_scan_assets(scan)
+
+def count_scan_status_codes(scan):
+    """Return {status code: live host count} for a scan, whichever storage it uses"""
+    if not uses_inventory(scan):
+        rows = db.session.query(LiveHost.status_code, db.func.count(LiveHost.id)).filter(
+            LiveHost.scan_id == scan.id
+        ).group_by(LiveHost.status_code)
+    else:
+        rows = scan_observations(scan, 'live_host').with_entities(
+            ScanAsset.status_code, db.func.count(ScanAsset.id)
+        ).group_by(ScanAsset.status_code)
+    return dict(rows.all())
@@ -0,0 +1,136 @@
+import json
+from collections import Counter
+from datetime import datetime
+from reconaug import db
+from reconaug.models import Scan, Port, ScanStats
+
+# Default and maximum page sizes for scan listings
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+
+def _status_key(status_code):
+    """Histogram key for a live host status code"""
+    return str(status_code) if status_code not in (None, '') else 'unknown'
+
+def record_scan_stats(scan_id, subdomains, live_hosts):
+    """Insert the stats row of a scan that insert_scan just stored
+
+    Counts come from the (already deduplicated) input, so no child rows are
+    read back. Live hosts missing a field are skipped when stored and are
+    not counted. The caller commits.
+    """
+    stored = [host for host in live_hosts if {'url', 'status_code', 'technology'} <= host.keys()]
+    histogram = Counter(_status_key(host['status_code']) for host in stored)
+    db.session.execute(ScanStats.__table__.insert().values(
+        scan_id=scan_id,
+        subdomains=len(subdomains),
+        live_hosts=len(stored),
+        ports=0,
+        urls=0,
+        status_codes=json.dumps(histogram, sort_keys=True),
+        updated_at=datetime.utcnow()
+    ))
+
+def _update_stats(scan_id, **values):
+    """Update a scan's stats row, rebuilding it from stored data if it does not exist yet"""
+    result = db.session.execute(
+        db.update(ScanStats)
+        .where(ScanStats.scan_id == scan_id)
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        rebuild_scan_stats(scan_id)
+
+def set_scan_urls(scan_id, count):
+    """Record the number of historical URLs stored for a scan"""
+    _update_stats(scan_id, urls=count)
+
+def add_port_stats(scan_counts):
+    """Add newly stored ports to the stats of their scans
+
+    scan_counts maps scan id -> ports added. Must be called in the
+    transaction that added them.
+    """
+    for scan_id, added in scan_counts.items():
+        if added:
+            _update_stats(scan_id, ports=ScanStats.ports + added)
+
+def rebuild_scan_stats(scan_id):
+    """Recompute a scan's stats row from its stored rows
+
+    Used for scans created outside insert_scan, and to backfill existing
+    databases. Returns the stats dict, or None if the scan does not exist.
+    """
+    from reconaug.utils.scan_read import count_scan_assets, count_scan_status_codes
+    from reconaug.utils.url_store import count_scan_urls
+
+    scan = db.session.get(Scan, scan_id)
+    if scan is None:
+        return None
+    db.session.flush()
+
+    subdomains, live_hosts = count_scan_assets(scan)
+    histogram = Counter()
+    for status_code, count in count_scan_status_codes(scan).items():
+        histogram[_status_key(status_code)] += count
+    ports = db.session.query(db.func.count(Port.id)).filter(Port.scan_id == scan_id).scalar()
+
+    values = {
+        'subdomains': subdomains,
+        'live_hosts': live_hosts,
+        'ports': ports,
+        'urls': count_scan_urls(scan_id) or 0,
+        'status_codes': json.dumps(histogram, sort_keys=True),
+        'updated_at': datetime.utcnow()
+    }
+    db.session.execute(db.delete(ScanStats).where(ScanStats.scan_id == scan_id))
+    db.session.execute(ScanStats.__table__.insert().values(scan_id=scan_id, **values))
+    return values
+
+def rebuild_all_scan_stats(missing_only=False, batch_size=100):
+    """Recompute the stats of every scan (or only scans without a stats row)
+
+    Commits in batches and returns the number of scans rebuilt.
+    """
+    query = db.session.query(Scan.id)
+    if missing_only:
+        query = query.outerjoin(ScanStats, ScanStats.scan_id == Scan.id).filter(ScanStats.scan_id.is_(None))
+    scan_ids = [scan_id for (scan_id,) in query.order_by(Scan.id)]
+    for i, scan_id in enumerate(scan_ids, 1):
+        rebuild_scan_stats(scan_id)
+        if i % batch_size == 0:
+            db.session.commit()
+    db.session.commit()
+    return len(scan_ids)
+
+def get_scan_history_page(limit=DEFAULT_HISTORY_PAGE_SIZE, cursor=None, domain=None):
+    """Return one page of scans, newest first, as ([(scan, stats or None)], next_cursor)
+
+    Scans are ordered by (timestamp, id) descending and paged with a keyset
+    condition on the timestamp index, and their counts come from the stats
+    table, so the cost of a page does not depend on the size of the history.
+    """
+    from reconaug.utils.url_store import encode_cursor, decode_cursor
+
+    limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+    query = db.session.query(Scan, ScanStats).outerjoin(ScanStats, ScanStats.scan_id == Scan.id)
+    if domain:
+        query = query.filter(Scan.domain == domain)
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 2:
+            raise ValueError("Invalid cursor")
+        try:
+            timestamp = datetime.fromisoformat(position[0])
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        query = query.filter(db.tuple_(Scan.timestamp, Scan.id) < (timestamp, position[1]))
+
+    rows = query.order_by(Scan.timestamp.desc(), Scan.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = encode_cursor([last.timestamp.isoformat(), last.id])
+    return rows, next_cursor
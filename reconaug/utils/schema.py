@@ -0,0 +1,275 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from reconaug import db
+
+def _add_missing_columns(table, columns):
+    """Add columns that exist on the model but not in the database table"""
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table(table.name):
+        return []
+
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    added = []
+    for name in columns:
+        if name in existing:
+            continue
+        column = table.columns[name]
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}'))
+        added.append(name)
+    db.session.commit()
+    return added
+
+def _backfill_historical_url_fields(batch_size=10000):
+    """Populate the derived filter fields on historical URLs stored before they existed"""
+    from reconaug.models import HistoricalUrl
+    from reconaug.utils.url_store import url_fields
+
+    total = 0
+    while True:
+        rows = db.session.query(HistoricalUrl.id, HistoricalUrl.url).filter(
+            HistoricalUrl.path.is_(None)
+        ).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(
+            db.update(HistoricalUrl),
+            [dict(id=row.id, **url_fields(row.url)) for row in rows]
+        )
+        db.session.commit()
+        total += len(rows)
+    if total:
+        print(f"Backfilled filter fields for {total} historical URLs")
+
+def _create_indexes(model, names=None):
+    """Create a model's indexes (or the named ones) if they do not exist yet
+
+    Indexes over columns the table does not have yet are skipped; the
+    migration adding the columns creates them.
+    """
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(model.__table__.name)}
+    for index in model.__table__.indexes:
+        if names is not None and index.name not in names:
+            continue
+        if all(column.name in existing for column in index.columns):
+            index.create(db.engine, checkfirst=True)
+
+def _delete_duplicates(table, columns):
+    """Delete rows duplicating an earlier row on the given columns, keeping the lowest id"""
+    group = ', '.join(columns)
+    result = db.session.execute(db.text(
+        f'DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {group})'
+    ))
+    db.session.commit()
+    if result.rowcount:
+        print(f"Removed {result.rowcount} duplicate rows from {table}")
+
+# Bookkeeping table recording which migrations have been applied
+schema_migration = db.Table(
+    'schema_migration',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+def _initial_tables():
+    """Create any missing tables from the models"""
+    db.create_all()
+
+def _historical_url_filter_fields():
+    from reconaug.models import HistoricalUrl
+
+    added = _add_missing_columns(HistoricalUrl.__table__, ['host', 'path', 'extension', 'has_params'])
+    if added:
+        print(f"Added columns to historical_url: {', '.join(added)}")
+    _backfill_historical_url_fields()
+    _create_indexes(HistoricalUrl)
+
+def _port_confidence():
+    from reconaug.models import Port
+
+    added = _add_missing_columns(Port.__table__, ['confidence'])
+    if added:
+        print(f"Added columns to port: {', '.join(added)}")
+
+def _full_text_search():
+    # Full-text search indexes over historical URLs and subdomains
+    from reconaug.utils.search import create_fts_indexes
+    create_fts_indexes()
+
+def _scan_lookup_indexes():
+    from reconaug.models import Scan, Subdomain, LiveHost, Port
+
+    # Point ports of duplicate live hosts at the surviving row before removing the duplicates
+    db.session.execute(db.text(
+        'UPDATE port SET host_id = ('
+        'SELECT MIN(l2.id) FROM live_host l1 JOIN live_host l2 '
+        'ON l2.scan_id = l1.scan_id AND l2.url = l1.url WHERE l1.id = port.host_id)'
+    ))
+    _delete_duplicates('live_host', ['scan_id', 'url'])
+    _delete_duplicates('subdomain', ['scan_id', 'name'])
+    _delete_duplicates('port', ['host_id', 'port_number'])
+
+    for model in (Scan, Subdomain, LiveHost, Port):
+        _create_indexes(model)
+
+def _postgres_trigram_indexes():
+    # PostgreSQL has no FTS5; pg_trgm GIN indexes serve the ILIKE substring search instead
+    if db.engine.dialect.name != 'postgresql':
+        return
+
+    from reconaug.utils.search import FTS_TABLES
+    try:
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"pg_trgm extension not available, search will scan: {e}")
+        return
+
+    for table, column in FTS_TABLES.values():
+        db.session.execute(db.text(
+            f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)'
+        ))
+    db.session.commit()
+
+def _asset_inventory():
+    from reconaug.models import Scan, ScanAsset
+
+    added = _add_missing_columns(Scan.__table__, ['asset_storage'])
+    if added:
+        print(f"Added columns to scan: {', '.join(added)}")
+    ScanAsset.__table__.create(db.engine, checkfirst=True)
+    _create_indexes(ScanAsset)
+
+def _backfill_scan_stats():
+    from reconaug.utils.scan_stats import rebuild_all_scan_stats
+
+    rebuilt = rebuild_all_scan_stats(missing_only=True)
+    if rebuilt:
+        print(f"Computed stats for {rebuilt} existing scans")
+
+def _scan_stats():
+    from reconaug.models import ScanStats
+
+    # Existing scans get their stats in url_observations: computing them
+    # reads scan and port columns that later migrations add
+    ScanStats.__table__.create(db.engine, checkfirst=True)
+
+def _scan_archive():
+    from reconaug.models import ScanArchive
+
+    ScanArchive.__table__.create(db.engine, checkfirst=True)
+    _create_indexes(ScanArchive)
+
+def _port_scan_id():
+    from reconaug.models import Port
+
+    added = _add_missing_columns(Port.__table__, ['scan_id'])
+    if added:
+        print(f"Added columns to port: {', '.join(added)}")
+    # Ports stored before had no scan of their own. A live host row of row
+    # storage belongs to one scan; a shared inventory row is attributed to the
+    # newest scan that observed it, which is the one port scans were run from.
+    db.session.execute(db.text(
+        'UPDATE port SET scan_id = COALESCE('
+        "(SELECT MAX(last_scan_id) FROM scan_asset WHERE kind = 'live_host' AND asset_id = port.host_id), "
+        '(SELECT scan_id FROM live_host WHERE live_host.id = port.host_id)) '
+        'WHERE scan_id IS NULL'
+    ))
+    db.session.execute(db.text('DROP INDEX IF EXISTS ix_port_host_port'))
+    db.session.commit()
+    _create_indexes(Port)
+
+def _url_observations():
+    from reconaug.models import Scan, UrlFingerprint
+
+    # Scans stored with delta storage before observations existed keep
+    # reading back only the URLs they stored themselves
+    for model, columns in ((Scan, ['url_delta']), (UrlFingerprint, ['url_id'])):
+        added = _add_missing_columns(model.__table__, columns)
+        if added:
+            print(f"Added columns to {model.__table__.name}: {', '.join(added)}")
+    _backfill_scan_stats()
+
+def _codepoint_collation():
+    # Path prefix ranges and URL block cursors compare by code point, which
+    # a PostgreSQL database with another default collation does not do
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table, column in (('historical_url', 'path'), ('historical_url_block', 'first_url'),
+                          ('historical_url_block', 'last_url')):
+        db.session.execute(db.text(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE TEXT COLLATE "C"'))
+    db.session.commit()
+
+def _url_block_summaries(batch_size=200):
+    from reconaug.models import HistoricalUrlBlock
+    from reconaug.utils.url_store import block_summaries, decode_block
+
+    added = _add_missing_columns(HistoricalUrlBlock.__table__, ['hosts', 'extensions', 'param_urls'])
+    if added:
+        print(f"Added columns to historical_url_block: {', '.join(added)}")
+
+    total = 0
+    while True:
+        blocks = db.session.query(HistoricalUrlBlock.id, HistoricalUrlBlock.data).filter(
+            HistoricalUrlBlock.hosts.is_(None)
+        ).limit(batch_size).all()
+        if not blocks:
+            break
+        db.session.execute(
+            db.update(HistoricalUrlBlock),
+            [dict(id=block.id, **block_summaries(decode_block(block.data))) for block in blocks]
+        )
+        db.session.commit()
+        total += len(blocks)
+    if total:
+        print(f"Computed summaries for {total} historical URL blocks")
+
+# Ordered list of (version, name, upgrade). Every upgrade must be safe to run
+# against a database created from the current models, because a fresh
+# database gets all tables from version 1 and then runs the rest.
+MIGRATIONS = [
+    (1, 'initial_tables', _initial_tables),
+    (2, 'historical_url_filter_fields', _historical_url_filter_fields),
+    (3, 'port_confidence', _port_confidence),
+    (4, 'full_text_search', _full_text_search),
+    (5, 'scan_lookup_indexes', _scan_lookup_indexes),
+    (6, 'postgres_trigram_indexes', _postgres_trigram_indexes),
+    (7, 'asset_inventory', _asset_inventory),
+    (8, 'scan_stats', _scan_stats),
+    (9, 'scan_archive', _scan_archive),
+    (10, 'port_scan_id', _port_scan_id),
+    (11, 'url_observations', _url_observations),
+    (12, 'codepoint_collation', _codepoint_collation),
+    (13, 'url_block_summaries', _url_block_summaries),
+]
+
+def get_schema_version():
+    """Return the highest applied migration version, or 0 for an unmigrated database"""
+    if not db.inspect(db.engine).has_table(schema_migration.name):
+        return 0
+    return db.session.execute(db.select(db.func.max(schema_migration.c.version))).scalar() or 0
+
+def migrate():
+    """Apply pending schema migrations in order, recording each one as it completes
+
+    Replaces a bare db.create_all(), which only creates missing tables and
+    never changes existing ones.
+    """
+    schema_migration.create(db.engine, checkfirst=True)
+    applied = {version for (version,) in db.session.execute(db.select(schema_migration.c.version))}
+
+    for version, name, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying schema migration {version}: {name}")
+        upgrade()
+        try:
+            db.session.execute(schema_migration.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except IntegrityError:
+            # Another process applied the same migration concurrently
+            db.session.rollback()
@@ -0,0 +1,199 @@
+import html
+from sqlalchemy.exc import OperationalError
+from reconaug import db
+from reconaug.models import Scan
+from reconaug.utils.url_store import encode_cursor, decode_cursor
+
+# Markers passed to FTS5 highlight(); replaced with <mark> tags after escaping
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+# Full-text indexes: name -> (content table, indexed column)
+FTS_TABLES = {
+    'historical_url_fts': ('historical_url', 'url'),
+    'subdomain_fts': ('subdomain', 'name'),
+}
+
+# Engine URL -> whether its SQLite build has the FTS5 trigram tokenizer
+_trigram_support = {}
+
+def fts_available():
+    """Check whether the database supports the FTS5 trigram indexes
+
+    Only SQLite has them, and only builds with FTS5 and SQLite 3.34 or
+    newer (the trigram tokenizer); elsewhere search falls back to LIKE.
+    The support is probed once per engine.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    key = str(engine.url)
+    if key not in _trigram_support:
+        _trigram_support[key] = _probe_trigram(engine)
+    return _trigram_support[key]
+
+def _probe_trigram(engine):
+    """Create and drop a temporary trigram FTS5 table, returning whether that worked"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(db.text(
+                "CREATE VIRTUAL TABLE temp.reconaug_fts_probe USING fts5(value, tokenize='trigram')"))
+            connection.execute(db.text("DROP TABLE temp.reconaug_fts_probe"))
+        return True
+    except OperationalError as e:
+        print(f"SQLite has no FTS5 trigram tokenizer, search falls back to LIKE: {e}")
+        return False
+
+def fts_indexed():
+    """Check whether the FTS5 trigram indexes exist and can be queried
+
+    The indexes are created by a migration, so a database migrated while
+    its SQLite lacked the tokenizer has none even once it is available.
+    """
+    return fts_available() and all(db.inspect(db.engine).has_table(fts_table) for fts_table in FTS_TABLES)
+
+def create_fts_indexes():
+    """Create the FTS5 trigram indexes and the triggers that keep them in sync
+
+    The indexes are external-content tables over historical_url and
+    subdomain, maintained by insert/update/delete triggers so every write
+    path (save_historical_urls, save_scan_results, ...) updates them
+    incrementally. Indexes created for the first time are rebuilt from the
+    existing rows.
+    """
+    if not fts_available():
+        return
+
+    inspector = db.inspect(db.engine)
+    for fts_table, (content_table, column) in FTS_TABLES.items():
+        exists = inspector.has_table(fts_table)
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+            f"{column}, content='{content_table}', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {content_table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        ]
+        for statement in statements:
+            db.session.execute(db.text(statement))
+        if not exists:
+            print(f"Building full-text index {fts_table}")
+            db.session.execute(db.text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+        db.session.commit()
+
+def optimize_fts_indexes():
+    """Merge each FTS5 index into one segment, dropping the entries of deleted rows
+
+    Deletes only add tombstones to an FTS5 index, so after large deletes
+    (archiving scans) the index keeps its size until it is optimized. Must
+    be called within an app context; the caller commits.
+    """
+    if not fts_indexed():
+        return
+    for fts_table in FTS_TABLES:
+        db.session.execute(db.text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')"))
+
+def _highlight(text, term=None):
+    """Escape a highlighted string and turn the FTS markers into <mark> tags"""
+    if term is not None:
+        # LIKE fallback: mark the first case-insensitive occurrence ourselves
+        start = text.lower().find(term.lower())
+        if start >= 0:
+            text = (text[:start] + _MARK_START + text[start:start + len(term)] +
+                    _MARK_END + text[start + len(term):])
+    escaped = html.escape(text)
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+def _observed_kind(kind, scan_id):
+    """Return the ScanAsset kind through which a scan sees shared rows of a search kind, or None"""
+    scan = db.session.get(Scan, scan_id)
+    if scan is None:
+        return None
+    if kind == 'urls':
+        return 'url' if scan.url_delta else None
+    return 'subdomain' if scan.asset_storage == 'inventory' else None
+
+def search(term, kind='urls', scan_id=None, limit=50, cursor=None):
+    """Search historical URLs or subdomains for a substring, newest first
+
+    Returns (results, next_cursor). Uses the FTS5 trigram index for terms of
+    three or more characters and falls back to LIKE otherwise (or on
+    databases without FTS5). URLs of scans saved in block storage are not
+    searched: both paths read the historical_url rows only.
+    """
+    if kind not in ('urls', 'subdomains'):
+        raise ValueError("kind must be 'urls' or 'subdomains'")
+    if not term:
+        raise ValueError("Search term is required")
+
+    limit = max(1, min(int(limit), 500))
+    before_id = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position[0] != 's' or len(position) != 2:
+            raise ValueError("Invalid cursor")
+        before_id = int(position[1])
+
+    fts_table = 'historical_url_fts' if kind == 'urls' else 'subdomain_fts'
+    content_table, column = FTS_TABLES[fts_table]
+    params = {'limit': limit + 1}
+    conditions = []
+
+    if fts_indexed() and len(term) >= 3:
+        # Quote the term so it is matched as a literal substring
+        params['match'] = '"' + term.replace('"', '""') + '"'
+        select = (f"SELECT c.id, c.scan_id, c.{column} AS value, "
+                  f"highlight({fts_table}, 0, :mark_start, :mark_end) AS highlighted "
+                  f"FROM {fts_table} f JOIN {content_table} c ON c.id = f.rowid")
+        conditions.append(f"{fts_table} MATCH :match")
+        params['mark_start'] = _MARK_START
+        params['mark_end'] = _MARK_END
+        id_column = 'f.rowid'
+        like_term = None
+    else:
+        select = f"SELECT c.id, c.scan_id, c.{column} AS value, c.{column} AS highlighted FROM {content_table} c"
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params['like'] = f"%{escaped}%"
+        # SQLite's LIKE ignores ASCII case, PostgreSQL needs ILIKE for the same results
+        operator = 'ILIKE' if db.engine.dialect.name == 'postgresql' else 'LIKE'
+        conditions.append(f"c.{column} {operator} :like ESCAPE '\\'")
+        id_column = 'c.id'
+        like_term = term
+
+    if scan_id is not None:
+        params['scan_id'] = scan_id
+        observed_kind = _observed_kind(kind, scan_id)
+        if observed_kind:
+            # Shared rows (inventory subdomains, delta URLs) belong to every scan observing them
+            conditions.append(
+                "EXISTS (SELECT 1 FROM scan_asset o WHERE o.kind = :observed_kind AND o.asset_id = c.id "
+                "AND o.first_scan_id <= :scan_id AND o.last_scan_id >= :scan_id)"
+            )
+            params['observed_kind'] = observed_kind
+        else:
+            conditions.append("c.scan_id = :scan_id")
+    if before_id is not None:
+        conditions.append(f"{id_column} < :before_id")
+        params['before_id'] = before_id
+
+    sql = f"{select} WHERE {' AND '.join(conditions)} ORDER BY {id_column} DESC LIMIT :limit"
+    rows = db.session.execute(db.text(sql), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(['s', rows[-1].id])
+
+    key = 'url' if kind == 'urls' else 'name'
+    results = [{
+        'id': row.id,
+        'scan_id': row.scan_id if scan_id is None else scan_id,
+        key: row.value,
+        'highlight': _highlight(row.highlighted, like_term)
+    } for row in rows]
+    return results, next_cursor
+
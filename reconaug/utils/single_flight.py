@@ -0,0 +1,89 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from reconaug.celery_app import celery, get_redis_client
+
+KEY_PREFIX = 'reconaug:single-flight'
+
+# Take over a flight key only if it still names the task we looked at, so two
+# submissions racing to replace a finished task start one new task, not two
+_REPLACE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+
+def normalize_target(target):
+    """Normalize a domain, host or scan id so equivalent submissions share a key"""
+    return str(target).strip().lower().rstrip('.')
+
+def flight_key(task, target, options=None):
+    """Return the Redis key identifying submissions of a task for a target with the given options"""
+    options = json.dumps(options or {}, sort_keys=True, separators=(',', ':'))
+    return f'{KEY_PREFIX}:{task.name}:{normalize_target(target)}:{options}'
+
+def _can_attach(result, reuse_window):
+    """Whether a submission can attach to a task: still in flight, or completed successfully within the reuse window"""
+    if not result.ready():
+        return True
+    if reuse_window <= 0 or not result.successful():
+        return False
+    value = result.result
+    if isinstance(value, dict) and value.get('status') == 'error':
+        return False
+    done = result.date_done
+    return done is not None and datetime.utcnow() - done.replace(tzinfo=None) <= timedelta(seconds=reuse_window)
+
+def submit_once(task, args, target, options=None, reuse_window=None):
+    """Start task with args unless the same work is already running, returning (AsyncResult, attached)
+
+    Submissions are identified by (task, normalized target, options). While
+    one is queued or running, later identical submissions attach to its
+    task id instead of starting the pipeline again (and writing the same
+    output files). A successful result also stays attachable for
+    reuse_window seconds after it completes (default: the
+    TASK_REUSE_WINDOW setting). Without a Redis result backend every
+    submission starts a new task.
+    """
+    client = get_redis_client()
+    if client is None:
+        return task.apply_async(args), False
+
+    if reuse_window is None:
+        reuse_window = current_app.config.get('TASK_REUSE_WINDOW', 300)
+    # The key outlives a queued and running task, then the reuse window
+    ttl = 2 * (celery.conf.task_time_limit or 3600) + max(reuse_window, 0)
+    key = flight_key(task, target, options)
+
+    for _ in range(3):
+        task_id = str(uuid.uuid4())
+        if client.set(key, task_id, nx=True, ex=ttl):
+            return _start(client, key, task, args, task_id), False
+
+        current = client.get(key)
+        if current is None:
+            continue  # expired meanwhile
+        current = current.decode() if isinstance(current, bytes) else current
+        existing = celery.AsyncResult(current)
+        if _can_attach(existing, reuse_window):
+            print(f"Attaching to in-flight task {current} for {task.name} {normalize_target(target)}")
+            return existing, True
+        if client.eval(_REPLACE_SCRIPT, 1, key, current, task_id, ttl):
+            return _start(client, key, task, args, task_id), False
+
+    # The key kept changing under us: another submission just started the work
+    current = client.get(key)
+    if current is not None:
+        current = current.decode() if isinstance(current, bytes) else current
+        return celery.AsyncResult(current), True
+    return task.apply_async(args), False
+
+def _start(client, key, task, args, task_id):
+    """Send a task under the id just recorded in its flight key, releasing the key if sending fails"""
+    try:
+        return task.apply_async(args, task_id=task_id)
+    except Exception:
+        client.delete(key)
+        raise
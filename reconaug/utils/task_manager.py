@@ -7,6 +7,8 @@ class TaskManager:
     def __init__(self):
         self.tasks = {}
         self.task_lock = threading.Lock()
+        # Notified on every update, so watchers wait instead of polling
+        self.task_changed = threading.Condition(self.task_lock)
 
     def create_task(self, domain):
         """Create a new task for domain scanning"""
@@ -41,12 +43,21 @@ class TaskManager:
                 if live_hosts_count is not None:
                     self.tasks[task_id]['live_hosts_count'] = live_hosts_count
                 self.tasks[task_id]['timestamp'] = time.time()
+                self.task_changed.notify_all()
 
     def get_task(self, task_id):
         """Get task status"""
         with self.task_lock:
             return self.tasks.get(task_id, {}).copy()
 
+    def wait_for_update(self, task_id, timestamp, timeout=None):
+        """Wait until a task is updated after timestamp (or the timeout passes) and return its status"""
+        with self.task_lock:
+            self.task_changed.wait_for(
+                lambda: self.tasks.get(task_id, {}).get('timestamp') != timestamp, timeout
+            )
+            return self.tasks.get(task_id, {}).copy()
+
     def clean_old_tasks(self, max_age=3600):
         """Clean up old tasks (older than max_age seconds)"""
         current_time = time.time()
@@ -0,0 +1,557 @@
+import os
+import json
+import base64
+import hashlib
+import zlib
+from datetime import datetime
+from urllib.parse import urlsplit
+from flask import current_app
+from reconaug import db
+from reconaug.models import Scan, HistoricalUrl, HistoricalUrlBlock, UrlFingerprint, ScanAsset
+from reconaug.utils.bulk import bulk_insert
+from reconaug.utils.inventory import scan_observations
+from reconaug.utils.scan_stats import set_scan_urls
+
+# Number of URLs stored in each compressed block
+BLOCK_SIZE = 1024
+
+# Default and maximum page sizes for paginated URL reads
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+def url_storage_backend():
+    """Return the configured historical URL storage backend ('rows' or 'blocks')"""
+    try:
+        return current_app.config.get('HISTORICAL_URL_STORAGE', 'rows')
+    except RuntimeError:
+        return os.environ.get('RECONAUG_URL_STORAGE', 'rows')
+
+def url_delta_enabled():
+    """Return True if rescans should only store URLs not seen before for the domain"""
+    try:
+        return bool(current_app.config.get('HISTORICAL_URL_DELTA', False))
+    except RuntimeError:
+        return os.environ.get('RECONAUG_URL_DELTA', '0') == '1'
+
+def url_fingerprints_enabled():
+    """Return True if saved URLs are recorded in the domain's fingerprint index
+
+    Delta storage needs the index; without it the index only serves the
+    first/last-seen info, and is kept when URL_FINGERPRINTS is set.
+    """
+    try:
+        return url_delta_enabled() or bool(current_app.config.get('URL_FINGERPRINTS', False))
+    except RuntimeError:
+        return url_delta_enabled() or os.environ.get('RECONAUG_URL_FINGERPRINTS', '0') == '1'
+
+def uses_url_delta(scan_id):
+    """Whether a scan's historical URLs are stored as shared rows with 'url' observations"""
+    return bool(db.session.query(Scan.url_delta).filter(Scan.id == scan_id).scalar())
+
+def _scan_url_query(scan_id, *columns):
+    """Query columns of a scan's row-stored URLs
+
+    A delta scan sees the shared rows its observations include, wherever
+    they were first stored; any other scan sees its own rows.
+    """
+    if not uses_url_delta(scan_id):
+        return db.session.query(*columns).filter(HistoricalUrl.scan_id == scan_id)
+    return scan_observations(db.session.get(Scan, scan_id), 'url').join(
+        HistoricalUrl, HistoricalUrl.id == ScanAsset.asset_id
+    ).with_entities(*columns)
+
+def _write_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    """Read an unsigned LEB128 varint, returning (value, new_pos)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def encode_block(urls):
+    """Front-code a sorted list of URLs and compress it with zlib"""
+    out = bytearray()
+    previous = b''
+    for url in urls:
+        raw = url.encode('utf-8')
+        shared = len(os.path.commonprefix([previous, raw]))
+        _write_varint(out, shared)
+        _write_varint(out, len(raw) - shared)
+        out += raw[shared:]
+        previous = raw
+    return zlib.compress(bytes(out), 6)
+
+def decode_block(data):
+    """Decompress and expand a block produced by encode_block"""
+    raw = zlib.decompress(data)
+    urls = []
+    previous = b''
+    pos = 0
+    while pos < len(raw):
+        shared, pos = _read_varint(raw, pos)
+        length, pos = _read_varint(raw, pos)
+        current = previous[:shared] + raw[pos:pos + length]
+        pos += length
+        urls.append(current.decode('utf-8'))
+        previous = current
+    return urls
+
+def url_fields(url):
+    """Split a URL into the host, path, extension and has_params filter fields"""
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or '').lower() or None
+        path = parts.path or '/'
+        query = parts.query
+    except ValueError:
+        host, path, query = None, '/', ''
+
+    extension = None
+    last_segment = path.rsplit('/', 1)[-1]
+    if '.' in last_segment:
+        extension = last_segment.rsplit('.', 1)[1].lower()[:16] or None
+
+    return {
+        'host': host[:255] if host else None,
+        'path': path,
+        'extension': extension,
+        'has_params': bool(query)
+    }
+
+def encode_cursor(values):
+    """Encode keyset values into an opaque cursor string"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    return values
+
+def matches_url_filters(url, host=None, path_prefix=None, extension=None, has_params=None):
+    """Apply the URL filters in Python (used for block-stored scans)"""
+    fields = url_fields(url)
+    if host and fields['host'] != host:
+        return False
+    if path_prefix and not fields['path'].startswith(path_prefix):
+        return False
+    if extension and fields['extension'] != extension:
+        return False
+    if has_params is not None and fields['has_params'] != has_params:
+        return False
+    return True
+
+def get_scan_url_page(scan_id, limit=DEFAULT_PAGE_SIZE, cursor=None, host=None, path_prefix=None,
+                      extension=None, has_params=None):
+    """Return one page of historical URLs for a scan as (urls, next_cursor)
+
+    Row-stored scans are ordered by (path, id) and paged with a keyset
+    condition, so each page is an index seek on one of the
+    (scan_id, [host|extension,] path, id) indexes. Delta scans page the
+    shared rows they observed the same way. Block-stored scans are ordered
+    by URL and use the block index to start reading at the cursor; with a
+    host, extension or has_params filter, blocks whose summaries rule out
+    any match are skipped without being decompressed.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if host:
+        host = host.lower()
+    if extension:
+        extension = extension.lower().lstrip('.')
+    position = decode_cursor(cursor) if cursor else None
+
+    if has_url_blocks(scan_id):
+        start_after = None
+        if position:
+            if position[0] != 'b' or len(position) != 2:
+                raise ValueError("Invalid cursor")
+            start_after = position[1]
+
+        urls = []
+        blocks = iter_block_urls(scan_id, start_after=start_after, host=host, extension=extension,
+                                 has_params=has_params)
+        for url in blocks:
+            if not matches_url_filters(url, host, path_prefix, extension, has_params):
+                continue
+            if len(urls) == limit:
+                return urls, encode_cursor(['b', urls[-1]])
+            urls.append(url)
+        return urls, None
+
+    query = _scan_url_query(scan_id, HistoricalUrl.id, HistoricalUrl.url, HistoricalUrl.path)
+    if host:
+        query = query.filter(HistoricalUrl.host == host)
+    if extension:
+        query = query.filter(HistoricalUrl.extension == extension)
+    if has_params is not None:
+        query = query.filter(HistoricalUrl.has_params == has_params)
+    if path_prefix:
+        # Range condition instead of LIKE so the index on path can be used; path
+        # compares by code point on every database (see models.CodepointText)
+        query = query.filter(HistoricalUrl.path >= path_prefix,
+                             HistoricalUrl.path < path_prefix + '\U0010ffff')
+    if position:
+        if position[0] != 'r' or len(position) != 3:
+            raise ValueError("Invalid cursor")
+        query = query.filter(db.tuple_(HistoricalUrl.path, HistoricalUrl.id) > (position[1], position[2]))
+
+    rows = query.order_by(HistoricalUrl.path, HistoricalUrl.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(['r', rows[-1].path, rows[-1].id])
+    return [row.url for row in rows], next_cursor
+
+def save_url_blocks(scan_id, urls):
+    """Replace the URL blocks of a scan with the given URLs, sorted and deduplicated"""
+    HistoricalUrlBlock.query.filter_by(scan_id=scan_id).delete()
+
+    sorted_urls = sorted(set(url for url in urls if isinstance(url, str)))
+    for block_index, i in enumerate(range(0, len(sorted_urls), BLOCK_SIZE)):
+        chunk = sorted_urls[i:i + BLOCK_SIZE]
+        db.session.add(HistoricalUrlBlock(
+            scan_id=scan_id,
+            block_index=block_index,
+            first_url=chunk[0],
+            last_url=chunk[-1],
+            url_count=len(chunk),
+            data=encode_block(chunk),
+            **block_summaries(chunk)
+        ))
+    db.session.flush()
+    return len(sorted_urls)
+
+def _summary(values):
+    """Newline-delimited set of values, with a newline at each end so each one can be matched whole"""
+    return '\n' + ''.join(f'{value}\n' for value in sorted(values))
+
+def block_summaries(urls):
+    """Return the hosts, extensions and param_urls summaries of a block's URLs"""
+    fields = [url_fields(url) for url in urls]
+    return {
+        'hosts': _summary({f['host'] for f in fields if f['host']}),
+        'extensions': _summary({f['extension'] for f in fields if f['extension']}),
+        'param_urls': sum(1 for f in fields if f['has_params'])
+    }
+
+def has_url_blocks(scan_id):
+    """Check whether a scan stores its historical URLs as blocks"""
+    return db.session.query(HistoricalUrlBlock.id).filter_by(scan_id=scan_id).first() is not None
+
+def iter_block_urls(scan_id, start_after=None, host=None, extension=None, has_params=None):
+    """Yield the URLs of a scan in sorted order, optionally starting after a given URL
+
+    Only blocks whose last URL sorts after start_after are read, so a range
+    read touches the block index and the blocks it needs rather than the
+    whole scan. Given a host, extension or has_params filter, blocks whose
+    summaries show they hold no matching URL are skipped as well; the
+    URLs yielded still have to be filtered.
+    """
+    query = HistoricalUrlBlock.query.filter_by(scan_id=scan_id)
+    if start_after is not None:
+        query = query.filter(HistoricalUrlBlock.last_url > start_after)
+    if host:
+        query = query.filter(db.or_(HistoricalUrlBlock.hosts.is_(None),
+                                    HistoricalUrlBlock.hosts.contains(f'\n{host}\n', autoescape=True)))
+    if extension:
+        query = query.filter(db.or_(HistoricalUrlBlock.extensions.is_(None),
+                                    HistoricalUrlBlock.extensions.contains(f'\n{extension}\n', autoescape=True)))
+    if has_params is True:
+        query = query.filter(db.or_(HistoricalUrlBlock.param_urls.is_(None), HistoricalUrlBlock.param_urls > 0))
+    elif has_params is False:
+        query = query.filter(db.or_(HistoricalUrlBlock.param_urls.is_(None),
+                                    HistoricalUrlBlock.param_urls < HistoricalUrlBlock.url_count))
+
+    for block in query.order_by(HistoricalUrlBlock.block_index).yield_per(16):
+        for url in decode_block(block.data):
+            if start_after is None or url > start_after:
+                yield url
+
+def url_fingerprint(url):
+    """Return a signed 64-bit fingerprint of a URL"""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def _chunks(items, size=500):
+    """Split a list into chunks small enough for an IN (...) clause"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def record_url_fingerprints(scan_id, fingerprints):
+    """Record the URL fingerprints of a scan in its domain's fingerprint index
+
+    Fingerprints last seen in earlier scans of the domain get their
+    last-seen scan and time moved to this scan; unknown ones are inserted
+    with this scan as first and last sighting. Only the incoming
+    fingerprints are looked up, with index seeks on (domain, fingerprint),
+    so the cost does not grow with the domain's history. Returns
+    {fingerprint: url_id} for the fingerprints that were already indexed
+    (url_id is the shared row holding the URL, or None).
+    """
+    scan = db.session.get(Scan, scan_id)
+    domain = scan.domain
+    now = datetime.utcnow()
+
+    known = {}
+    seen = []
+    for chunk in _chunks(list(set(fingerprints))):
+        rows = db.session.query(
+            UrlFingerprint.fingerprint, UrlFingerprint.first_seen_scan_id, UrlFingerprint.url_id
+        ).filter(UrlFingerprint.domain == domain, UrlFingerprint.fingerprint.in_(chunk))
+        for fingerprint, first_seen_scan_id, url_id in rows:
+            known[fingerprint] = url_id
+            if first_seen_scan_id != scan_id:
+                seen.append(fingerprint)
+    new = [fingerprint for fingerprint in set(fingerprints) if fingerprint not in known]
+
+    bulk_insert(UrlFingerprint, ({
+        'domain': domain,
+        'fingerprint': fingerprint,
+        'first_seen_scan_id': scan_id,
+        'last_seen_scan_id': scan_id,
+        'first_seen': now,
+        'last_seen': now
+    } for fingerprint in new))
+
+    for chunk in _chunks(seen):
+        db.session.execute(
+            db.update(UrlFingerprint)
+            .where(UrlFingerprint.domain == domain, UrlFingerprint.fingerprint.in_(chunk),
+                   UrlFingerprint.last_seen_scan_id < scan_id)
+            .values(last_seen_scan_id=scan_id, last_seen=now)
+        )
+
+    print(f"URL fingerprints for {domain}: {len(new)} new, {len(seen)} seen before")
+    return known
+
+def get_url_seen_info(scan_id, urls):
+    """Return {url: first/last-seen info} for URLs of a scan from its domain's fingerprint index"""
+    scan = db.session.get(Scan, scan_id)
+    if not scan or not urls:
+        return {}
+
+    by_fingerprint = {url_fingerprint(url): url for url in urls}
+    info = {}
+    for chunk in _chunks(list(by_fingerprint)):
+        rows = UrlFingerprint.query.filter(
+            UrlFingerprint.domain == scan.domain,
+            UrlFingerprint.fingerprint.in_(chunk)
+        )
+        for row in rows:
+            info[by_fingerprint[row.fingerprint]] = row.to_dict()
+    return info
+
+def _neighbour_scan_ids(scan, *conditions):
+    """Return the ids of the previous and next scan of a scan's domain matching conditions, or None"""
+    scans = db.session.query(Scan.id).filter(Scan.domain == scan.domain, *conditions)
+    previous_id = scans.filter(Scan.id < scan.id).with_entities(db.func.max(Scan.id)).scalar()
+    next_id = scans.filter(Scan.id > scan.id).with_entities(db.func.min(Scan.id)).scalar()
+    return previous_id, next_id
+
+def _detach_url_observations(scan):
+    """Take a delta scan out of its domain's URL observations, re-homing the shared rows it owns
+
+    Runs are shortened (or split) around the scan, so the neighbouring
+    delta scans keep seeing the same URLs. Rows first stored by this scan
+    move to the first scan still observing them, or are deleted, together
+    with the fingerprint index's pointer, if none does.
+    """
+    previous_id, next_id = _neighbour_scan_ids(scan, Scan.url_delta.is_(True))
+    runs = (ScanAsset.domain == scan.domain, ScanAsset.kind == 'url')
+
+    # A run passing through the scan continues after it as a new run
+    spanning = (*runs, ScanAsset.first_scan_id < scan.id, ScanAsset.last_scan_id > scan.id)
+    db.session.execute(ScanAsset.__table__.insert().from_select(
+        ['domain', 'kind', 'asset_id', 'first_scan_id', 'last_scan_id'],
+        db.select(ScanAsset.domain, ScanAsset.kind, ScanAsset.asset_id,
+                  db.literal(next_id), ScanAsset.last_scan_id).where(*spanning)
+    ))
+    db.session.execute(db.update(ScanAsset).where(*spanning).values(last_scan_id=previous_id))
+    db.session.execute(db.delete(ScanAsset).where(
+        *runs, ScanAsset.first_scan_id == scan.id, ScanAsset.last_scan_id == scan.id
+    ))
+    db.session.execute(db.update(ScanAsset).where(*runs, ScanAsset.first_scan_id == scan.id).values(
+        first_scan_id=next_id
+    ))
+    db.session.execute(db.update(ScanAsset).where(*runs, ScanAsset.last_scan_id == scan.id).values(
+        last_scan_id=previous_id
+    ))
+
+    observed = db.exists().where(ScanAsset.kind == 'url', ScanAsset.asset_id == HistoricalUrl.id)
+    orphans = db.select(HistoricalUrl.id).where(HistoricalUrl.scan_id == scan.id, ~observed)
+    db.session.execute(db.update(UrlFingerprint).where(
+        UrlFingerprint.domain == scan.domain, UrlFingerprint.url_id.in_(orphans)
+    ).values(url_id=None))
+    db.session.execute(db.delete(HistoricalUrl).where(HistoricalUrl.scan_id == scan.id, ~observed))
+    first_seen = db.select(db.func.min(ScanAsset.first_scan_id)).where(
+        ScanAsset.kind == 'url', ScanAsset.asset_id == HistoricalUrl.id
+    ).scalar_subquery()
+    db.session.execute(db.update(HistoricalUrl).where(HistoricalUrl.scan_id == scan.id).values(
+        scan_id=first_seen
+    ))
+
+def _clear_scan_urls(scan):
+    """Remove the stored URLs of a scan, whichever way they were stored"""
+    if scan.url_delta:
+        _detach_url_observations(scan)
+        scan.url_delta = False
+    HistoricalUrlBlock.query.filter_by(scan_id=scan.id).delete()
+    HistoricalUrl.query.filter_by(scan_id=scan.id).delete()
+
+def _save_delta_urls(scan, urls, known):
+    """Store a delta scan's URLs as shared rows with observations, returning the number of URLs
+
+    urls maps fingerprint -> URL and known maps the fingerprints the index
+    already had to their shared row (or None). Only URLs without a shared
+    row are inserted; every URL's observation is extended from the
+    previous delta scan of the domain, or a new one is opened.
+    """
+    # Shared rows the index points to, if they still exist
+    existing = set()
+    for chunk in _chunks([url_id for url_id in known.values() if url_id is not None]):
+        existing.update(url_id for (url_id,) in db.session.query(HistoricalUrl.id).filter(HistoricalUrl.id.in_(chunk)))
+    url_ids = {fingerprint: known[fingerprint] for fingerprint in urls if known.get(fingerprint) in existing}
+
+    new = [url for fingerprint, url in urls.items() if fingerprint not in url_ids]
+    bulk_insert(HistoricalUrl, (dict(scan_id=scan.id, url=url, **url_fields(url)) for url in new))
+    pointers = []
+    for url_id, url in db.session.query(HistoricalUrl.id, HistoricalUrl.url).filter(HistoricalUrl.scan_id == scan.id):
+        fingerprint = url_fingerprint(url)
+        url_ids[fingerprint] = url_id
+        pointers.append({'b_fingerprint': fingerprint, 'b_url_id': url_id})
+    if pointers:
+        db.session.execute(
+            UrlFingerprint.__table__.update()
+            .where(UrlFingerprint.domain == scan.domain, UrlFingerprint.fingerprint == db.bindparam('b_fingerprint'))
+            .values(url_id=db.bindparam('b_url_id')),
+            pointers
+        )
+
+    # Observations still open at the previous delta scan are extended
+    previous_id, _ = _neighbour_scan_ids(scan, Scan.url_delta.is_(True))
+    extend = []
+    open_assets = set()
+    if previous_id is not None:
+        for chunk in _chunks(list(url_ids.values())):
+            rows = db.session.query(ScanAsset.id, ScanAsset.asset_id).filter(
+                ScanAsset.kind == 'url',
+                ScanAsset.asset_id.in_(chunk),
+                ScanAsset.last_scan_id == previous_id
+            )
+            for observation_id, asset_id in rows:
+                extend.append(observation_id)
+                open_assets.add(asset_id)
+    for chunk in _chunks(extend):
+        db.session.execute(db.update(ScanAsset).where(ScanAsset.id.in_(chunk)).values(last_scan_id=scan.id))
+    bulk_insert(ScanAsset, ({
+        'domain': scan.domain,
+        'kind': 'url',
+        'asset_id': url_id,
+        'first_scan_id': scan.id,
+        'last_scan_id': scan.id
+    } for url_id in url_ids.values() if url_id not in open_assets))
+
+    scan.url_delta = True
+    print(f"Delta storage: {len(new)} new URL rows, {len(extend)} URLs unchanged since the previous scan")
+    return len(url_ids)
+
+def save_scan_urls(scan_id, urls):
+    """Replace the historical URLs of a scan using the configured backend
+
+    With delta storage or URL_FINGERPRINTS enabled, every URL is recorded
+    in the domain's fingerprint index. With
+    HISTORICAL_URL_DELTA enabled, a URL is stored once per domain as a row
+    shared by every delta scan that found it (whatever the backend), and
+    each scan records which rows it saw as ScanAsset 'url' observations,
+    so rescans only add what changed but still read back their full URL
+    set. Returns the number of URLs of the scan, which is also recorded in
+    the scan's stats.
+    """
+    scan = db.session.get(Scan, scan_id)
+    urls = {url_fingerprint(url): url for url in dict.fromkeys(url for url in urls if isinstance(url, str))}
+    known = record_url_fingerprints(scan_id, list(urls)) if url_fingerprints_enabled() else {}
+    _clear_scan_urls(scan)
+
+    if url_delta_enabled():
+        stored = _save_delta_urls(scan, urls, known)
+    elif url_storage_backend() == 'blocks':
+        stored = save_url_blocks(scan_id, urls.values())
+    else:
+        stored = bulk_insert(HistoricalUrl, (dict(scan_id=scan_id, url=url, **url_fields(url)) for url in urls.values()))
+    set_scan_urls(scan_id, stored)
+    return stored
+
+def remove_scan_urls(scan):
+    """Delete a scan's historical URLs and drop it from the domain's fingerprint index
+
+    Used when the scan itself goes away (see reconaug.utils.archive).
+    Shared rows of delta scans are handed to the next scan observing them.
+    Fingerprints first or last seen in this scan move to the neighbouring
+    scans that saw them, or are deleted if this scan was the only one.
+    The caller commits.
+    """
+    _clear_scan_urls(scan)
+
+    previous_id, next_id = _neighbour_scan_ids(scan)
+    fingerprints = (UrlFingerprint.domain == scan.domain,)
+    observations = (ScanAsset.kind == 'url', ScanAsset.asset_id == UrlFingerprint.url_id)
+    db.session.execute(db.delete(UrlFingerprint).where(
+        *fingerprints,
+        UrlFingerprint.first_seen_scan_id == scan.id,
+        UrlFingerprint.last_seen_scan_id == scan.id,
+        ~db.exists().where(*observations)
+    ))
+    db.session.execute(db.update(UrlFingerprint).where(
+        *fingerprints, UrlFingerprint.first_seen_scan_id == scan.id
+    ).values(first_seen_scan_id=db.func.coalesce(
+        db.select(db.func.min(ScanAsset.first_scan_id)).where(*observations).scalar_subquery(), next_id
+    )))
+    db.session.execute(db.update(UrlFingerprint).where(
+        *fingerprints, UrlFingerprint.last_seen_scan_id == scan.id
+    ).values(last_seen_scan_id=db.func.coalesce(
+        db.select(db.func.max(ScanAsset.last_scan_id)).where(*observations).scalar_subquery(), previous_id
+    )))
+
+def get_scan_urls(scan_id):
+    """Return all historical URLs of a scan, whichever backend stored them"""
+    if has_url_blocks(scan_id):
+        return list(iter_block_urls(scan_id))
+    return [url for (url,) in _scan_url_query(scan_id, HistoricalUrl.url)]
+
+def iter_scan_urls(scan_id, batch_size=2000):
+    """Yield all historical URLs of a scan without loading them at once
+
+    Row-stored URLs come in (path, id) order, which the (scan_id, path, id)
+    index provides without a sort, batch_size rows per round trip.
+    Block-stored URLs are decoded one block at a time.
+    """
+    if has_url_blocks(scan_id):
+        yield from iter_block_urls(scan_id)
+        return
+    query = _scan_url_query(scan_id, HistoricalUrl.url).order_by(HistoricalUrl.path, HistoricalUrl.id)
+    for (url,) in query.yield_per(batch_size):
+        yield url
+
+def count_scan_urls(scan_id):
+    """Return the number of historical URLs of a scan"""
+    block_total = db.session.query(db.func.sum(HistoricalUrlBlock.url_count)).filter_by(scan_id=scan_id).scalar()
+    if block_total:
+        return block_total
+    if uses_url_delta(scan_id):
+        return scan_observations(db.session.get(Scan, scan_id), 'url').count()
+    return HistoricalUrl.query.filter_by(scan_id=scan_id).count()
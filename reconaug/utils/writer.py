@@ -0,0 +1,137 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import current_app
+from reconaug import db
+
+# Most write jobs committed together in one transaction
+WRITE_BATCH_SIZE = 64
+
+class WriteTimeout(RuntimeError):
+    """A write job did not finish within DB_WRITE_TIMEOUT seconds"""
+
+class WriteQueue:
+    """A single writer thread applying queued write jobs in batched transactions
+
+    SQLite allows one writer at a time, so concurrent writers from request
+    threads and tasks end up retrying against each other (or failing with
+    "database is locked"). Funnelling them through one thread turns that
+    into a queue: each time the writer wakes up it takes every job waiting
+    (up to WRITE_BATCH_SIZE) and commits them together. If the batch fails
+    it is rolled back and the jobs are retried one by one, so a bad job
+    only fails itself.
+    """
+
+    def __init__(self, app, batch_size=WRITE_BATCH_SIZE):
+        self.app = app
+        self.batch_size = batch_size
+        self.jobs = queue.Queue()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self._run, name='reconaug-db-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return a Future for its result"""
+        future = Future()
+        self.jobs.put((fn, args, kwargs, future))
+        return future
+
+    def _next_batch(self):
+        """Block for one job, then take whatever else is already waiting"""
+        batch = [self.jobs.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, batch):
+        """Run a batch of jobs in one transaction and resolve their futures"""
+        results = []
+        try:
+            for fn, args, kwargs, _ in batch:
+                results.append(fn(*args, **kwargs))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) > 1:
+                for job in batch:
+                    self._apply([job])
+            else:
+                batch[0][3].set_exception(e)
+            return
+        finally:
+            db.session.remove()
+
+        for (_, _, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                self._apply(self._next_batch())
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(app=None):
+    """Return the writer for the app's database, starting it on first use
+
+    There is one writer per database per process; a forked child (e.g. a
+    Celery pool worker) starts its own.
+    """
+    app = app or current_app._get_current_object()
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    with _writers_lock:
+        writer = _writers.get(uri)
+        if writer is None or writer.pid != os.getpid():
+            writer = _writers[uri] = WriteQueue(app)
+    return writer
+
+def write_queue_enabled():
+    """Whether writes go through the single writer (SQLite only)"""
+    return current_app.config.get('DB_WRITE_QUEUE', False) and db.engine.dialect.name == 'sqlite'
+
+def _holds_write_transaction():
+    """Whether this thread's session has written on its SQLite connection without committing"""
+    session = db.session()
+    if not session.in_transaction():
+        return False
+    return session.connection().connection.dbapi_connection.in_transaction
+
+def run_write(fn, *args, **kwargs):
+    """Run a write job, commit it and return its result
+
+    fn does its writes on db.session and must not commit. With the write
+    queue enabled it runs on the writer thread, possibly batched with
+    other jobs; otherwise it runs here. Exceptions are re-raised in the
+    caller either way.
+
+    The caller must not hold uncommitted writes of its own: the writer
+    thread would wait for that lock while the caller waits for the
+    writer. This raises RuntimeError instead, and WriteTimeout if the job
+    has not finished after DB_WRITE_TIMEOUT seconds (it may still run).
+    """
+    if not write_queue_enabled():
+        try:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    writer = get_writer()
+    if threading.current_thread() is writer.thread:
+        # Nested write from inside a job: part of the current batch
+        return fn(*args, **kwargs)
+    if _holds_write_transaction():
+        raise RuntimeError(f"run_write({fn.__name__}) called with uncommitted writes on this "
+                           "thread's session; commit or roll back first")
+    timeout = current_app.config.get('DB_WRITE_TIMEOUT', 600)
+    try:
+        return writer.submit(fn, *args, **kwargs).result(timeout=timeout or None)
+    except FutureTimeoutError:
+        raise WriteTimeout(f"Write job {fn.__name__} did not finish within {timeout}s")
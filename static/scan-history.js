@@ -4,8 +4,16 @@ document.addEventListener('DOMContentLoaded', function() {
     const scanHistoryTable = document.getElementById('scanHistoryTable');
     const scanHistoryFilter = document.getElementById('scanHistoryFilter');
 
-    // Store the full scan history
+    const loadMoreButton = document.getElementById('loadMoreScans');
+
+    // Store the loaded scan history, the cursor of the next page and the
+    // domain the server filters the history by
     let scanHistory = [];
+    let nextCursor = null;
+    let domainFilter = '';
+
+    // Responses to requests made before the filter changed are ignored
+    let historyRequest = 0;
 
     // Load scan history when the page loads
     loadScanHistory();
@@ -69,21 +77,80 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Filter scan history
-    scanHistoryFilter.addEventListener('input', function() {
-        const filterValue = this.value.toLowerCase();
+    // Filter the loaded scans while typing; once the filter is committed
+    // (Enter or leaving the field), ask the server for that domain's scans
+    // from the first page
+    scanHistoryFilter.addEventListener('input', showFilteredScans);
+    scanHistoryFilter.addEventListener('change', function() {
+        const domain = this.value.trim();
+        if (domain !== domainFilter) {
+            domainFilter = domain;
+            setNextCursor(null);
+            loadScanHistory();
+        }
+    });
+
+    function historyUrl(cursor) {
+        const params = new URLSearchParams();
+        if (domainFilter) {
+            params.set('domain', domainFilter);
+        }
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const query = params.toString();
+        return query ? `/api/scan-history?${query}` : '/api/scan-history';
+    }
+
+    function showFilteredScans() {
+        const filterValue = scanHistoryFilter.value.toLowerCase();
         const filteredScans = scanHistory.filter(scan =>
             scan.domain.toLowerCase().includes(filterValue)
         );
         populateScanHistoryTable(filteredScans);
-    });
+    }
+
+    // Load older scans on demand
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', function() {
+            this.textContent = 'Loading...';
+            this.disabled = true;
+            const request = historyRequest;
+
+            fetch(historyUrl(nextCursor))
+                .then(response => response.json())
+                .then(data => {
+                    if (request !== historyRequest) {
+                        return;
+                    }
+                    scanHistory = scanHistory.concat(data.scans || []);
+                    setNextCursor(data.next_cursor);
+                    showFilteredScans();
+                })
+                .catch(error => {
+                    console.error('Error loading more scans:', error);
+                })
+                .finally(() => {
+                    this.textContent = 'Load more';
+                    this.disabled = false;
+                });
+        });
+    }
+
+    function setNextCursor(cursor) {
+        nextCursor = cursor || null;
+        if (loadMoreButton) {
+            loadMoreButton.style.display = nextCursor ? '' : 'none';
+        }
+    }
 
     // Function to load scan history
     function loadScanHistory() {
         console.log('Loading scan history...');
         scanHistoryTable.innerHTML = '<tr><td colspan="5">Loading scan history...</td></tr>';
+        const request = ++historyRequest;
 
-        fetch('/api/scan-history')
+        fetch(historyUrl())
             .then(response => {
                 console.log('Scan history response status:', response.status);
                 if (!response.ok) {
@@ -92,12 +159,19 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json();
             })
             .then(data => {
+                if (request !== historyRequest) {
+                    return;
+                }
                 console.log('Scan history data received:', data);
                 scanHistory = data.scans || [];
+                setNextCursor(data.next_cursor);
                 console.log(`Found ${scanHistory.length} scan records`);
-                populateScanHistoryTable(scanHistory);
+                showFilteredScans();
             })
             .catch(error => {
+                if (request !== historyRequest) {
+                    return;
+                }
                 console.error('Error loading scan history:', error);
                 scanHistoryTable.innerHTML = `<tr><td colspan="5">Error loading scan history: ${error.message}</td></tr>`;
             });
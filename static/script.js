@@ -25,6 +25,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const tabButtons = document.querySelectorAll('.tab-button');
     const tabPanes = document.querySelectorAll('.tab-pane');
 
+    // Page size used to fetch the rest of a scan's subdomains and live hosts
+    const RESULT_PAGE_SIZE = 1000;
+
+    // The task whose results are shown; pages of earlier tasks are dropped
+    let resultsTaskId = null;
+
     // Store the full results for filtering
     let fullResults = {
         liveHosts: [],
@@ -99,6 +105,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 // Store the full results
+                resultsTaskId = taskId;
                 fullResults.liveHosts = data.live_hosts || [];
                 fullResults.subdomains = data.subdomains || [];
                 fullResults.historicalUrls = {}; // Reset historical URLs
@@ -116,6 +123,24 @@ document.addEventListener('DOMContentLoaded', function() {
                 populateSubdomainsTable(fullResults.subdomains);
                 populateHistoricalUrlsTable([]);
 
+                // The task only carries a first page of each list: fetch the rest
+                fetchRemainingPages(data.subdomains_url, data.subdomains_next_cursor, 'subdomains', page => {
+                    if (resultsTaskId !== taskId) {
+                        return false;
+                    }
+                    fullResults.subdomains = fullResults.subdomains.concat(page);
+                    populateSubdomainsTable(fullResults.subdomains);
+                    return true;
+                });
+                fetchRemainingPages(data.live_hosts_url, data.live_hosts_next_cursor, 'live_hosts', page => {
+                    if (resultsTaskId !== taskId) {
+                        return false;
+                    }
+                    fullResults.liveHosts = fullResults.liveHosts.concat(page);
+                    populateLiveHostsTable(fullResults.liveHosts);
+                    return true;
+                });
+
                 // Hide loading, show results
                 loadingDiv.classList.add('hidden');
                 resultsDiv.classList.remove('hidden');
@@ -137,6 +162,29 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
+    // Function to fetch the pages of a scan's list after the first, passing
+    // each to onPage until it returns false
+    function fetchRemainingPages(url, cursor, key, onPage) {
+        if (!url || !cursor) {
+            return;
+        }
+        fetch(`${url}?limit=${RESULT_PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (onPage(data[key] || [])) {
+                    fetchRemainingPages(url, data.next_cursor, key, onPage);
+                }
+            })
+            .catch(error => {
+                console.error(`Error fetching more ${key}:`, error);
+            });
+    }
+
     // Function to start listening for task updates
     function listenForTaskUpdates(taskId) {
         // Close any existing event source